@@ -2,11 +2,25 @@
 
 __all__ = ['facility', 'instrument', 'gui', 'samp', 'client']
 
+import sys
+
 from .version import __version__
 
-from . import facility
-from . import instrument
-from . import gui
-from . import samp
-from . import client
-from .client import A2p2Client
+if sys.version_info < (3, 7):
+    from . import facility
+    from . import instrument
+    from . import gui
+    from . import samp
+    from . import client
+    from .client import A2p2Client
+else:
+    # submodules (and so tkinter, astropy or numpy) are imported on first
+    # access, e.g. 'from a2p2 import A2p2Client'
+    def __getattr__(name):
+        import importlib
+        if name == 'A2p2Client':
+            return importlib.import_module('.client', __name__).A2p2Client
+        if name in __all__:
+            return importlib.import_module('.' + name, __name__)
+        raise AttributeError("module %r has no attribute %r" %
+                             (__name__, name))
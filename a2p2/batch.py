@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import collections
+import os
+import tarfile
+import zipfile
+
+# many OBs: list of urls (urls) or url of a zip or tar archive (url), an
+# optional batchId is given back in the reply and in the status notification
+BATCH_MTYPE = "ob.load.batch"
+# sent to the sender of a batch once processed with the status of every OB
+BATCH_STATUS_MTYPE = "ob.load.batch.status"
+
+# extensions of the OB files read from archives
+OB_EXTENSIONS = (".obxml", ".xml")
+
+# per OB result sent back to the sender of a batch
+BatchItem = collections.namedtuple("BatchItem", ["name", "status", "message"])
+
+
+def urlToPath(url):
+    """ Returns the local path of file urls, other urls are returned as is. """
+    if url.startswith("file:///"):
+        return url[7:]
+    elif url.startswith("file:/"):  # work arround bugged file urls
+        return url[5:]
+    return url
+
+
+def isArchive(path):
+    return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+
+def iterArchive(path):
+    """
+    Yields (name, file object) of the OB files of a zip or tar archive.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.lower().endswith(OB_EXTENSIONS):
+                    with archive.open(name) as f:
+                        yield name, f
+    else:
+        with tarfile.open(path) as archive:
+            for member in sorted(archive.getmembers(), key=lambda m: m.name):
+                if member.isfile() and member.name.lower().endswith(OB_EXTENSIONS):
+                    yield member.name, archive.extractfile(member)
+
+
+def iterBatch(params):
+    """
+    Yields (name, source) of every OB of the parameters of a batch message:
+    'urls' is a list of OB urls, 'url' the url of one OB or of a zip or tar
+    archive of OB files. source is a path or a file object to give to OB().
+    """
+    urls = params.get("urls") or []
+    if not isinstance(urls, list):
+        urls = [urls]
+    if params.get("url"):
+        urls = urls + [params["url"]]
+    for url in urls:
+        path = urlToPath(url)
+        if os.path.isfile(path) and isArchive(path):
+            for name, f in iterArchive(path):
+                yield os.path.basename(path) + ":" + name, f
+        else:
+            yield url, path
+
+
+class Batch(object):
+
+    """
+    OBs of one batch message processed one by one, so that the main loop
+    keeps the UI responsive between two time budgets.
+    """
+
+    def __init__(self, batchId, params, sender=None):
+        self.batchId = batchId
+        self.sender = sender
+        self.items = []
+        self.iterator = iterBatch(params)
+        self.done = False
+
+    def step(self, processOB):
+        """
+        Process the next OB with processOB(source) that must return its
+        status. Returns False once every OB has been processed.
+        """
+        if self.done:
+            return False
+        name = str(len(self.items) + 1)
+        try:
+            name, source = next(self.iterator)
+        except StopIteration:
+            self.done = True
+            return False
+        except Exception as e:
+            # unreadable archive: stop here
+            self.items.append(BatchItem(name, "error", str(e)))
+            self.done = True
+            return False
+        try:
+            self.items.append(BatchItem(name, processOB(source), ""))
+        except Exception as e:
+            self.items.append(BatchItem(name, "error", str(e)))
+        return True
+
+    def getStatus(self):
+        """ Returns the SAMP parameters of the status notification. """
+        return {"batchId": self.batchId,
+                "count": str(len(self.items)),
+                "items": [{"name": i.name, "status": i.status, "message": i.message}
+                          for i in self.items]}
+
+    def getSummary(self):
+        counts = collections.Counter(i.status for i in self.items)
+        return "Batch %s: %d OB(s) processed (%s)" % (
+            self.batchId, len(self.items),
+            ", ".join("%d %s" % (n, s) for s, n in sorted(counts.items())) or "empty")
@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import os
+
+# can be overridden by the A2P2_CACHE_DIR environment variable
+CACHEDIR = os.path.join(os.path.expanduser("~"), ".a2p2", "cache")
+
+
+def getCacheDir(*subdirs):
+    """
+    Returns the local a2p2 cache directory (or one of its subdirectories).
+    Directories are created if missing.
+    """
+    path = os.path.join(os.environ.get("A2P2_CACHE_DIR", CACHEDIR), *subdirs)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    return path
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+from a2p2.console import ConsoleFacilityUI
+
+
+class CharaConsoleUI(ConsoleFacilityUI):
+
+    """
+    Headless CHARA UI: new entries of the night plan and its
+    optimized schedule are written to the log.
+    """
+
+    def updatePlan(self, session, changes):
+        self.addToLog(session.getSummary())
+        for action, idx, entry in changes:
+            if action == "insert":
+                self.addToLog("#%d/%d %s" % (idx + 1, len(session), entry.text))
+        self.addToLog(str(session.getSchedule()))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import csv
+import glob
+import io
+import json
+import os
+import sys
+
+# format name -> file extension
+FORMATS = {"text": ".txt", "csv": ".csv", "json": ".json"}
+
+CSV_FIELDS = ["lstStart", "name", "baselines", "lstInterval", "windows",
+              "calibrators", "ra", "dec"]
+
+
+def getFormat(filename, default="text"):
+    """ Returns the format of the given filename from its extension. """
+    ext = os.path.splitext(filename)[1].lower()
+    for fmt, fmtExt in FORMATS.items():
+        if ext == fmtExt:
+            return fmt
+    return default
+
+
+def formatWindows(windows):
+    from a2p2.observability import formatLST
+    return ", ".join([formatLST(w[0]) + "-" + formatLST(w[1]) for w in windows])
+
+
+def getRecord(entry):
+    """ Returns the dict exported for one entry of the plan. """
+    return {"lstStart": entry.key[0],
+            "name": entry.name,
+            "baselines": entry.baselines,
+            "lstInterval": entry.lstInterval,
+            "windows": [list(w) for w in entry.windows],
+            "calibrators": list(entry.calibrators),
+            "ra": entry.ra,
+            "dec": entry.dec}
+
+
+def iterText(session):
+    """ Yields the text report of the plan, one entry at a time. """
+    yield session.getSummary()
+    for entry in session.getPlan():
+        yield "----------------------------------------------\n"
+        yield entry.text
+
+
+def iterCSV(session):
+    """ Yields the CSV lines of the plan, one entry at a time. """
+    buffer = io.BytesIO() if sys.version_info[0] == 2 else io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS, lineterminator="\n")
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writeheader()
+    yield flush()
+    for entry in session.getPlan():
+        record = getRecord(entry)
+        record["windows"] = formatWindows(entry.windows)
+        record["calibrators"] = " ".join(entry.calibrators)
+        writer.writerow(record)
+        yield flush()
+
+
+def iterJSON(session):
+    """ Yields the JSON document of the plan, one entry at a time. """
+    yield '{"obCount": %d, "entries": [' % session.obCount
+    sep = "\n"
+    for entry in session.getPlan():
+        yield sep + json.dumps(getRecord(entry), sort_keys=True)
+        sep = ",\n"
+    yield "\n]}\n"
+
+
+ITERATORS = {"text": iterText, "csv": iterCSV, "json": iterJSON}
+
+
+def writeSession(session, out, fmt="text"):
+    """
+    Write the plan of the session to the given file object (or filename)
+    chunk by chunk.
+    """
+    if fmt not in ITERATORS:
+        raise ValueError("Unknown export format '%s', use one of %s" %
+                         (fmt, ", ".join(sorted(ITERATORS))))
+    if not hasattr(out, "write"):
+        with open(out, "w") as f:
+            return writeSession(session, f, fmt)
+    for chunk in ITERATORS[fmt](session):
+        out.write(chunk)
+    out.flush()
+
+
+def loadDirectory(directory, session=None, onError=None):
+    """
+    Add every OB file (*.obxml) of the given directory to a session.
+    onError(filename, exception) is called for the files that can't be loaded
+    (else the exception is raised). Returns the session.
+    """
+    from a2p2.chara.session import CharaSession
+    from a2p2.ob import OB
+
+    if session is None:
+        session = CharaSession()
+    for filename in sorted(glob.glob(os.path.join(directory, "*.obxml"))):
+        try:
+            session.addOB(OB(filename))
+        except Exception as e:
+            if not onError:
+                raise
+            onError(filename, e)
+    return session
+
+
+def exportDirectory(directory, output=None, fmt=None):
+    """
+    Export the plan of the OB files of a directory to output (filename, or
+    stdout if None). The format is given by the output extension if not set.
+    """
+    def onError(filename, e):
+        sys.stderr.write("Skip %s: %s\n" % (filename, e))
+
+    session = loadDirectory(directory, onError=onError)
+    fmt = fmt or (getFormat(output) if output else "text")
+    writeSession(session, output or sys.stdout, fmt)
+    return session
@@ -3,7 +3,11 @@
 __all__ = []
 
 from a2p2.facility import Facility
-from a2p2.chara.gui import CharaUI
+from a2p2.chara.session import CharaSession
+from a2p2 import metrics
+from a2p2 import tracing
+
+import traceback
 
 HELPTEXT = "TODO update this HELP message in a2p2/chara/facility.py"
 
@@ -12,7 +16,14 @@ class CharaFacility(Facility):
 
     def __init__(self, a2p2client):
         Facility.__init__(self, a2p2client, "CHARA", HELPTEXT)
-        self.charaUI = CharaUI(self)
+        # night plan of every received OB
+        self.session = CharaSession()
+        if a2p2client.isHeadless():
+            from a2p2.chara.console import CharaConsoleUI
+            self.charaUI = CharaConsoleUI(self)
+        else:
+            from a2p2.chara.gui import CharaUI
+            self.charaUI = CharaUI(self)
 
     def processOB(self, ob):
         self.a2p2client.ui.addToLog(
@@ -21,13 +32,23 @@ class CharaFacility(Facility):
         self.a2p2client.ui.addToLog(str(ob), False)
 
         # performs operation
-        self.consumeOB(ob)
+        status = self.consumeOB(ob)
 
         # give focus on last updated UI
         self.a2p2client.ui.showFacilityUI(self.charaUI)
+        return status
 
     def consumeOB(self, ob):
-        # for the prototype: just delegate handling to the GUI
-        # we could imagine to store obs in a list and recompute a sorted
-        # summary report e.g.
-        self.charaUI.displayOB(ob)
+        # add the OB to the sorted night plan then let the UI update the
+        # changed entries only
+        try:
+            with tracing.span("plan"):
+                changes = self.session.addOB(ob)
+        except:
+            self.charaUI.ShowErrorMessage(
+                "Error during report generation\n" + traceback.format_exc(limit=1))
+            self.a2p2client.ui.addToLog(traceback.format_exc(), False)
+            return "error"
+        self.charaUI.updatePlan(self.session, changes)
+        metrics.obsSubmitted.inc(facility=self.facilityName)
+        return "added"
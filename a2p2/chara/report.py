@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+
+class CharaReport():
+
+    """
+    Extract the science targets of the OBs sent to CHARA and format their
+    report blocks (see CharaSession, shared by the Tk and console UIs).
+    """
+
+    def get(self, obj, fieldname):
+        if fieldname in obj._fields:
+            return getattr(obj, fieldname)
+        else:
+            return None
+
+    def getTargets(self, ob):
+        """
+        Returns (sciences, cals, windows): the science observation
+        configurations, the calibrators of the schedule (by id) and the LST
+        windows (h) where every science is above the elevation limit.
+        """
+        from a2p2.observability import getObservabilityEngine
+        from a2p2.observability import sexagesimalToDegrees
+
+        # Retrieve all stars (as obsConf) and build sciences list
+        sciences = []
+        targets = {}  # store  ids for futur retrieval in schedule
+        for oc in ob.observationConfiguration:
+            targets[oc.id] = oc
+            if "SCI" in oc.type:
+                sciences.append(oc)
+
+        # Retrieve cals from schedule
+        cals = {}
+        for schedule in ob.observationSchedule.OB:
+            try:  # hack for single element observationSchedule
+                ref = schedule.ref
+            except:
+                ref = schedule
+            target = targets[ref]
+            if "CAL" in target.type:
+                cals[ref] = target
+
+        # TODO check for calibrator only ?
+
+        # compute observability of every science at once
+        windows = getObservabilityEngine("CHARA").getLSTWindows(
+            sexagesimalToDegrees([oc.SCTarget.RA for oc in sciences], hours=True),
+            sexagesimalToDegrees([oc.SCTarget.DEC for oc in sciences]))
+        return sciences, cals, windows
+
+    def formatTarget(self, ob, oc, window, cals):
+        """
+        Returns the report block of one science.
+        """
+        return "".join(self.iterTarget(ob, oc, window, cals))
+
+    def iterTarget(self, ob, oc, window, cals):
+        """
+        Yields the report lines of one science.
+        """
+        from a2p2.observability import formatLST
+
+        sct = oc.SCTarget
+        ftt = self.get(oc, "FTTarget")
+        aot = self.get(oc, "AOTarget")
+        constraints = self.get(oc, "observationConstraints")
+        if constraints and self.get(constraints, "LSTinterval"):
+            lst = constraints.LSTinterval
+        else:
+            lst = "no LST interval"
+        yield lst + " [" + (", ".join([formatLST(w[0]) + "-" + formatLST(w[1])
+                                       for w in window]) or "never") + "]\n"
+        yield "Object:\n"
+        fluxes = ", ".join([e[0] + "=" + e[1]
+                           for e in ob.getFluxes(sct).items()])
+        info = sct.SPECTYP + ", " + sct.PARALLAX
+        yield sct.name + " (" + info + ") : " + fluxes + "\n"
+        if ftt:
+            yield "Fringe Finder:\n"
+            fluxes = ", ".join([e[0] + "=" + e[1]
+                               for e in ob.getFluxes(ftt).items()])
+            yield ftt.name + " : " + fluxes + "\n"
+        if aot:
+            yield "AO Flat Star:\n"
+            fluxes = ", ".join([e[0] + "=" + e[1]
+                               for e in ob.getFluxes(aot).items()])
+            yield aot.name + " : " + fluxes + "\n"
+
+        if len(cals) >= 1:
+            yield "Cals:\n"
+            for cal in cals:
+                yield "- " + cal + "\n"
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import bisect
+import heapq
+import math
+from collections import namedtuple
+
+# default time (h) spent on each science target and its calibrators
+SLOT_DURATION = 1.0
+# default length (h) of the night
+NIGHT_LENGTH = 12.0
+# candidates whose deadline is within this delay (h) of the most urgent
+# one are compared by calibrator sharing then slew
+DEADLINE_SLACK = 0.5
+
+Slot = namedtuple("Slot", ["start", "end", "entry", "slew", "sharedCalibrator"])
+Unscheduled = namedtuple("Unscheduled", ["entry", "reason", "conflicts"])
+
+
+def getSeparation(ra1, dec1, ra2, dec2):
+    """
+    Returns the angular distance (deg) between two positions (deg).
+    """
+    ra1, dec1, ra2, dec2 = map(math.radians, (ra1, dec1, ra2, dec2))
+    h = math.sin((dec2 - dec1) / 2.0) ** 2 + \
+        math.cos(dec1) * math.cos(dec2) * math.sin((ra2 - ra1) / 2.0) ** 2
+    return math.degrees(2.0 * math.asin(min(1.0, math.sqrt(h))))
+
+
+class IntervalIndex(object):
+
+    """
+    Static index of (start, end, item) intervals sorted by start. The running
+    max of the ends stops the backward scan of overlap queries early.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda i: (i[0], i[1]))
+        self.starts = [i[0] for i in self.intervals]
+        self.maxEnds = []
+        maxEnd = float("-inf")
+        for i in self.intervals:
+            maxEnd = max(maxEnd, i[1])
+            self.maxEnds.append(maxEnd)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def overlapping(self, start, end):
+        """
+        Returns the items of the intervals that overlap [start, end[.
+        """
+        items = []
+        idx = bisect.bisect_left(self.starts, end) - 1
+        while idx >= 0 and self.maxEnds[idx] > start:
+            s, e, item = self.intervals[idx]
+            if e > start:
+                items.append(item)
+            idx -= 1
+        items.reverse()
+        return items
+
+
+class ScheduleOptimizer(object):
+
+    """
+    Order the science targets of a CHARA night plan.
+
+    Every target needs one slot of given duration inside one of its
+    observability windows (intersected with its Aspro2 LST interval).
+    Times are counted in hours from nightStart (LST). Targets are scheduled
+    with earliest deadline first: among the targets that are observable now
+    and whose deadline is close to the most urgent one, the target that
+    shares a calibrator with the previous one is preferred, then the one with
+    the smallest slew.
+    """
+
+    def __init__(self, entries, nightStart=None, nightLength=NIGHT_LENGTH,
+                 duration=SLOT_DURATION):
+        self.entries = list(entries)
+        if nightStart is None:
+            nightStart = min([e.key[0] for e in self.entries] or [0.0])
+        self.nightStart = nightStart
+        self.nightLength = nightLength
+        self.duration = duration
+        # one interval per window: (start, end, entry)
+        self.index = IntervalIndex(
+            [(s, e, entry) for entry in self.entries for s, e in self.getIntervals(entry)])
+
+    def toNight(self, lst):
+        return (lst - self.nightStart) % 24.0
+
+    def getIntervals(self, entry):
+        """
+        Returns the (start, end) intervals of the night (h) where the entry
+        can be observed.
+        """
+        windows = [i for w in entry.windows for i in self.unwrap(w)]
+        if entry.lstInterval:
+            from a2p2.observability import parseLSTInterval
+            windows = [(max(s, ls), min(e, le)) for s, e in windows
+                       for ls, le in self.unwrap(parseLSTInterval(entry.lstInterval))]
+        return [(max(s, 0.0), min(e, self.nightLength)) for s, e in windows
+                if min(e, self.nightLength) - max(s, 0.0) >= self.duration]
+
+    def unwrap(self, window):
+        """
+        Returns the intervals (h from night start) of the LST window: a
+        window already open at night start also gives the part that
+        started the day before.
+        """
+        start = self.toNight(window[0])
+        end = start + ((window[1] - window[0]) % 24.0 or 24.0)
+        if end > 24.0:
+            return [(start, end), (start - 24.0, end - 24.0)]
+        return [(start, end)]
+
+    def getObservable(self, start, end=None):
+        """
+        Returns the entries observable between start and end (h from night start).
+        """
+        if end is None:
+            end = start + self.duration
+        return self.index.overlapping(start, end)
+
+    def optimize(self):
+        """
+        Returns the Schedule of the entries.
+        """
+        releases = self.index.intervals
+        heap = []
+        scheduled = {}
+        slots = []
+        t = 0.0
+        r = 0
+        previous = None
+        while True:
+            # release every window started at t
+            while r < len(releases) and releases[r][0] <= t:
+                s, e, entry = releases[r]
+                heapq.heappush(heap, (e - self.duration, r, entry))
+                r += 1
+            # drop closed or already served windows
+            while heap and (heap[0][0] < t or heap[0][2].key in scheduled):
+                heapq.heappop(heap)
+            if not heap:
+                if r == len(releases):
+                    break
+                t = releases[r][0]
+                continue
+
+            # compare the urgent candidates
+            candidates = [heapq.heappop(heap)]
+            while heap and heap[0][0] <= candidates[0][0] + DEADLINE_SLACK:
+                item = heapq.heappop(heap)
+                if item[2].key not in scheduled:
+                    candidates.append(item)
+            best = min(candidates, key=lambda c: self.getCost(previous, c))
+            for c in candidates:
+                if c is not best:
+                    heapq.heappush(heap, c)
+
+            entry = best[2]
+            slew, shared = self.getTransition(previous, entry)
+            slots.append(Slot(t, t + self.duration, entry, slew, shared))
+            scheduled[entry.key] = True
+            previous = entry
+            t += self.duration
+
+        return Schedule(self, slots)
+
+    def getTransition(self, previous, entry):
+        if previous is None:
+            return 0.0, False
+        slew = getSeparation(previous.ra, previous.dec, entry.ra, entry.dec)
+        shared = bool(set(previous.calibrators) & set(entry.calibrators))
+        return slew, shared
+
+    def getCost(self, previous, candidate):
+        slew, shared = self.getTransition(previous, candidate[2])
+        return (not shared, slew, candidate[0])
+
+
+class Schedule(object):
+
+    """
+    Result of the ScheduleOptimizer: slots in time order, utilization of the
+    night and unscheduled targets with the scheduled ones that took their
+    windows.
+    """
+
+    def __init__(self, optimizer, slots):
+        self.optimizer = optimizer
+        self.slots = slots
+        slotIndex = IntervalIndex([(s.start, s.end, s.entry) for s in slots])
+        done = set(s.entry.key for s in slots)
+        self.unscheduled = []
+        for entry in optimizer.entries:
+            if entry.key in done:
+                continue
+            intervals = optimizer.getIntervals(entry)
+            if not intervals:
+                self.unscheduled.append(Unscheduled(
+                    entry, "not observable during the night", []))
+                continue
+            conflicts = []
+            for s, e in intervals:
+                conflicts += [c.name for c in slotIndex.overlapping(s, e)
+                              if c.name not in conflicts]
+            self.unscheduled.append(Unscheduled(
+                entry, "windows taken by other targets", conflicts))
+
+    def getUtilization(self):
+        return sum(s.end - s.start for s in self.slots) / self.optimizer.nightLength
+
+    def getSlew(self):
+        return sum(s.slew for s in self.slots)
+
+    def __str__(self):
+        from a2p2.observability import formatLST
+
+        optimizer = self.optimizer
+        buffer = "Schedule from LST %s: %d/%d target(s), %d%% of %.1fh used, total slew %.0f deg\n" % (
+            formatLST(optimizer.nightStart), len(self.slots), len(optimizer.entries),
+            round(100 * self.getUtilization()), optimizer.nightLength, self.getSlew())
+        for s in self.slots:
+            buffer += "%s-%s %-20s %-16s slew %5.1f deg%s\n" % (
+                formatLST(optimizer.nightStart + s.start),
+                formatLST(optimizer.nightStart + s.end),
+                s.entry.name, s.entry.baselines, s.slew,
+                " (shared cal)" if s.sharedCalibrator else "")
+        for u in self.unscheduled:
+            buffer += "not scheduled: %s, %s%s\n" % (
+                u.entry.name, u.reason,
+                " (" + ", ".join(u.conflicts) + ")" if u.conflicts else "")
+        return buffer
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import bisect
+from collections import namedtuple
+
+from a2p2.chara.report import CharaReport
+
+# science targets without LST interval nor window are put at the end
+NO_LST = 24.0
+
+# ra and dec in degrees
+PlanEntry = namedtuple("PlanEntry", ["key", "name", "baselines", "lstInterval",
+                                     "windows", "calibrators", "ra", "dec", "text"])
+
+
+def getLSTStart(lstInterval, windows):
+    """
+    Returns the LST (h) used to sort a target: start of its Aspro2 LST
+    interval, else start of its first observability window.
+    """
+    if lstInterval:
+        from a2p2.observability import parseLSTInterval
+        return parseLSTInterval(lstInterval)[0]
+    if windows:
+        return windows[0][0]
+    return NO_LST
+
+
+class CharaSession(object):
+
+    """
+    Night plan built from every OB received for CHARA.
+
+    Science targets are kept sorted by LST start in plain lists: the position
+    of a new one is found by bisection (O(log n)) but the list insertion
+    itself shifts the following entries (O(n)), which is cheap for the size
+    of a night plan. addOB() returns the changes so that views only update
+    the related blocks. A target sent again with the same baselines replaces its
+    previous entry. Entries are also indexed by baselines and calibrators.
+    """
+
+    def __init__(self):
+        self.report = CharaReport()
+        self.keys = []      # sorted (lstStart, seq)
+        self.entries = []   # entries in the same order as keys
+        self.byTarget = {}  # (name, baselines) -> entry
+        self.byBaselines = {}   # baselines -> sorted keys
+        self.byCalibrator = {}  # calibrator -> set of (name, baselines)
+        self.seq = 0
+        self.obCount = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def getEntries(self, ob):
+        """
+        Returns the new entries of the science targets of the given OB.
+        """
+        from a2p2.observability import sexagesimalToDegrees
+
+        baselines = ob.interferometerConfiguration.stations
+        sciences, cals, windows = self.report.getTargets(ob)
+        ras = sexagesimalToDegrees(
+            [oc.SCTarget.RA for oc in sciences], hours=True)
+        decs = sexagesimalToDegrees([oc.SCTarget.DEC for oc in sciences])
+        entries = []
+        for oc, window, ra, dec in zip(sciences, windows, ras, decs):
+            constraints = self.report.get(oc, "observationConstraints")
+            lstInterval = constraints and self.report.get(
+                constraints, "LSTinterval")
+            self.seq += 1
+            key = (getLSTStart(lstInterval, window), self.seq)
+            text = "Baselines: " + baselines + "\n" + \
+                self.report.formatTarget(ob, oc, window, cals)
+            entries.append(PlanEntry(key, oc.SCTarget.name, baselines, lstInterval,
+                                     window, tuple(cals.keys()), float(ra), float(dec), text))
+        return entries
+
+    def addOB(self, ob):
+        """
+        Add the science targets of the given OB to the plan.
+
+        Returns the list of changes to apply in order to a view of the plan:
+        ("remove", index, entry) and ("insert", index, entry).
+        """
+        self.obCount += 1
+        changes = []
+        for entry in self.getEntries(ob):
+            old = self.byTarget.get((entry.name, entry.baselines))
+            if old:
+                changes.append(("remove", self.remove(old), old))
+            changes.append(("insert", self.insert(entry), entry))
+        return changes
+
+    def insert(self, entry):
+        """ Insert the entry and returns its index (O(n) list insertion). """
+        idx = bisect.bisect(self.keys, entry.key)
+        self.keys.insert(idx, entry.key)
+        self.entries.insert(idx, entry)
+        target = (entry.name, entry.baselines)
+        self.byTarget[target] = entry
+        bisect.insort(self.byBaselines.setdefault(
+            entry.baselines, []), entry.key)
+        for cal in entry.calibrators:
+            self.byCalibrator.setdefault(cal, set()).add(target)
+        return idx
+
+    def remove(self, entry):
+        idx = bisect.bisect_left(self.keys, entry.key)
+        del self.keys[idx]
+        del self.entries[idx]
+        target = (entry.name, entry.baselines)
+        del self.byTarget[target]
+        keys = self.byBaselines[entry.baselines]
+        del keys[bisect.bisect_left(keys, entry.key)]
+        if not keys:
+            del self.byBaselines[entry.baselines]
+        for cal in entry.calibrators:
+            self.byCalibrator[cal].discard(target)
+            if not self.byCalibrator[cal]:
+                del self.byCalibrator[cal]
+        return idx
+
+    def getPlan(self):
+        """ Returns every entry sorted by LST start. """
+        return list(self.entries)
+
+    def getByBaselines(self, baselines):
+        """ Returns the entries observed with given baselines sorted by LST start. """
+        keys = self.byBaselines.get(baselines, [])
+        return [self.entries[bisect.bisect_left(self.keys, k)] for k in keys]
+
+    def getByLST(self, start, end):
+        """ Returns the entries whose LST start is in [start, end[. """
+        lo = bisect.bisect_left(self.keys, (start,))
+        hi = bisect.bisect_left(self.keys, (end,))
+        return self.entries[lo:hi]
+
+    def getCalibratorUsers(self, calibrator):
+        """ Returns the (name, baselines) of the sciences using the given calibrator. """
+        return sorted(self.byCalibrator.get(calibrator, ()))
+
+    def getSchedule(self, **kwargs):
+        """
+        Returns the optimized Schedule of the plan, see ScheduleOptimizer for
+        the keyword arguments.
+        """
+        from a2p2.chara.scheduler import ScheduleOptimizer
+        return ScheduleOptimizer(self.entries, **kwargs).optimize()
+
+    def getSummary(self):
+        return "Night plan: %d science target(s) from %d OB(s), sorted by LST\n" % (
+            len(self.entries), self.obCount)
@@ -3,14 +3,42 @@
 __all__ = ['A2p2Client']
 
 from a2p2.facility import FacilityManager
-from a2p2.gui import MainWindow
-from a2p2.samp import A2p2SampClient
 from a2p2.ob import OB
+from a2p2.startup import timed
+from a2p2 import metrics
+from a2p2 import tracing
 from a2p2 import __version__
+from a2p2.batch import BATCH_MTYPE
+from a2p2.batch import urlToPath
+import collections
+import os
 import sys
 import time
 import traceback
 
+if sys.version_info[0] == 2:
+    from ConfigParser import RawConfigParser
+else:
+    from configparser import RawConfigParser
+
+# time (s) spent on the OBs of queued batches by each loop of run(), the UI
+# is refreshed between two loops
+BATCH_STEP_BUDGET = 0.05
+
+
+def loadConfig(filename=None):
+    """
+    Returns the parsed configuration file (empty if filename is None).
+
+    IOError raised if the file can't be read.
+    """
+    config = RawConfigParser()
+    # keep option names case (e.g. containerId)
+    config.optionxform = str
+    if filename and not config.read(filename):
+        raise IOError("can't read configuration file '%s'" % filename)
+    return config
+
 
 class A2p2Client():
 
@@ -20,18 +48,41 @@ class A2p2Client():
            a2p2.run()
            ..."""
 
-    def __init__(self, fakeAPI=False):
-        """Create the A2p2 client."""
+    def __init__(self, fakeAPI=False, headless=False, configFile=None):
+        """Create the A2p2 client.
+
+        headless: use the console UI (messages sent to the 'a2p2' logger)
+        instead of the Tk window.
+        configFile: ini file with facility settings (e.g. P2 credentials
+        and container used in headless mode).
+        """
 
         self.username = None
         self.apiName = ""
         if fakeAPI:
             self.apiName = "fakeAPI"
 
-        self.ui = MainWindow(self)
+        self.headless = headless
+        self.config = loadConfig(configFile)
+
+        # tkinter and astropy.samp are loaded here
+        with timed("UI"):
+            if headless:
+                from a2p2.console import ConsoleUI
+                self.ui = ConsoleUI(self)
+            else:
+                from a2p2.gui import MainWindow
+                self.ui = MainWindow(self)
         # Instantiate the samp client and connect to the hub later
-        self.a2p2SampClient = A2p2SampClient()
-        self.facilityManager = FacilityManager(self)
+        with timed("A2p2SampClient"):
+            from a2p2.samp import A2p2SampClient
+            self.a2p2SampClient = A2p2SampClient()
+        with timed("FacilityManager"):
+            self.facilityManager = FacilityManager(self)
+        # batch messages being processed
+        self.batches = collections.deque()
+        self.messageListeners = []
+        self.registerGauges()
 
         pass
 
@@ -60,6 +111,14 @@ class A2p2Client():
         apis = "\n- ".join(["Supported APIs:", "TBD"])
         return """a2p2 client\n%s\n%s\n""" % (instruments, apis)
 
+    def isHeadless(self):
+        return self.headless
+
+    def getConfig(self, section, option, default=None):
+        if self.config.has_option(section, option):
+            return self.config.get(section, option)
+        return default
+
     def changeSampStatus(self, connected_flag):
         self.sampConnected = connected_flag
 
@@ -78,6 +137,136 @@ class A2p2Client():
         else:
             print ("progress is  %s %%" % (perc))
 
+    def registerGauges(self):
+        """ Expose the queue depths of this client as gauges (see a2p2.metrics). """
+        metrics.REGISTRY.gauge("a2p2_samp_queue_depth", "SAMP messages waiting for the main loop.",
+                               self.a2p2SampClient.get_queue_size)
+        metrics.REGISTRY.gauge("a2p2_batch_queue_depth", "Batches not yet fully processed.",
+                               lambda: len(self.batches))
+        metrics.REGISTRY.gauge("a2p2_pending_obs", "OBs waiting for login or container selection.",
+                               self.facilityManager.getPendingOBCount)
+        metrics.REGISTRY.gauge("a2p2_ui_queue_depth", "Calls waiting for the UI thread.",
+                               self.ui.events.qsize)
+
+    def processMessage(self, message):
+        """
+        Process a received SampMessage: batches are queued, single OBs are
+        processed at once.
+        """
+        status = None
+        metrics.sampMessages.inc(mtype=message.mtype)
+        if message.mtype == BATCH_MTYPE:
+            self.queueBatch(message.params, message.sender, message.traceId)
+            status = "queued"
+        else:
+            url = urlToPath(message.params.get('url', ''))
+            trace = tracing.Trace(message.traceId, os.path.basename(url),
+                                  message.received)
+            with tracing.trace(trace, self.logTrace):
+                tracing.addSpan("wait", trace.start, time.time())
+                status = self.processURL(url)
+                trace.status = status
+        for listener in self.messageListeners:
+            listener(message, status)
+
+    def processURL(self, url):
+        """ Load the OB of the given url and send it to its facility. Returns its status. """
+        metrics.obsReceived.inc()
+        try:
+            ob = self.parseOB(url)
+            with tracing.span("route"):
+                return self.countStatus(self.facilityManager.processOB(ob))
+        except:
+            self.ui.addToLog(
+                "Exception during ob creation: " + traceback.format_exc(), False)
+            self.ui.addToLog("Can't process last OB")
+            return self.countStatus("error")
+
+    def parseOB(self, source):
+        with tracing.span("parse"), metrics.parseTime.time():
+            ob = OB(source)
+        metrics.obsParsed.inc()
+        return ob
+
+    def countStatus(self, status):
+        """ Count rejected OBs (submitted ones are counted by facilities). """
+        if status in ("error", "unsupported"):
+            metrics.obsRejected.inc(reason=status)
+        return status
+
+    def logTrace(self, summary):
+        self.ui.addToLog(summary, False)
+
+    def addMessageListener(self, listener):
+        """ listener(message, status) is called once each message is processed. """
+        self.messageListeners.append(listener)
+
+    def startRecording(self, directory):
+        """
+        Record every received SAMP message and its OB files in the given
+        session bundle (see a2p2.replay).
+        """
+        from a2p2.replay import SessionRecorder
+        self.a2p2SampClient.setRecorder(SessionRecorder(directory))
+        self.ui.addToLog("Recording SAMP messages in %s" % directory)
+
+    def queueBatch(self, params, sender=None, traceId=None):
+        """
+        Queue the OBs of a batch message, they are processed by the loops
+        of run() (see processBatchStep). OBs are traced with traceId.<index>.
+        """
+        from a2p2.batch import Batch
+        batch = Batch(params.get("batchId", ""), params, sender)
+        batch.traceId = traceId or tracing.newTraceId()
+        self.batches.append(batch)
+        self.ui.addToLog("Received batch %s" % batch.batchId)
+        return batch
+
+    def processBatchStep(self, budget=BATCH_STEP_BUDGET):
+        """
+        Process the OBs of the queued batches until the budget (s) is spent
+        (at least one OB) or every batch is done.
+        """
+        limit = time.time() + budget
+        while self.batches:
+            self.processBatchItem()
+            if time.time() >= limit:
+                break
+
+    def processBatchItem(self):
+        """
+        Process the next OB of the current batch. The status of every OB is
+        sent to the sender of the batch once done.
+        """
+        batch = self.batches[0]
+        if batch.step(self.processBatchOB):
+            return
+        self.batches.popleft()
+        self.ui.addToLog(batch.getSummary())
+        if batch.sender:
+            try:
+                self.a2p2SampClient.notify_batch_status(batch)
+            except:
+                self.ui.addToLog("Can't send status of batch %s: %s" %
+                                 (batch.batchId, traceback.format_exc()), False)
+
+    def processBatchOB(self, source):
+        batch = self.batches[0]
+        label = source if hasattr(source, "startswith") else getattr(source, "name", "")
+        trace = tracing.Trace("%s.%d" % (batch.traceId, len(batch.items) + 1),
+                              os.path.basename(str(label)))
+        metrics.obsReceived.inc()
+        with tracing.trace(trace, self.logTrace):
+            try:
+                ob = self.parseOB(source)
+            except:
+                # reported by the batch
+                self.countStatus("error")
+                raise
+            with tracing.span("route"):
+                trace.status = self.countStatus(self.facilityManager.processOB(ob))
+        return trace.status
+
     def run(self):
         # bool of status change
         flag = [0]
@@ -95,15 +284,19 @@ class A2p2Client():
         while loop_cnt >= 0:
             try:
                 loop_cnt += 1
-                time.sleep(delay)
+                # no wait while batches are processed
+                if not self.batches:
+                    time.sleep(delay)
 
                 self.ui.loop()
 
                 if not self.a2p2SampClient.is_connected() and loop_cnt % each == 0:
                     try:
                         self.a2p2SampClient.connect()
+                        metrics.sampConnects.inc()
                         self.ui.setSampId(self.a2p2SampClient.get_public_id())
                     except:
+                        metrics.sampConnectFailures.inc()
                         self.ui.setSampId(None)
                         if warnForAspro:
                             warnForAspro = False
@@ -111,14 +304,11 @@ class A2p2Client():
                                 "\nPlease launch Aspro2 to submit your OBs.")
                         pass  # TODO test for other exception than SAMPHubError(u'Unable to find a running SAMP Hub.',)
 
+                # OBs of the queued batches for a time budget per loop
+                self.processBatchStep()
+
                 if self.a2p2SampClient.has_message():
-                    try:
-                        ob = OB(self.a2p2SampClient.get_ob_url())
-                        self.facilityManager.processOB(ob)
-                    except:
-                        self.ui.addToLog(
-                            "Exception during ob creation: " + traceback.format_exc(), False)
-                        self.ui.addToLog("Can't process last OB")
+                    self.processMessage(self.a2p2SampClient.get_message())
 
                     # always clear previous received message
                     self.a2p2SampClient.clear_message()
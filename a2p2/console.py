@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import logging
+import sys
+import threading
+
+from a2p2 import metrics
+from a2p2 import tracing
+
+if sys.version_info[0] == 2:
+    import Queue as queue
+else:
+    import queue
+
+logger = logging.getLogger("a2p2")
+
+
+class ConsoleUI():
+
+    """
+    Headless replacement of the MainWindow: messages go to the 'a2p2' logger
+    and calls made from other threads are run by loop() in the main thread,
+    as MainWindow does with the Tk thread.
+    """
+
+    def __init__(self, a2p2client):
+        self.a2p2client = a2p2client
+        self.requestAbort = False
+        self.mainThread = threading.current_thread()
+        self.events = queue.Queue()
+        self.lastProgress = None
+        self.helps = {}
+
+    def loop(self):
+        """ Run queued events. """
+        if self.events.empty():
+            return
+        with metrics.uiFlushTime.time(what="events"):
+            self.runEvents()
+
+    def runEvents(self):
+        try:
+            while True:
+                func, args = self.events.get_nowait()
+                try:
+                    func(*args)
+                except Exception:
+                    logger.exception("error in %s" % func)
+        except queue.Empty:
+            pass
+
+    def isTkThread(self):
+        return threading.current_thread() is self.mainThread
+
+    def runInTkThread(self, func, *args):
+        """ Call func(*args) now on the main thread, else queue it for the main thread. """
+        if self.isTkThread():
+            return func(*args)
+        self.events.put((func, args))
+
+    def setSampId(self, id):
+        if id:
+            logger.info("connected to SAMP hub as %s" % id)
+
+    def addHelp(self, tabname, txt):
+        self.helps[tabname] = txt
+
+    def addToLog(self, text, displayString=True):
+        if displayString:
+            logger.info(text)
+        else:
+            logger.debug(text)
+
+    def ShowErrorMessage(self, text, source=None):
+        self.notify("Error", text, source)
+
+    def ShowWarningMessage(self, text, source=None):
+        self.notify("Warning", text, source)
+
+    def ShowInfoMessage(self, text, source=None):
+        self.notify("Info", text, source)
+
+    def notify(self, severity, text, source=None):
+        with tracing.span("notify"):
+            if source:
+                text = "[%s] %s" % (source, text)
+            level = {"Error": logging.ERROR,
+                     "Warning": logging.WARNING}.get(severity, logging.INFO)
+            logger.log(level, text)
+
+    def setProgress(self, perc):
+        if not self.isTkThread():
+            return self.runInTkThread(self.setProgress, perc)
+        if perc > 1:
+            perc = perc / 100.0
+        perc = int(perc * 100)
+        if perc != self.lastProgress:
+            self.lastProgress = perc
+            logger.debug("progress %d%%" % perc)
+
+    def showFacilityUI(self, facilityUI):
+        pass
+
+
+class ConsoleFacilityUI():
+
+    """
+    Headless replacement of the FacilityUI.
+    """
+
+    def __init__(self, facility):
+        self.facility = facility
+        self.a2p2client = facility.a2p2client
+
+    def addToLog(self, text, displayString=True):
+        self.a2p2client.ui.addToLog(text, displayString)
+
+    def ShowErrorMessage(self, text, source=None):
+        self.a2p2client.ui.ShowErrorMessage(
+            text, source or self.facility.facilityName)
+
+    def ShowWarningMessage(self, text, source=None):
+        self.a2p2client.ui.ShowWarningMessage(
+            text, source or self.facility.facilityName)
+
+    def ShowInfoMessage(self, text, source=None):
+        self.a2p2client.ui.ShowInfoMessage(
+            text, source or self.facility.facilityName)
+
+    def setProgress(self, perc):
+        self.a2p2client.ui.setProgress(perc)
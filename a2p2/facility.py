@@ -3,6 +3,11 @@
 __all__ = []
 
 from a2p2.instrument import Instrument
+from a2p2.plugins import getFacilityPlugins
+from a2p2.plugins import getInstrumentLoaders
+from a2p2.startup import timed
+
+import collections
 
 
 class FacilityManager():
@@ -15,19 +20,51 @@ class FacilityManager():
         self.apiName = a2p2client.apiName
         self.a2p2client = a2p2client
 
-        # define facilities
+        # define facilities from the plugins (see a2p2.plugins): they are
+        # imported and built with their UI on first OB or first display of
+        # their help
         self.facilities = {}
-        from a2p2.chara.facility import CharaFacility
-        self.registerFacility(CharaFacility(self.a2p2client))
-        from a2p2.vlti.facility import VltiFacility
-        self.registerFacility(VltiFacility(self.a2p2client))
+        self.facilityFactories = collections.OrderedDict()
+        self.facilityInsnames = {}
+        for plugin in getFacilityPlugins().values():
+            self.registerFacilityFactory(
+                plugin.name, LoaderFactory(plugin.loader), plugin.instruments.keys())
         # with default one
         self.defaultFacility = Facility(self.a2p2client, "Dumm-facilit-y", "")
 
+    def registerFacilityFactory(self, facilityName, factory, insnames=()):
+        """
+        factory(a2p2client) must return the facility object. insnames are
+        the supported instruments (any if empty) checked before building it.
+        """
+        self.facilityFactories[facilityName] = factory
+        self.facilityInsnames[facilityName] = list(insnames)
+        self.a2p2client.ui.addHelp(
+            facilityName, lambda: self.getFacility(facilityName).getHelp())
+
     def registerFacility(self, facilityObject):
         self.facilities[facilityObject.facilityName] = facilityObject
-        self.a2p2client.ui.addHelp(
-            facilityObject.facilityName, facilityObject.facilityHelp)
+
+    def getPendingOBCount(self):
+        """ Returns the number of OBs queued by the built facilities. """
+        return sum(len(getattr(f, "pendingOBs", ())) for f in list(self.facilities.values()))
+
+    def hasFacility(self, facilityName):
+        return facilityName in self.facilityFactories or facilityName in self.facilities
+
+    def getSupportedInsnames(self, facilityName):
+        """ Returns the supported instruments of a facility without building it. """
+        if facilityName in self.facilities:
+            return self.facilities[facilityName].getSupportedInsnames()
+        return self.facilityInsnames.get(facilityName, [])
+
+    def getFacility(self, facilityName):
+        """ Returns the given facility, built on first call. """
+        if facilityName not in self.facilities:
+            factory = self.facilityFactories[facilityName]
+            with timed(facilityName + " facility"):
+                self.registerFacility(factory(self.a2p2client))
+        return self.facilities[facilityName]
 
     def get_status(self):
         status = []
@@ -39,23 +76,44 @@ class FacilityManager():
         return " | ".join(status)
 
     def processOB(self, ob):
-        """ Test instrument on facility that registerInstrument() before OB forward for specialized handling."""
+        """
+        Test instrument on facility that registerInstrument() before OB forward for specialized handling.
+        Returns the status given by the facility, or 'unsupported'.
+        """
         interferometer = ob.interferometerConfiguration.name
         insname = ob.instrumentConfiguration.name
 
-        if interferometer in self.facilities:
-            facility = self.facilities[interferometer]
+        if self.hasFacility(interferometer):
+            supportedIns = self.getSupportedInsnames(interferometer)
         else:
-            facility = self.defaultFacility
+            supportedIns = self.defaultFacility.getSupportedInsnames()
 
-        supportedIns = facility.getSupportedInsnames()
         if len(supportedIns) == 0 or insname in supportedIns:
             self.a2p2client.ui.addToLog(
                 "Received OB for '" + insname + "@" + interferometer + "' ")
-            facility.processOB(ob)
+            if self.hasFacility(interferometer):
+                facility = self.getFacility(interferometer)
+            else:
+                facility = self.defaultFacility
+            return facility.processOB(ob) or "processed"
         else:
             self.a2p2client.ui.ShowErrorMessage("Received OB for unsupported instrument \n" +
                                                 insname + " @ " + interferometer + "\n" + "Supported instrument(s): " + ", ".join(supportedIns))
+            return "unsupported"
+
+
+class LoaderFactory():
+
+    """
+    Factory that imports the class of the given plugin loader on first call
+    and returns a new instance of it.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __call__(self, *args):
+        return self.loader.load()(*args)
 
 
 # TODO move to a dedicated source file
@@ -66,32 +124,59 @@ class Facility():
         self.facilityName = facilityName
         self.facilityHelp = facilityHelp
         self.facilityInstruments = {}
+        # instruments of the plugins are built on first use
+        self.instrumentFactories = collections.OrderedDict()
+        for insname, loader in getInstrumentLoaders(facilityName).items():
+            self.registerInstrumentFactory(insname, LoaderFactory(loader))
 
     def processOB(self, ob):
-        """ Please override this method in your facility class to handle incoming OB. """
+        """
+        Please override this method in your facility class to handle incoming OB.
+        Returns the status of the OB (e.g. 'submitted', 'error').
+        """
         interferometer = ob.interferometerConfiguration.name
         self.a2p2client.ui.addToLog(
             "'" + interferometer + "' interferometer not supported by A2P2")
+        return "unsupported"
+
+    def isIdle(self):
+        """ Returns False while OBs are waiting or being submitted. """
+        return True
 
     def registerInstrument(self, instrument):
         self.facilityInstruments[instrument.getName()] = instrument
 
+    def registerInstrumentFactory(self, insname, factory):
+        """ factory(facility) must build the instrument (that registers itself). """
+        self.instrumentFactories[insname] = factory
+
     def getSupportedInsnames(self):
-        return self.facilityInstruments.keys()
+        insnames = list(self.instrumentFactories.keys())
+        return insnames + [i for i in self.facilityInstruments if i not in insnames]
 
     def hasSupportedInsname(self, insname):
         # ... we may log failures
         return insname in self.getSupportedInsnames()
 
     def getSupportedInstruments(self):
-        return self.facilityInstruments.values()
+        """ Returns every instrument, building the missing ones. """
+        return [self.getInstrument(i) for i in self.getSupportedInsnames()]
 
     def getInstrument(self, insname):
+        """ Returns the given instrument, built on first call. """
+        if insname not in self.facilityInstruments:
+            factory = self.instrumentFactories[insname]
+            with timed(insname + " instrument"):
+                factory(self)
         return self.facilityInstruments[insname]
 
     def getName(self):
         return self.facilityName
 
+    def getHelp(self):
+        """ Override me to complete the help text, called on first display. """
+        return self.facilityHelp
+
     def getStatus(self):
         """ Please override this method in your facility class to include status in the API entry of the main status bar. """
         return None
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import zlib
+
+from a2p2.cache import getCacheDir
+
+# subdirectory of the a2p2 cache for the fetched documents
+CACHE_SUBDIR = "urls"
+# size of the chunks read from the network
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = 30
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def isRemote(url):
+    return url.startswith("http://") or url.startswith("https://")
+
+
+class GzipReader(object):
+
+    """
+    Decompress a gzip stream chunk by chunk.
+    """
+
+    def __init__(self, stream, head=b""):
+        self.stream = stream
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.pending = self.decompressor.decompress(head) if head else b""
+        self.eof = False
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = sys.maxsize
+        while len(self.pending) < size and not self.eof:
+            chunk = self.stream.read(CHUNK_SIZE)
+            if chunk:
+                self.pending += self.decompressor.decompress(chunk)
+            else:
+                self.pending += self.decompressor.flush()
+                self.eof = True
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
+class HeadReader(object):
+
+    """
+    Give back the bytes already read to detect the compression.
+    """
+
+    def __init__(self, stream, head):
+        self.stream = stream
+        self.head = head
+
+    def read(self, size=-1):
+        if self.head:
+            if size is None or size < 0:
+                data, self.head = self.head + self.stream.read(), b""
+                return data
+            data, self.head = self.head[:size], self.head[size:]
+            if data:
+                return data
+        return self.stream.read(size)
+
+    def close(self):
+        self.stream.close()
+
+
+class CachingReader(object):
+
+    """
+    Read a stream and write what is read to a temporary file that replaces
+    the cached document once the stream has been read up to its end.
+    """
+
+    def __init__(self, stream, cache, url, validators):
+        self.stream = stream
+        self.cache = cache
+        self.url = url
+        self.validators = validators
+        fd, self.tmpname = tempfile.mkstemp(dir=cache.directory)
+        self.tmp = os.fdopen(fd, "wb")
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if self.tmp:
+            if data:
+                self.tmp.write(data)
+            # read to the end
+            if (not data and size != 0) or size is None or size < 0:
+                self.commit()
+        return data
+
+    def commit(self):
+        self.tmp.close()
+        self.tmp = None
+        self.cache.store(self.url, self.tmpname, self.validators)
+
+    def close(self):
+        if self.tmp:
+            # partially read: keep the previous cache entry
+            self.tmp.close()
+            self.tmp = None
+            os.remove(self.tmpname)
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class URLCache(object):
+
+    """
+    Documents fetched from urls, stored with their ETag and Last-Modified
+    headers to be revalidated with conditional requests.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or getCacheDir(CACHE_SUBDIR)
+
+    def getPath(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def getValidators(self, url):
+        """ Returns the cached headers of the url ({} if not cached). """
+        path = self.getPath(url)
+        try:
+            with open(path + ".json") as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if meta.get("url") != url or not os.path.isfile(path):
+            return {}
+        return meta.get("validators", {})
+
+    def store(self, url, filename, validators):
+        path = self.getPath(url)
+        _replace(filename, path)
+        with open(path + ".json", "w") as f:
+            json.dump({"url": url, "validators": validators}, f)
+
+    def open(self, url):
+        return open(self.getPath(url), "rb")
+
+
+def _replace(src, dst):
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def openURL(url, cache=None, timeout=TIMEOUT):
+    """
+    Returns a file object that streams the (decompressed) document of the
+    given url. Remote documents are cached and revalidated with their ETag or
+    Last-Modified headers; a not modified document is read from the cache.
+    """
+    if not isRemote(url):
+        f = open(url, "rb")
+        head = f.read(len(GZIP_MAGIC))
+        f.seek(0)
+        return GzipReader(f) if head == GZIP_MAGIC else f
+
+    # urllib (http.client, email) is only loaded for remote documents
+    if sys.version_info[0] == 2:
+        from urllib2 import HTTPError, Request, urlopen
+    else:
+        from urllib.request import Request, urlopen
+        from urllib.error import HTTPError
+
+    cache = cache or URLCache()
+    validators = cache.getValidators(url)
+    request = Request(url, headers={"Accept-Encoding": "gzip"})
+    if "etag" in validators:
+        request.add_header("If-None-Match", validators["etag"])
+    if "lastModified" in validators:
+        request.add_header("If-Modified-Since", validators["lastModified"])
+    try:
+        response = urlopen(request, timeout=timeout)
+    except HTTPError as e:
+        if e.code == 304 and validators:
+            return cache.open(url)
+        raise
+
+    headers = response.info()
+    newValidators = {}
+    if headers.get("ETag"):
+        newValidators["etag"] = headers.get("ETag")
+    if headers.get("Last-Modified"):
+        newValidators["lastModified"] = headers.get("Last-Modified")
+
+    # gzip content encoding or gzip document
+    head = response.read(len(GZIP_MAGIC))
+    if head == GZIP_MAGIC:
+        stream = GzipReader(response, head)
+    else:
+        stream = HeadReader(response, head)
+    if not newValidators:
+        return stream
+    return CachingReader(stream, cache, url, newValidators)
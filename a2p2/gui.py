@@ -4,17 +4,36 @@ __all__ = []
 
 import sys
 from a2p2 import __version__
+from a2p2 import metrics
+from a2p2 import tracing
 
 if sys.version_info[0] == 2:
     from Tkinter import *
     from tkMessageBox import *
     import ttk
+    import Queue as queue
 else:
     from tkinter import *
     from tkinter.messagebox import *
     import tkinter.ttk as ttk
+    import queue
 
+import collections
+import threading
 import time
+import traceback
+
+# max number of entries kept by the log ring buffer
+LOG_MAXLEN = 5000
+# max number of lines kept in the log widget
+LOG_MAXLINES = 10000
+# delay (ms) between two flushes of pending log entries (10 frames/s)
+LOG_FLUSH_DELAY = 100
+# delay (ms) between two drains of the events posted by other threads
+EVENT_DRAIN_DELAY = 50
+
+# severities of the notifications
+SEVERITIES = ("Error", "Warning", "Info")
 
 HELPTEXT = """This application provides the link between ASPRO (that you should have started) and interferometers facilities.
 
@@ -31,6 +50,12 @@ class MainWindow():
 
         self.window = Tk()
 
+        # every call made outside of the Tk thread is queued and drained on
+        # the Tk thread. Progress updates are coalesced
+        self.tkThread = threading.current_thread()
+        self.events = queue.Queue()
+        self.window.after(EVENT_DRAIN_DELAY, self.drainEvents)
+
         try:
             dpi_value = self.window.winfo_fpixels('1i')
             # print("dpi: " + str(dpi_value));
@@ -44,6 +69,18 @@ class MainWindow():
 
         self.logFrame = Frame(self.notebook)
 
+        # log entries are (text, isDetail) kept in a bounded ring buffer and
+        # flushed to the widget by batch. Details are only displayed on demand
+        self.logEntries = collections.deque(maxlen=LOG_MAXLEN)
+        self.pendingLogEntries = []
+        self.logFlushScheduled = False
+        self.showLogDetails = IntVar()
+        self.showLogDetails.set(0)
+        logToolbar = Frame(self.logFrame)
+        Checkbutton(logToolbar, text="Show details", variable=self.showLogDetails,
+                    command=self.refreshLog).pack(side=LEFT)
+        logToolbar.pack(side=TOP, fill=X)
+
         self.logtext = Text(self.logFrame)
         scroll = Scrollbar(self.logFrame, command=self.logtext.yview)
         self.logtext.configure(yscrollcommand=scroll.set)
@@ -51,15 +88,21 @@ class MainWindow():
         self.logtext.pack(side=LEFT, fill=BOTH, expand=True)
         self.logFrame.pack(side=TOP, fill=BOTH, expand=True)
 
+        self.notificationFrame = NotificationFrame(self)
+
         self.helpFrame = Frame(self.notebook)
         self.helptabs = ttk.Notebook(self.helpFrame)
         self.helptabs.pack(side=TOP, fill=BOTH, expand=True)
+        # text of help tabs given as callables, filled on first display
+        self.pendingHelps = {}
+        self.helptabs.bind('<<NotebookTabChanged>>', self.on_help_tab_changed)
         self.helpFrame.pack(fill=BOTH, expand=True)
         self.addHelp("A2P2", HELPTEXT)
 
         # add tab and store index for later use in showFacilityUI
         self.tabIdx = {}
         self.registerTab("LOG", self.logFrame)
+        self.registerTab("NOTIFICATIONS", self.notificationFrame)
         self.registerTab("HELP", self.helpFrame)
         self.notebook.select(self.tabIdx["LOG"])
 
@@ -87,6 +130,7 @@ class MainWindow():
         self.requestAbort = True
 
     def addHelp(self, tabname, txt):
+        """ txt may be a callable returning the text, called on first display. """
         frame = Frame(self.helptabs)
         widget = Text(frame, width=120)
         helpscroll = Scrollbar(frame, command=widget.yview)
@@ -95,16 +139,55 @@ class MainWindow():
         widget.pack(side=LEFT, fill=BOTH, expand=True)
         frame.pack(side=TOP, fill=BOTH, expand=True)
         self.helptabs.add(frame, text=tabname)
-        widget.insert(END, txt)
+        if callable(txt):
+            self.pendingHelps[str(frame)] = (widget, txt)
+        else:
+            widget.insert(END, txt)
+
+    def on_help_tab_changed(self, event):
+        frame = self.helptabs.select()
+        if frame in self.pendingHelps:
+            widget, txt = self.pendingHelps.pop(frame)
+            widget.insert(END, txt())
 
     def registerTab(self, text, widget):
         self.notebook.add(widget, text=text)
         self.tabIdx[text] = len(self.tabIdx)
 
+    def isTkThread(self):
+        return threading.current_thread() is self.tkThread
+
+    def runInTkThread(self, func, *args):
+        """ Call func(*args) now on the Tk thread, else queue it for the Tk thread. """
+        if self.isTkThread():
+            return func(*args)
+        self.events.put((func, args))
+
+    def drainEvents(self):
+        """ Run queued events then reschedule. """
+        if not self.events.empty():
+            with metrics.uiFlushTime.time(what="events"):
+                self.runEvents()
+        self.window.after(EVENT_DRAIN_DELAY, self.drainEvents)
+
+    def runEvents(self):
+        try:
+            while True:
+                func, args = self.events.get_nowait()
+                try:
+                    func(*args)
+                except Exception:
+                    traceback.print_exc()
+        except queue.Empty:
+            pass
+
     def showFacilityUI(self, facilityUI):
+        if not self.isTkThread():
+            return self.runInTkThread(self.showFacilityUI, facilityUI)
         if not facilityUI.facility.facilityName in self.tabIdx.keys():
             self.registerTab(facilityUI.facility.facilityName, facilityUI)
         self.notebook.select(self.tabIdx[facilityUI.facility.facilityName])
+        self.showFrameToFront()
 
     def quitAfterRunOnce(self):
         self.window.quit()
@@ -114,10 +197,6 @@ class MainWindow():
         self.window.mainloop()
         self.update_status_bar()
 
-    def innerloop(self):
-        self.window.after(50, self.quitAfterRunOnce)
-        self.window.mainloop()
-
     def update_status_bar(self):
         self.status_bar.set_label("SAMP", "SAMP: %s" %
                                   self.a2p2client.a2p2SampClient.get_status())
@@ -128,37 +207,78 @@ class MainWindow():
         return self.api
 
     def addToLog(self, text, displayString=True):
+        """ Log a main entry (shown in the status label) or a detail entry (displayString=False). """
+        if not self.isTkThread():
+            return self.runInTkThread(self.addToLog, text, displayString)
+        text = str(text)
         if displayString:
-            self.log_string.set(str(text))
-        self.logtext.insert(END, "\n" + str(text))
+            self.log_string.set(text)
+        entry = (text, not displayString)
+        self.logEntries.append(entry)
+        self.pendingLogEntries.append(entry)
+        if not self.logFlushScheduled:
+            self.logFlushScheduled = True
+            self.window.after(LOG_FLUSH_DELAY, self.flushLog)
+
+    def flushLog(self):
+        """ Insert pending entries in the log widget in a single call. """
+        self.logFlushScheduled = False
+        entries = self.pendingLogEntries
+        self.pendingLogEntries = []
+        with metrics.uiFlushTime.time(what="log"):
+            self.insertLogEntries(entries)
+
+    def refreshLog(self):
+        """ Render again the whole ring buffer (e.g. when details are toggled). """
+        self.pendingLogEntries = []
+        self.logtext.delete("1.0", END)
+        self.insertLogEntries(self.logEntries)
+
+    def insertLogEntries(self, entries):
+        showDetails = self.showLogDetails.get()
+        texts = [text for text, isDetail in entries if showDetails or not isDetail]
+        if not texts:
+            return
+        self.logtext.insert(END, "\n" + "\n".join(texts))
+        # keep the widget bounded
+        lines = int(self.logtext.index("end-1c").split('.')[0])
+        if lines > LOG_MAXLINES:
+            self.logtext.delete("1.0", "%d.0" % (lines - LOG_MAXLINES))
         self.logtext.see(END)
-        self.showFrameToFront()
 
-    def ShowErrorMessage(self, text):
-        showerror("Error", text)
-        self.addToLog("Info message")
-        self.addToLog(text, False)
+    def ShowErrorMessage(self, text, source=None):
+        self.notify("Error", text, source)
+
+    def ShowWarningMessage(self, text, source=None):
+        self.notify("Warning", text, source)
 
-    def ShowWarningMessage(self, text):
-        showwarning("Warning", text)
-        self.addToLog("Info message")
-        self.addToLog(text, False)
+    def ShowInfoMessage(self, text, source=None):
+        self.notify("Info", text, source)
 
-    def ShowInfoMessage(self, text):
-        showinfo("Info", text)
-        self.addToLog("Info message")
-        self.addToLog(text, False)
+    def notify(self, severity, text, source=None):
+        """ Add a non modal notification. Errors bring the notification panel to front. """
+        if not self.isTkThread():
+            return self.runInTkThread(self.notify, severity, text, source)
+        with tracing.span("notify"):
+            self.notificationFrame.add(severity, text, source)
+            self.addToLog("%s: %s" % (severity, text.strip().split("\n")[0]))
+            self.addToLog(text, False)
+        if severity == "Error":
+            self.notebook.select(self.tabIdx["NOTIFICATIONS"])
+            self.showFrameToFront()
 
     def setProgress(self, perc):
         if perc > 1:
             perc = perc / 100.0
+        if not self.isTkThread():
+            return self.runInTkThread(self.setProgress, perc)
         self.progress_value.set(perc)
         if (perc <= 0) or (perc > 0.99):
             self.window.config(cursor="left_ptr")
         else:
             self.window.config(cursor="watch")
-        self.innerloop()
-        self.showFrameToFront()
+        # redraw without spinning the mainloop
+        self.window.update_idletasks()
 
     def showFrameToFront(self):
         self.window.attributes('-topmost', 1)
@@ -190,6 +310,80 @@ class StatusBar(Frame):
         label.config(text=text)
 
 
+class NotificationFrame(Frame):
+
+    """
+    Non modal list of the notifications (errors, warnings and infos) with
+    severity filters. The full text of the selected one is shown below.
+    """
+
+    def __init__(self, mainWindow):
+        Frame.__init__(self, mainWindow.notebook)
+        self.mainWindow = mainWindow
+        self.notifications = []
+
+        toolbar = Frame(self)
+        self.filters = {}
+        for severity in SEVERITIES:
+            self.filters[severity] = IntVar()
+            self.filters[severity].set(1)
+            Checkbutton(toolbar, text=severity, variable=self.filters[severity],
+                        command=self.refresh).pack(side=LEFT)
+        Button(toolbar, text="Clear", command=self.clear).pack(side=RIGHT)
+        self.summary = StringVar()
+        Label(toolbar, textvariable=self.summary).pack(side=RIGHT)
+        toolbar.pack(side=TOP, fill=X)
+
+        self.tree = ttk.Treeview(
+            self, columns=('time', 'severity', 'source', 'message'), show='headings', height=12)
+        for column, width in (('time', 80), ('severity', 80), ('source', 160), ('message', 500)):
+            self.tree.heading(column, text=column.capitalize(), anchor='w')
+            self.tree.column(column, width=width, stretch=(column == 'message'))
+        for severity, color in zip(SEVERITIES, ("red", "orange", "black")):
+            self.tree.tag_configure(severity, foreground=color)
+        self.tree.bind('<<TreeviewSelect>>', self.on_selection_changed)
+        self.tree.pack(side=TOP, fill=BOTH, expand=True)
+
+        self.detail = Text(self, height=10)
+        self.detail.pack(side=TOP, fill=BOTH, expand=True)
+        self.updateSummary()
+
+    def add(self, severity, text, source=None):
+        notification = (time.strftime("%H:%M:%S"), severity, source or "", text)
+        self.notifications.append(notification)
+        if self.filters[severity].get():
+            self.insert(len(self.notifications) - 1, notification)
+        self.updateSummary()
+
+    def insert(self, idx, notification):
+        when, severity, source, text = notification
+        self.tree.insert('', 'end', str(idx), values=(
+            when, severity, source, text.strip().split("\n")[0]), tags=(severity,))
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for idx, notification in enumerate(self.notifications):
+            if self.filters[notification[1]].get():
+                self.insert(idx, notification)
+
+    def clear(self):
+        self.notifications = []
+        self.tree.delete(*self.tree.get_children())
+        self.detail.delete("1.0", END)
+        self.updateSummary()
+
+    def updateSummary(self):
+        counts = collections.Counter(n[1] for n in self.notifications)
+        self.summary.set(", ".join(["%d %s" % (counts[s], s.lower())
+                                    for s in SEVERITIES]))
+
+    def on_selection_changed(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.detail.delete("1.0", END)
+            self.detail.insert(END, self.notifications[int(selection[0])][3])
+
+
 class FacilityUI(Frame):
 
     def __init__(self, facility):
@@ -197,28 +391,38 @@ class FacilityUI(Frame):
         # self.pack(fill=BOTH)
         self.facility = facility
         self.a2p2client = facility.a2p2client
+        self.busy = None
 
     def addToLog(self, text, displayString=True):
         """ Wrapper to log message in the common textfield """
         self.a2p2client.ui.addToLog(text, displayString)
 
-    def ShowErrorMessage(self, text):
-        self.a2p2client.ui.ShowErrorMessage(text)
+    def ShowErrorMessage(self, text, source=None):
+        self.a2p2client.ui.ShowErrorMessage(
+            text, source or self.facility.facilityName)
 
-    def ShowWarningMessage(self, text):
-        self.a2p2client.ui.ShowWarningMessage(text)
+    def ShowWarningMessage(self, text, source=None):
+        self.a2p2client.ui.ShowWarningMessage(
+            text, source or self.facility.facilityName)
 
-    def ShowInfoMessage(self, text):
-        self.a2p2client.ui.ShowInfoMessage(text)
+    def ShowInfoMessage(self, text, source=None):
+        self.a2p2client.ui.ShowInfoMessage(
+            text, source or self.facility.facilityName)
 
     def setProgress(self, perc):
-        """ Wrapper to update progress bar """
+        """ Wrapper to update progress bar (may be called from any thread) """
+        if not self.a2p2client.ui.isTkThread():
+            # busy is only read and written in the Tk thread
+            return self.a2p2client.ui.runInTkThread(self.setProgress, perc)
         if perc > 1:
             perc = perc / 100.0
-        if (perc <= 0) or (perc > 0.99):
-            self.isIdle()
-        else:
-            self.isBusy()
+        busy = not ((perc <= 0) or (perc > 0.99))
+        if busy != self.busy:
+            self.busy = busy
+            if busy:
+                self.isBusy()
+            else:
+                self.isIdle()
         self.a2p2client.ui.setProgress(perc)
 
     def isBusy(self):
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import collections
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from a2p2 import tracing
+from a2p2.samp import LOAD_MTYPE
+
+# generated OB: one science target per OB, K magnitude in the ranges of
+# the GRAVITY exposure tables
+OB_TEMPLATE = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<a:observingBlockDefinition xmlns:a="http://www.jmmc.fr/aspro-ob/0.1">
+    <schemaVersion>2017.7</schemaVersion>
+    <name>loadgen</name>
+    <interferometerConfiguration>
+        <name>%(facility)s</name>
+        <version>Period 100</version>
+        <stations>UT1 UT2 UT3 UT4</stations>
+        <pops></pops>
+        <channels>IP1 IP3 IP5 IP7 </channels>
+    </interferometerConfiguration>
+    <instrumentConfiguration>
+        <name>GRAVITY</name>
+        <instrumentMode>LOW-COMBINED</instrumentMode>
+    </instrumentConfiguration>
+    <observationConfiguration id="LOADGEN_%(index)d">
+        <type>SCIENCE</type>
+        <SCTarget>
+            <name>LOADGEN %(index)d</name>
+            <RA>%(ra)s</RA>
+            <DEC>-13:51:31.3130</DEC>
+            <EQUINOX>2000.0</EQUINOX>
+            <PMRA>-8.62</PMRA>
+            <PMDEC>-9.07</PMDEC>
+            <PARALLAX>8.3</PARALLAX>
+            <SPECTYP>B7IV</SPECTYP>
+            <FLUX_V>7.235</FLUX_V>
+            <FLUX_H>7.462</FLUX_H>
+            <FLUX_K>7.505</FLUX_K>
+        </SCTarget>
+    </observationConfiguration>
+    <observationSchedule>
+        <OB ref="LOADGEN_%(index)d"/>
+    </observationSchedule>
+</a:observingBlockDefinition>
+"""
+
+# max duration (s) to wait for the hub registration of a2p2
+CONNECT_TIMEOUT = 30.0
+# max duration (s) to wait for the last messages once sent
+DRAIN_TIMEOUT = 30.0
+
+PERCENTILES = (50, 90, 99)
+
+
+def getPercentile(values, percentile):
+    """ Returns the nearest rank percentile of the sorted values. """
+    if not values:
+        return float("nan")
+    rank = int(math.ceil(percentile / 100.0 * len(values))) - 1
+    return values[max(0, min(len(values) - 1, rank))]
+
+
+class LoadGenerator(object):
+
+    """
+    Start a private SAMP hub, run the given client against it and send
+    generated OBs from a fake Aspro2 as ob.load.data calls (or notifications
+    for the notifyRatio part) at the given rate (messages per second).
+
+    The end to end latency runs from the sending of a message to the end of
+    its processing by the client; OBs queued until login are processed once
+    submitted. Messages not processed once drained are lost.
+    """
+
+    def __init__(self, count=100, rate=10.0, notifyRatio=0.0, facility="VLTI",
+                 drainTimeout=DRAIN_TIMEOUT):
+        self.count = count
+        self.drainTimeout = drainTimeout
+        self.rate = rate
+        self.notifyRatio = notifyRatio
+        self.facility = facility
+        self.workdir = None
+        self.sent = {}       # id -> send time
+        self.processed = {}  # id -> (latency, status)
+        self.queued = {}     # traceId -> id of OBs queued until login
+        self.acks = []       # reply latencies of calls
+        self.errors = []
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def writeOBs(self):
+        """ Returns the paths of the generated OB files. """
+        paths = []
+        for i in range(self.count):
+            # targets spread over the sky
+            minutes = (i * 7) % (24 * 60)
+            ra = "%02d:%02d:00.000" % (minutes // 60, minutes % 60)
+            path = os.path.join(self.workdir, "ob%05d.obxml" % i)
+            with open(path, "w") as f:
+                f.write(OB_TEMPLATE % {"facility": self.facility, "index": i, "ra": ra})
+            paths.append(path)
+        return paths
+
+    def onProcessed(self, message, status):
+        msgId = message.params.get("loadgen.id")
+        if msgId is None:
+            return
+        if status == "queued":
+            # wait for its submission (see onTrace)
+            with self.lock:
+                self.queued[message.traceId] = msgId
+            return
+        self.setProcessed(msgId, status)
+
+    def onTrace(self, trace, spans):
+        """ Called at the end of every trace: queued OBs once submitted. """
+        with self.lock:
+            msgId = self.queued.get(trace.traceId)
+        if msgId is not None and trace.status not in (None, "queued"):
+            self.setProcessed(msgId, "queued, " + trace.status)
+
+    def setProcessed(self, msgId, status):
+        now = time.time()
+        with self.lock:
+            if msgId in self.sent and msgId not in self.processed:
+                self.processed[msgId] = (now - self.sent[msgId], status)
+
+    def receiveResponse(self, private_key, sender_id, msg_id, response):
+        now = time.time()
+        with self.lock:
+            msgId = msg_id.rpartition("-")[2]
+            if msgId in self.sent:
+                self.acks.append(now - self.sent[msgId])
+
+    def run(self, client):
+        """
+        Run client.run() (in this thread) until every message is processed
+        or the drain timeout is over. Returns self.
+        """
+        from astropy.samp import SAMPHubServer
+
+        self.workdir = tempfile.mkdtemp(prefix="a2p2-loadgen-")
+        lockfile = os.path.join(self.workdir, "samp.lock")
+        hub = SAMPHubServer(addr="127.0.0.1", lockfile=lockfile,
+                            web_profile=False, label="a2p2 loadgen")
+        hub.start(wait=False)
+        previousHub = os.environ.get("SAMP_HUB")
+        os.environ["SAMP_HUB"] = "std-lockurl:file://" + lockfile
+
+        if client.apiName == "fakeAPI":
+            from a2p2.replay import useFakeP2
+            useFakeP2(client)
+        client.addMessageListener(self.onProcessed)
+        tracing.addListener(self.onTrace)
+        sender = threading.Thread(target=self.send, args=(client,))
+        sender.daemon = True
+        try:
+            sender.start()
+            client.run()
+            sender.join()
+        finally:
+            tracing.removeListener(self.onTrace)
+            if previousHub is None:
+                del os.environ["SAMP_HUB"]
+            else:
+                os.environ["SAMP_HUB"] = previousHub
+            try:
+                client.a2p2SampClient.disconnect()
+            except Exception:
+                pass
+            hub.stop()
+            shutil.rmtree(self.workdir, ignore_errors=True)
+        return self
+
+    def send(self, client):
+        """ Run by the sender thread: fake Aspro2. """
+        from astropy.samp import SAMPIntegratedClient
+
+        aspro = SAMPIntegratedClient("Aspro2 (a2p2 loadgen)")
+        try:
+            paths = self.writeOBs()
+            aspro.connect()
+            # a2p2 connects to the hub in its loop
+            limit = time.time() + CONNECT_TIMEOUT
+            while not aspro.get_subscribed_clients(LOAD_MTYPE):
+                if time.time() > limit:
+                    raise RuntimeError("a2p2 did not register to the SAMP hub")
+                time.sleep(0.1)
+
+            start = time.time()
+            notifyEvery = 1.0 / self.notifyRatio if self.notifyRatio else 0
+            for i, path in enumerate(paths):
+                if self.rate:
+                    delay = start + i / float(self.rate) - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                msgId = str(i)
+                message = {"samp.mtype": LOAD_MTYPE,
+                           "samp.params": {"url": "file://" + path, "loadgen.id": msgId}}
+                with self.lock:
+                    self.sent[msgId] = time.time()
+                if notifyEvery and int((i + 1) / notifyEvery) != int(i / notifyEvery):
+                    aspro.notify_all(message)
+                else:
+                    aspro.bind_receive_response(
+                        "loadgen-" + msgId, self.receiveResponse)
+                    aspro.call_all("loadgen-" + msgId, message)
+
+            limit = time.time() + self.drainTimeout
+            while len(self.processed) < len(self.sent) and time.time() < limit:
+                time.sleep(0.05)
+            self.duration = time.time() - start
+        except Exception as e:
+            self.errors.append(str(e))
+        finally:
+            try:
+                aspro.disconnect()
+            except Exception:
+                pass
+            client.ui.requestAbort = True
+
+    def getLost(self):
+        return len(self.sent) - len(self.processed)
+
+    def getLatencies(self):
+        return sorted(p[0] for p in self.processed.values())
+
+    def getStatusCounts(self):
+        return collections.Counter(p[1] for p in self.processed.values())
+
+    def getReport(self):
+        latencies = self.getLatencies()
+        acks = sorted(self.acks)
+        buffer = "Load: %d message(s) sent in %.2f s (%.1f/s asked), %d processed, %d lost\n" % (
+            len(self.sent), self.duration, self.rate, len(self.processed), self.getLost())
+        buffer += "Status: %s\n" % ", ".join(
+            "%s %d" % item for item in sorted(self.getStatusCounts().items()))
+        for name, values in (("end to end", latencies), ("call reply", acks)):
+            if values:
+                buffer += "%-10s latency (ms): %s, max %.1f\n" % (name, ", ".join(
+                    "p%d %.1f" % (p, 1000 * getPercentile(values, p)) for p in PERCENTILES),
+                    1000 * values[-1])
+        for error in self.errors:
+            buffer += "error: %s\n" % error
+        return buffer
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import bisect
+import collections
+import math
+import os
+import sys
+import threading
+import time
+
+# upper bounds (s) of the buckets of latency histograms
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0)
+# period (s) of the metrics file dump
+DUMP_INTERVAL = 60.0
+
+
+def formatLabels(key, extra=()):
+    labels = list(key) + list(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                          for k, v in labels) + "}"
+
+
+def formatValue(value):
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return "%d" % value
+    return repr(float(value))
+
+
+class Metric(object):
+
+    """
+    Values by label set of one metric. Labels are given as keyword
+    arguments, e.g. counter.inc(status="error").
+    """
+
+    kind = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.values = collections.OrderedDict()
+
+    def key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self.key(labels), 0)
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help),
+                 "# TYPE %s %s" % (self.name, self.kind)]
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append("%s%s %s" % (self.name, formatLabels(key), formatValue(value)))
+        return lines
+
+
+class Counter(Metric):
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+
+    """
+    Gauge set by set() or read from function() at each exposition.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, function=None):
+        Metric.__init__(self, name, help)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def render(self):
+        if self.function:
+            try:
+                value = self.function()
+            except Exception:
+                value = float("nan")
+            with self.lock:
+                self.values[()] = value
+        return Metric.render(self)
+
+
+class Histogram(Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        Metric.__init__(self, name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """ Returns a context manager that observes the duration of its block. """
+        return _Timer(self, labels)
+
+    def get(self, **labels):
+        """ Returns (count, sum) of the observations. """
+        with self.lock:
+            counts, total = self.values.get(self.key(labels), ([0], 0.0))
+            return sum(counts), total
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help),
+                 "# TYPE %s %s" % (self.name, self.kind)]
+        with self.lock:
+            for key, (counts, total) in self.values.items():
+                cumulated = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulated += count
+                    lines.append("%s_bucket%s %d" % (
+                        self.name, formatLabels(key, [("le", formatValue(bound))]), cumulated))
+                lines.append("%s_sum%s %s" % (self.name, formatLabels(key), formatValue(total)))
+                lines.append("%s_count%s %d" % (self.name, formatLabels(key), cumulated))
+        return lines
+
+
+class _Timer(object):
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.time() - self.start, **self.labels)
+        return False
+
+
+class Registry(object):
+
+    """
+    Metrics by name, exposed in the Prometheus text format. Metrics are
+    created on first request: counter(), gauge() and histogram() return the
+    existing one if any.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = collections.OrderedDict()
+
+    def register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help):
+        return self.register(Counter, name, help)
+
+    def gauge(self, name, help, function=None):
+        gauge = self.register(Gauge, name, help)
+        if function:
+            # the last registered function is used (e.g. new client)
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram, name, help, buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# metrics shared by the modules of a2p2
+obsReceived = REGISTRY.counter("a2p2_obs_received_total", "OBs received (SAMP messages, batch items).")
+obsParsed = REGISTRY.counter("a2p2_obs_parsed_total", "OBs parsed.")
+obsRejected = REGISTRY.counter("a2p2_obs_rejected_total", "OBs rejected by reason (error, unsupported).")
+obsSubmitted = REGISTRY.counter("a2p2_obs_submitted_total", "OBs submitted (VLTI) or added to the night plan (CHARA) by facility.")
+parseTime = REGISTRY.histogram("a2p2_ob_parse_seconds", "Time to read and parse an OB.")
+p2CallTime = REGISTRY.histogram("a2p2_p2_call_seconds", "Latency of the P2 API calls by call.")
+p2CallErrors = REGISTRY.counter("a2p2_p2_call_errors_total", "Failed P2 API calls by call.")
+sampMessages = REGISTRY.counter("a2p2_samp_messages_total", "SAMP messages processed by mtype.")
+sampConnects = REGISTRY.counter("a2p2_samp_connects_total", "Successful connections to the SAMP hub.")
+sampConnectFailures = REGISTRY.counter("a2p2_samp_connect_failures_total", "Failed connections to the SAMP hub.")
+uiFlushTime = REGISTRY.histogram("a2p2_ui_flush_seconds", "Time to flush the log and queued events to the UI.")
+
+
+def startServer(port, addr="127.0.0.1", registry=REGISTRY):
+    """
+    Serve the metrics on http://addr:port/metrics in a daemon thread.
+    Returns the server (port 0 picks a free port, see server.server_address).
+    """
+    # http.server is only loaded if the metrics are served (startup time)
+    if sys.version_info[0] == 2:
+        from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    else:
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer((addr, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="a2p2-metrics")
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def dump(filename, registry=REGISTRY):
+    """ Write the metrics to filename (replaced at once). """
+    tmpname = filename + ".tmp"
+    with open(tmpname, "w") as f:
+        f.write(registry.render())
+    if hasattr(os, "replace"):
+        os.replace(tmpname, filename)
+    else:
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(tmpname, filename)
+
+
+class FileDumper(object):
+
+    """
+    Dump the metrics to a file every interval seconds in a daemon thread,
+    and once more on stop().
+    """
+
+    def __init__(self, filename, interval=DUMP_INTERVAL, registry=REGISTRY):
+        self.filename = filename
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.loop, name="a2p2-metrics-dump")
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            dump(self.filename, self.registry)
+
+    def stop(self):
+        self.stopped.set()
+        dump(self.filename, self.registry)
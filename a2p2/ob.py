@@ -2,14 +2,10 @@
 
 __all__ = []
 
-from astropy.coordinates import SkyCoord
-import cgi
-import numpy as np
-import re
 import traceback
 import xml.etree.ElementTree as ET
 import json
-from collections import defaultdict, namedtuple, Iterable, OrderedDict
+from collections import defaultdict, namedtuple, OrderedDict
 
 
 # https://stackoverflow.com/questions/2148119/how-to-convert-an-xml-string-to-a-dictionary-in-python
@@ -52,8 +48,20 @@ class OB():
     """
 
     def __init__(self, url):
-        # extract XML in elementTree
-        e = ET.parse(url)
+        # extract XML in elementTree, remote documents are streamed to the
+        # parser (see a2p2.fetch)
+        from a2p2.fetch import isRemote
+        if hasattr(url, "startswith") and isRemote(url):
+            from a2p2.fetch import openURL
+            from a2p2.tracing import span
+            with span("fetch"):
+                f = openURL(url)
+                try:
+                    e = ET.parse(f)
+                finally:
+                    f.close()
+        else:
+            e = ET.parse(url)
         d = etree_to_dict(e.getroot())
         # keep only content of subelement to avoid schema version change
         # '{http://www.jmmc.fr/aspro-ob/0.1}observingBlockDefinition'
@@ -90,6 +98,17 @@ class OB():
         else:
             return defaultvalue
 
+    def getLabel(self):
+        """
+        Returns a short description: instrument and science target names.
+        """
+        names = []
+        for observationConfiguration in self.observationConfiguration:
+            target = self.get(observationConfiguration, "SCTarget")
+            if target:
+                names.append(target.name)
+        return "%s %s" % (self.instrumentConfiguration.name, ", ".join(names))
+
     def __str__(self):
         if True:
             import json
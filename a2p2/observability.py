@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import numpy as np
+
+# default elevation limit (deg) used to compute observable LST windows
+MIN_ELEVATION = 30.0
+
+# airmass constraint bounds accepted by observatories
+MIN_AIRMASS = 1.0
+MAX_AIRMASS = 5.0
+
+
+class Site(object):
+
+    def __init__(self, name, latitude, longitude, minElevation=MIN_ELEVATION):
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.minElevation = minElevation
+
+
+SITES = {
+    "VLTI": Site("VLTI", -24.62743, -70.40498),
+    "CHARA": Site("CHARA", 34.22444, -118.05694),
+}
+
+
+def sexagesimalToDegrees(values, hours=False):
+    """
+    Convert an array of 'd:m:s' (or 'h:m:s' if hours is True) strings to
+    decimal degrees.
+    """
+    values = np.char.strip(np.asarray(values, dtype=np.str_))
+    if values.size == 0:
+        return np.zeros(0)
+    negative = np.char.startswith(values, '-')
+    values = np.char.lstrip(values, '+-')
+    parts = np.char.partition(values, ':')
+    d, rest = parts[:, 0], parts[:, 2]
+    parts = np.char.partition(rest, ':')
+    m, s = parts[:, 0], parts[:, 2]
+
+    def asFloat(a):
+        return np.where(a == '', '0', a).astype(float)
+
+    deg = asFloat(d) + asFloat(m) / 60.0 + asFloat(s) / 3600.0
+    if hours:
+        deg *= 15.0
+    return np.where(negative, -deg, deg)
+
+
+def parseLSTInterval(interval):
+    """
+    Returns (start, end) in hours of an Aspro2 'HH:MM/HH:MM' LST interval.
+    """
+    start, end = interval.split('/')
+    start, end = sexagesimalToDegrees([start, end])
+    return float(start), float(end)
+
+
+def formatLST(hours):
+    minutes = int(round(hours * 60.0)) % (24 * 60)
+    return "%02d:%02d" % (minutes // 60, minutes % 60)
+
+
+def formatLSTInterval(interval):
+    return formatLST(interval[0]) + "/" + formatLST(interval[1])
+
+
+class ObservabilityEngine(object):
+
+    """
+    Compute altitude, airmass and observable LST windows of arrays of targets
+    over a regular LST grid of one site.
+    Every method takes RA and DEC arrays in degrees and works on the
+    (ntargets, ngrid) arrays in one pass.
+    """
+
+    def __init__(self, site, step=1.0):
+        self.site = site
+        # LST grid (h) with given step (min)
+        self.lst = np.arange(0.0, 24.0, step / 60.0)
+        self.sinLat = np.sin(np.radians(site.latitude))
+        self.cosLat = np.cos(np.radians(site.latitude))
+
+    def getAltitudes(self, ra, dec):
+        """
+        Returns the (ntargets, ngrid) altitudes (deg) over the LST grid.
+        """
+        ha = np.radians(self.lst[None, :] * 15.0 -
+                        np.asarray(ra, dtype=float)[:, None])
+        dec = np.radians(np.asarray(dec, dtype=float))[:, None]
+        sinAlt = self.sinLat * np.sin(dec) + \
+            self.cosLat * np.cos(dec) * np.cos(ha)
+        return np.degrees(np.arcsin(np.clip(sinAlt, -1.0, 1.0)))
+
+    def getAirmasses(self, ra, dec):
+        """
+        Returns the (ntargets, ngrid) airmasses (inf below horizon).
+        """
+        sinAlt = np.sin(np.radians(self.getAltitudes(ra, dec)))
+        return np.where(sinAlt > 0, 1.0 / np.where(sinAlt > 0, sinAlt, 1.0), np.inf)
+
+    def getLSTWindows(self, ra, dec, minElevation=None):
+        """
+        Returns for every target the list of (start, end) LST intervals (h)
+        where it is above minElevation. Intervals may wrap over 24h.
+        """
+        if minElevation is None:
+            minElevation = self.site.minElevation
+        visible = self.getAltitudes(ra, dec) >= minElevation
+        step = self.lst[1] - self.lst[0]
+
+        # find rising and setting edges of every row at once
+        edges = np.diff(visible.astype(int), axis=1)
+        windows = []
+        for n in range(len(visible)):
+            if visible[n].all():
+                windows.append([(0.0, 24.0)])
+                continue
+            starts = [float(t)
+                      for t in self.lst[np.flatnonzero(edges[n] == 1) + 1]]
+            ends = [float(t)
+                    for t in self.lst[np.flatnonzero(edges[n] == -1)] + step]
+            if visible[n, 0]:
+                starts.insert(0, 0.0)
+            if visible[n, -1]:
+                ends.append(24.0)
+            rowWindows = list(zip(starts, ends))
+            # merge the window that crosses 24h
+            if len(rowWindows) > 1 and rowWindows[0][0] == 0.0 and rowWindows[-1][1] == 24.0:
+                rowWindows = rowWindows[1:-1] + \
+                    [(rowWindows[-1][0], rowWindows[0][1])]
+            windows.append(rowWindows)
+        return windows
+
+    def getIntervalMask(self, intervals):
+        """
+        Returns the (nintervals, ngrid) mask of the LST grid inside given
+        (start, end) intervals. None intervals give empty rows.
+        """
+        starts = np.array([i[0] if i else np.nan for i in intervals])[:, None]
+        ends = np.array([i[1] if i else np.nan for i in intervals])[:, None]
+        lst = self.lst[None, :]
+        direct = (lst >= starts) & (lst <= ends)
+        wrapped = (lst >= starts) | (lst <= ends)
+        return np.where(starts <= ends, direct, wrapped)
+
+    def getCoverage(self, ra, dec, intervals, minElevation=None):
+        """
+        Returns for every target the fraction of its LST interval where it
+        is above minElevation (nan for None intervals).
+        """
+        if minElevation is None:
+            minElevation = self.site.minElevation
+        mask = self.getIntervalMask(intervals)
+        visible = self.getAltitudes(ra, dec) >= minElevation
+        total = mask.sum(axis=1)
+        covered = (mask & visible).sum(axis=1)
+        return np.where(total > 0, covered / np.maximum(total, 1.0), np.nan)
+
+    def getMaxAirmass(self, ra, dec, intervals):
+        """
+        Returns for every target the highest airmass reached in its LST
+        interval (nan for None intervals).
+        """
+        mask = self.getIntervalMask(intervals)
+        airmasses = np.where(mask, self.getAirmasses(ra, dec), -np.inf)
+        maxAirmass = airmasses.max(axis=1)
+        return np.where(mask.any(axis=1), maxAirmass, np.nan)
+
+    def getAirmassConstraints(self, ra, dec, intervals):
+        """
+        Returns the airmass constraint of every target: the highest airmass
+        of its LST interval rounded up to 0.1 and bounded to the values
+        accepted by observatories (nan for None intervals).
+        """
+        airmass = np.ceil(self.getMaxAirmass(ra, dec, intervals) * 10.0) / 10.0
+        return np.clip(airmass, MIN_AIRMASS, MAX_AIRMASS)
+
+
+_engines = {}
+
+
+def getObservabilityEngine(siteName):
+    """
+    Returns the shared engine of the given site (see SITES).
+    """
+    if siteName not in _engines:
+        _engines[siteName] = ObservabilityEngine(SITES[siteName])
+    return _engines[siteName]
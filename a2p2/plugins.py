@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import collections
+import importlib
+import sys
+
+# entry point groups:
+# a2p2.facilities   FACILITY = module:FacilityClass
+# a2p2.instruments  FACILITY.INSNAME = module:InstrumentClass
+FACILITY_GROUP = "a2p2.facilities"
+INSTRUMENT_GROUP = "a2p2.instruments"
+
+# used when a2p2 runs from its source tree (entry points not installed)
+BUILTIN_ENTRY_POINTS = {
+    FACILITY_GROUP: [
+        "CHARA = a2p2.chara.facility:CharaFacility",
+        "VLTI = a2p2.vlti.facility:VltiFacility",
+    ],
+    INSTRUMENT_GROUP: [
+        "VLTI.GRAVITY = a2p2.vlti.gravity:Gravity",
+        "VLTI.PIONIER = a2p2.vlti.pionier:Pionier",
+        # "VLTI.MATISSE = a2p2.vlti.matisse:Matisse",
+    ],
+}
+
+# name, supported instrument names and loader of the facility class
+FacilityPlugin = collections.namedtuple(
+    "FacilityPlugin", ["name", "instruments", "loader"])
+
+_plugins = None
+
+
+class Loader(object):
+
+    """
+    Import 'module:attr' on first call of load().
+    """
+
+    def __init__(self, target):
+        self.target = target.strip()
+
+    def load(self):
+        module, _, attr = self.target.partition(":")
+        obj = importlib.import_module(module.strip())
+        for name in attr.strip().split("."):
+            obj = getattr(obj, name)
+        return obj
+
+    def __repr__(self):
+        return "Loader(%r)" % self.target
+
+
+def iterEntryPoints(group):
+    """
+    Yields (name, loader) of the installed entry points of the given group.
+    Nothing is imported but the packaging metadata.
+    """
+    try:
+        if sys.version_info < (3, 8):
+            raise ImportError
+        from importlib import metadata
+        eps = metadata.entry_points()
+        if hasattr(eps, "select"):
+            eps = eps.select(group=group)
+        else:
+            eps = eps.get(group, [])
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return
+        eps = pkg_resources.iter_entry_points(group)
+    for ep in eps:
+        yield ep.name, ep
+
+
+def iterBuiltinEntryPoints(group):
+    for line in BUILTIN_ENTRY_POINTS.get(group, []):
+        name, _, target = line.partition("=")
+        yield name.strip(), Loader(target)
+
+
+def discover():
+    """
+    Returns the FacilityPlugin by facility name, built from the builtin then
+    the installed entry points (installed ones override builtin ones).
+    """
+    facilities = collections.OrderedDict()
+    instruments = {}
+    for iterator in (iterBuiltinEntryPoints, iterEntryPoints):
+        for name, loader in iterator(FACILITY_GROUP):
+            facilities[name] = loader
+        for name, loader in iterator(INSTRUMENT_GROUP):
+            facility, _, insname = name.partition(".")
+            if insname:
+                instruments.setdefault(facility, collections.OrderedDict())[
+                    insname] = loader
+
+    return collections.OrderedDict(
+        (name, FacilityPlugin(name, instruments.get(name, collections.OrderedDict()), loader))
+        for name, loader in facilities.items())
+
+
+def getFacilityPlugins():
+    """ Returns the FacilityPlugin by facility name, discovered on first call. """
+    global _plugins
+    if _plugins is None:
+        _plugins = discover()
+    return _plugins
+
+
+def getInstrumentLoaders(facilityName):
+    """ Returns the instrument class loaders by instrument name of a facility. """
+    plugin = getFacilityPlugins().get(facilityName)
+    return plugin.instruments if plugin else collections.OrderedDict()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import json
+import os
+import shutil
+import threading
+import time
+
+from a2p2.batch import urlToPath
+
+# session bundle: one json line per message and a copy of the OB files
+MESSAGES_FILENAME = "messages.jsonl"
+FILES_DIRNAME = "files"
+
+# delay (s) between two loops of the player while waiting
+POLL_DELAY = 0.01
+# max duration (s) to wait for the pending work once every message is sent
+DRAIN_TIMEOUT = 30.0
+
+
+def getURLs(params):
+    """ Returns the OB urls of the parameters of a message. """
+    urls = params.get("urls") or []
+    if not isinstance(urls, list):
+        urls = [urls]
+    if params.get("url"):
+        urls = urls + [params["url"]]
+    return urls
+
+
+class SessionRecorder(object):
+
+    """
+    Append every received SAMP message to a session bundle (directory) with
+    its reception time and a copy of the local files it references.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.filesdir = os.path.join(directory, FILES_DIRNAME)
+        if not os.path.isdir(self.filesdir):
+            os.makedirs(self.filesdir)
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.count = 0
+
+    def record(self, message):
+        """ Called by the SAMP receiver thread for each message. """
+        with self.lock:
+            self.count += 1
+            files = {}
+            for url in getURLs(message.params):
+                path = urlToPath(url)
+                if os.path.isfile(path):
+                    name = "%04d-%s" % (self.count, os.path.basename(path))
+                    shutil.copyfile(path, os.path.join(self.filesdir, name))
+                    files[url] = FILES_DIRNAME + "/" + name
+            now = time.time()
+            entry = {"t": round(now - self.start, 6), "time": now,
+                     "sender": message.sender, "mtype": message.mtype,
+                     "params": message.params, "files": files}
+            with open(os.path.join(self.directory, MESSAGES_FILENAME), "a") as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+
+def loadBundle(directory):
+    """
+    Returns the (time, SampMessage) of a session bundle, urls of recorded
+    files replaced by their copy.
+    """
+    from a2p2.samp import SampMessage
+
+    def relocate(url, files):
+        if url in files:
+            return os.path.join(directory, *files[url].split("/"))
+        return url
+
+    messages = []
+    with open(os.path.join(directory, MESSAGES_FILENAME)) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            params = dict(entry["params"])
+            files = entry.get("files", {})
+            if params.get("url"):
+                params["url"] = relocate(params["url"], files)
+            if params.get("urls"):
+                params["urls"] = [relocate(u, files) for u in getURLs({"urls": params["urls"]})]
+            messages.append((entry["t"], SampMessage(
+                entry.get("sender"), entry["mtype"], params)))
+    return messages
+
+
+def useFakeP2(client):
+    """
+    Give the headless VLTI UI the credentials and container of the fake P2
+    API when the configuration file does not.
+    """
+    from a2p2.vlti.console import CONFIG_SECTION
+    from a2p2.vlti.fakeapi import RUNS
+    config = client.config
+    if not config.has_section(CONFIG_SECTION):
+        config.add_section(CONFIG_SECTION)
+    for option, value in (("username", "52052"), ("password", "tutorial"),
+                          ("containerId", str(RUNS[0]["containerId"]))):
+        if not config.has_option(CONFIG_SECTION, option):
+            config.set(CONFIG_SECTION, option, value)
+
+
+class SessionPlayer(object):
+
+    """
+    Feed the messages of a session bundle to a client at their original pace
+    multiplied by speed (speed=0: as fast as possible) and measure how late
+    and how long each message is processed.
+    """
+
+    def __init__(self, client, directory, speed=1.0):
+        self.client = client
+        self.messages = loadBundle(directory)
+        self.speed = speed
+        # (scheduled time, lag, duration) of every message
+        self.timings = []
+        self.duration = 0.0
+        if client.apiName == "fakeAPI":
+            useFakeP2(client)
+
+    def pump(self):
+        """ One loop of the client (see A2p2Client.run()). """
+        self.client.ui.loop()
+        self.client.processBatchStep()
+
+    def isIdle(self):
+        if self.client.batches:
+            return False
+        for facility in self.client.facilityManager.facilities.values():
+            if not facility.isIdle():
+                return False
+        return True
+
+    def run(self, drainTimeout=DRAIN_TIMEOUT):
+        start = time.time()
+        for t, message in self.messages:
+            scheduled = t / self.speed if self.speed else 0.0
+            while time.time() - start < scheduled:
+                self.pump()
+                time.sleep(POLL_DELAY)
+            before = time.time()
+            self.client.processMessage(message)
+            while self.client.batches:
+                self.pump()
+            self.timings.append((scheduled, before - start - scheduled,
+                                 time.time() - before))
+        limit = time.time() + drainTimeout
+        self.pump()
+        while not self.isIdle() and time.time() < limit:
+            time.sleep(POLL_DELAY)
+            self.pump()
+        self.duration = time.time() - start
+        return self
+
+    def getReport(self):
+        count = len(self.timings)
+        if not count:
+            return "Replay: no message"
+        lags = [t[1] for t in self.timings]
+        durations = [t[2] for t in self.timings]
+        return ("Replay: %d message(s) in %.3f s (speed %s), processing %.1f ms mean %.1f ms max, "
+                "lag %.1f ms mean %.1f ms max%s") % (
+            count, self.duration, self.speed or "max",
+            1000 * sum(durations) / count, 1000 * max(durations),
+            1000 * sum(lags) / count, 1000 * max(lags),
+            "" if self.isIdle() else ", pending work left")
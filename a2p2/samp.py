@@ -3,30 +3,82 @@
 __all__ = []
 
 from astropy.samp import SAMPIntegratedClient
+from a2p2.batch import BATCH_MTYPE
+from a2p2.batch import BATCH_STATUS_MTYPE
+from a2p2.batch import urlToPath
+from a2p2.tracing import newTraceId
+
+import collections
+import sys
+import threading
+import time
+
+if sys.version_info[0] == 2:
+    import Queue as queue
+else:
+    import queue
+
+# one OB given by its url
+LOAD_MTYPE = "ob.load.data"
+
+# traceId: correlation id given at reception (see a2p2.tracing)
+SampMessage = collections.namedtuple(
+    "SampMessage", ["sender", "mtype", "params", "traceId", "received"])
+SampMessage.__new__.__defaults__ = (None, None)
 
 
 class Receiver(object):
 
-    def __init__(self, client):
+    """
+    Queue every received message: they are acknowledged at once and
+    processed later by the main loop.
+    """
+
+    def __init__(self, client, recorder=None):
         self.client = client
-        self.received = False
+        self.recorder = recorder
+        self.messages = queue.Queue()
+        self.batchCount = 0
+        self.lock = threading.Lock()
 
     def receive_call(self, private_key, sender_id, msg_id, mtype, params, extra):
-        self.params = params
-        self.received = True
+        result = self.queueMessage(sender_id, mtype, params)
         self.client.reply(
-            msg_id, {"samp.status": "samp.ok", "samp.result": {}})
+            msg_id, {"samp.status": "samp.ok", "samp.result": result})
 
     def receive_notification(self, private_key, sender_id, mtype, params, extra):
-        self.params = params
-        self.received = True
+        self.queueMessage(sender_id, mtype, params)
+
+    def queueMessage(self, sender_id, mtype, params):
+        """ Queue the message and returns the result of its reply. """
+        result = {}
+        if mtype == BATCH_MTYPE:
+            with self.lock:
+                self.batchCount += 1
+                batchId = params.get("batchId") or str(self.batchCount)
+            params = dict(params, batchId=batchId)
+            result = {"batchId": batchId}
+        message = SampMessage(sender_id, mtype, params,
+                              newTraceId(), time.time())
+        if self.recorder:
+            # referenced files may be removed by the sender once replied
+            self.recorder.record(message)
+        self.messages.put(message)
+        return result
 
     def clear(self):
-        self.received = False
-        self.params = None
+        try:
+            while True:
+                self.messages.get_nowait()
+        except queue.Empty:
+            pass
 
     def get_last_message(self):
-        pass  # TODO handle here a buffer ...
+        """ Returns the next message or None. """
+        try:
+            return self.messages.get_nowait()
+        except queue.Empty:
+            return None
 
 
 class A2p2SampClient():
@@ -35,6 +87,9 @@ class A2p2SampClient():
     def __init__(self):
         self.sampClient = SAMPIntegratedClient(
             "A2P2 samp relay")  # TODO get title from main program class instead of HardCoded value
+        self.r = None
+        self.message = None
+        self.recorder = None
 
     def __del__(self):
         self.disconnect()
@@ -45,12 +100,20 @@ class A2p2SampClient():
 
         # TODO get samp client name and display it in the UI
 
-        # Instantiate the receiver
-        self.r = Receiver(self.sampClient)
+        # Instantiate the receiver (kept on reconnection with its queue)
+        if not self.r:
+            self.r = Receiver(self.sampClient, self.recorder)
         # Listen for any instructions to load a table
-        self.sampClient.bind_receive_call("ob.load.data", self.r.receive_call)
-        self.sampClient.bind_receive_notification(
-            "ob.load.data", self.r.receive_notification)
+        for mtype in (LOAD_MTYPE, BATCH_MTYPE):
+            self.sampClient.bind_receive_call(mtype, self.r.receive_call)
+            self.sampClient.bind_receive_notification(
+                mtype, self.r.receive_notification)
+
+    def setRecorder(self, recorder):
+        """ Record every received message with the given SessionRecorder. """
+        self.recorder = recorder
+        if self.r:
+            self.r.recorder = recorder
 
     def disconnect(self):
         self.sampClient.disconnect()
@@ -73,16 +136,26 @@ class A2p2SampClient():
     def get_public_id(self):
         return self.sampClient.get_public_id()
 
+    def get_queue_size(self):
+        """ Returns the number of received messages not yet processed. """
+        return self.r.messages.qsize() if self.r else 0
+
     def has_message(self):
-        return self.is_connected() and self.r.received
+        if not self.message and self.r:
+            self.message = self.r.get_last_message()
+        return self.message is not None
+
+    def get_message(self):
+        """ Returns the current SampMessage (see has_message()). """
+        return self.message
 
     def clear_message(self):
-        return self.r.clear()
+        self.message = None
 
     def get_ob_url(self):
-        url = self.r.params['url']
-        if url.startswith("file:///"):
-            return url[7:]
-        elif url.startswith("file:/"):  # work arround bugged file urls
-            return url[5:]
-        return url
+        return urlToPath(self.message.params['url'])
+
+    def notify_batch_status(self, batch):
+        """ Send the status of the processed batch to its sender. """
+        self.sampClient.notify(batch.sender, {"samp.mtype": BATCH_STATUS_MTYPE,
+                                              "samp.params": batch.getStatus()})
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import sys
+import threading
+import time
+
+if sys.version_info[0] == 2:
+    import __builtin__ as builtins
+    clock = time.time
+else:
+    import builtins
+    clock = time.perf_counter
+
+# entries faster than this duration (s) are not reported
+MIN_DURATION = 0.001
+# number of slowest imports given in the report
+TOP_IMPORTS = 15
+
+# (kind, name, depth, duration, self duration) in completion order
+_records = []
+_reported = 0
+_local = threading.local()
+_originalImport = None
+
+
+class _Timer(object):
+
+    """
+    Record the duration of its block, nested timers are subtracted from the
+    self duration of their parent.
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        self.depth = len(_local.stack)
+        self.children = 0.0
+        _local.stack.append(self)
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        duration = clock() - self.start
+        _local.stack.pop()
+        if _local.stack:
+            _local.stack[-1].children += duration
+        _records.append((self.kind, self.name, self.depth,
+                         duration, duration - self.children))
+        return False
+
+
+class _NoTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _timedImport(name, globals=None, locals=None, fromlist=(), level=0):
+    if level == 0 and not fromlist and name in sys.modules:
+        # already imported: nothing to measure
+        return _originalImport(name, globals, locals, fromlist, level)
+    with _Timer("import", "." * level + name):
+        return _originalImport(name, globals, locals, fromlist, level)
+
+
+def isEnabled():
+    return _originalImport is not None
+
+
+def enable():
+    """
+    Time every import and every block run with timed() from now on.
+    """
+    global _originalImport
+    if _originalImport is None:
+        _originalImport = builtins.__import__
+        builtins.__import__ = _timedImport
+
+
+def disable():
+    global _originalImport
+    if _originalImport is not None:
+        builtins.__import__ = _originalImport
+        _originalImport = None
+
+
+def timed(name):
+    """
+    Returns a context manager that times its block (e.g. a constructor)
+    when profiling is enabled.
+    """
+    if isEnabled():
+        return _Timer("init", name)
+    return _NoTimer()
+
+
+def report(out=None):
+    """
+    Print the timings recorded since the previous report: top level entries
+    in their completion order, then the slowest imports by self duration.
+    """
+    global _reported
+    out = out or sys.stdout
+    records = _records[_reported:]
+    _reported = len(_records)
+    if not records:
+        return
+
+    total = sum(r[3] for r in records if r[2] == 0)
+    out.write("Startup profile: %.1f ms\n" % (total * 1000))
+    for kind, name, depth, duration, selfDuration in records:
+        if depth == 0 and duration >= MIN_DURATION:
+            out.write("%9.1f ms %9.1f ms  %-6s %s\n" %
+                      (duration * 1000, selfDuration * 1000, kind, name))
+
+    imports = sorted([r for r in records if r[0] == "import"],
+                     key=lambda r: r[4], reverse=True)[:TOP_IMPORTS]
+    out.write("Slowest imports (self time):\n")
+    for kind, name, depth, duration, selfDuration in imports:
+        if selfDuration >= MIN_DURATION:
+            out.write("%9.1f ms  %s\n" % (selfDuration * 1000, name))
+    out.flush()
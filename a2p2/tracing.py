@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import collections
+import json
+import threading
+import time
+import uuid
+
+from a2p2 import metrics
+
+# P2 calls recorded with a dedicated span name, others are named p2.<call>
+P2_SPAN_NAMES = {"verifyOB": "verify"}
+
+Span = collections.namedtuple(
+    "Span", ["name", "start", "duration", "depth", "thread"])
+
+_local = threading.local()
+_exportLock = threading.Lock()
+_exportFile = None
+_listeners = []
+
+
+def newTraceId():
+    return uuid.uuid4().hex[:16]
+
+
+def setExportFile(filename):
+    """ Append every finished trace to filename as a JSON line (None: disabled). """
+    global _exportFile
+    _exportFile = filename
+
+
+def addListener(listener):
+    """ listener(trace, spans) is called at the end of every trace scope. """
+    _listeners.append(listener)
+
+
+def removeListener(listener):
+    _listeners.remove(listener)
+
+
+def getCurrentTrace():
+    return getattr(_local, "trace", None)
+
+
+class Trace(object):
+
+    """
+    Spans recorded for one OB from its reception (start) with the
+    correlation id traceId. A trace may be resumed later in another thread
+    (e.g. pending OBs submitted after login).
+    """
+
+    def __init__(self, traceId=None, label="", start=None):
+        self.traceId = traceId or newTraceId()
+        self.label = label
+        self.start = start or time.time()
+        self.spans = []
+        self.status = None
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def getSummary(self, spans=None):
+        """
+        Returns the total duration by span name (in first start order) of
+        the given spans (default all).
+        """
+        spans = self.spans if spans is None else spans
+        totals = collections.OrderedDict()
+        for s in sorted(spans, key=lambda s: s.start):
+            total, count = totals.get(s.name, (0.0, 0))
+            totals[s.name] = (total + s.duration, count + 1)
+        end = max([s.start + s.duration for s in spans] or [0.0])
+        return "Trace %s %s%.1f ms: %s" % (
+            self.traceId, "'%s' " % self.label if self.label else "", 1000 * end,
+            ", ".join("%s %.1f%s" % (name, 1000 * total, " x%d" % count if count > 1 else "")
+                      for name, (total, count) in totals.items()) or "no span")
+
+    def toDict(self, spans=None):
+        spans = self.spans if spans is None else spans
+        return {"traceId": self.traceId, "label": self.label, "start": self.start,
+                "status": self.status,
+                "spans": [dict(s._asdict()) for s in spans]}
+
+
+class _Scope(object):
+
+    """
+    Make the trace current in this thread during the block. The spans
+    recorded during the block are exported and their summary given to log.
+    """
+
+    def __init__(self, trace, log=None):
+        self.trace = trace
+        self.log = log
+
+    def __enter__(self):
+        self.previous = getCurrentTrace()
+        self.previousDepth = getattr(_local, "depth", 0)
+        _local.trace = self.trace
+        _local.depth = 0
+        self.first = len(self.trace.spans)
+        return self.trace
+
+    def __exit__(self, *exc):
+        _local.trace = self.previous
+        _local.depth = self.previousDepth
+        spans = self.trace.spans[self.first:]
+        if spans:
+            export(self.trace, spans)
+            if self.log:
+                self.log(self.trace.getSummary(spans))
+            for listener in list(_listeners):
+                listener(self.trace, spans)
+        return False
+
+
+class _Span(object):
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.depth = _local.depth
+        _local.depth += 1
+        self.begin = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.time()
+        _local.depth -= 1
+        self.trace.add(Span(self.name, round(self.begin - self.trace.start, 6),
+                            round(end - self.begin, 6), self.depth,
+                            threading.current_thread().name))
+        return False
+
+
+class _NoSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_noSpan = _NoSpan()
+
+
+def trace(trace=None, log=None, **kwargs):
+    """
+    Returns a context manager that makes the given trace (or a new
+    Trace(**kwargs)) current in this thread.
+    """
+    return _Scope(trace or Trace(**kwargs), log)
+
+
+def span(name):
+    """
+    Returns a context manager that records its block as a span of the
+    current trace (nothing done outside traces).
+    """
+    current = getCurrentTrace()
+    if current is None:
+        return _noSpan
+    return _Span(current, name)
+
+
+def addSpan(name, start, end):
+    """ Record an already measured span (e.g. queueing) in the current trace. """
+    current = getCurrentTrace()
+    if current is not None:
+        current.add(Span(name, round(start - current.start, 6), round(end - start, 6),
+                         _local.depth, threading.current_thread().name))
+
+
+def export(trace, spans):
+    filename = _exportFile
+    if not filename:
+        return
+    line = json.dumps(trace.toDict(spans), sort_keys=True)
+    with _exportLock:
+        with open(filename, "a") as f:
+            f.write(line + "\n")
+
+
+class TracedAPI(object):
+
+    """
+    Proxy of a P2 api connection that records one span per call and its
+    latency in the a2p2_p2_call_seconds histogram. Calls are serialized
+    with lock if given: the p2api connection is not documented as thread
+    safe.
+    """
+
+    def __init__(self, api, lock=None):
+        self._api = api
+        self._lock = lock or _noSpan  # no-op context
+
+    def __getattr__(self, name):
+        attr = getattr(self._api, name)
+        if not callable(attr):
+            return attr
+        spanName = P2_SPAN_NAMES.get(name, "p2." + name)
+
+        def call(*args, **kwargs):
+            # the span includes the wait for the lock, the histogram does not
+            with span(spanName), self._lock, metrics.p2CallTime.time(call=name):
+                try:
+                    return attr(*args, **kwargs)
+                except Exception:
+                    metrics.p2CallErrors.inc(call=name)
+                    raise
+        return call
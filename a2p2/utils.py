@@ -2,9 +2,7 @@
 
 __all__ = []
 
-from astropy.coordinates import SkyCoord
 import cgi
-import numpy as np
 import re
 import traceback
 import xml.etree.ElementTree
@@ -340,6 +338,9 @@ def getDit(mag, spec, pol, tel, mode):
 
 
 def createGravityOB(ui, username, api, containerId, OBJTYPE, NAME, BASELINE, instrumentMode, SCRA, SCDEC, PMRA, PMDEC, SEQ_INS_SOBJ_MAG, SEQ_FI_HMAG, DIAMETER, COU_AG_GSSOURCE, GSRA, GSDEC, COU_GS_MAG, COU_AG_PMA, COU_AG_PMD, dualField, FTRA, FTDEC, SEQ_FT_ROBJ_NAME, SEQ_FT_ROBJ_MAG, SEQ_FT_ROBJ_DIAMETER, SEQ_FT_ROBJ_VIS, LSTINTERVAL):
+    # heavy modules are only loaded when an OB is created
+    from astropy.coordinates import SkyCoord
+    import numpy as np
 
     ui.setProgress(0.1)
     # UT or AT?
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import collections
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import time
+
+from a2p2.cache import getCacheDir
+
+# bump this value when the compiled form changes
+CACHE_VERSION = 1
+CACHE_FILENAME = "vlti_conf.pickle"
+
+TABLE_KINDS = ("ditTable", "rangeTable")
+
+
+def getPeriodDirName(period):
+    """
+    Returns the name of the subdirectory that stores period specific files,
+    e.g. 'P104' for 'Period 104', '104' or 104.
+    """
+    if period is None:
+        return None
+    m = re.search(r"\d+", str(period))
+    if m:
+        return "P" + m.group(0)
+    return None
+
+
+def validateRangeTable(rangeTable, filename):
+    """
+    Check that every constraint of the range table is consistent.
+
+    ValueError raised on the first inconsistency.
+    """
+    for tpl, keywords in rangeTable.items():
+        for key, constraint in keywords.items():
+            where = "%s: keyword '%s' of template '%s'" % (filename, key, tpl)
+            default = constraint.get("default")
+            if "min" in constraint or "max" in constraint:
+                if not ("min" in constraint and "max" in constraint):
+                    raise ValueError("%s must define both min and max" % where)
+                if constraint["min"] > constraint["max"]:
+                    raise ValueError("%s has min > max" % where)
+                if default is not None and not (constraint["min"] <= default <= constraint["max"]):
+                    raise ValueError("%s has its default out of range" % where)
+            if "list" in constraint:
+                if default is not None and default not in constraint["list"]:
+                    raise ValueError("%s has its default out of list" % where)
+
+
+def validateDitTable(ditTable, filename, path=()):
+    """
+    Check that every MAG/DIT entry has one more magnitude than DIT values and
+    that magnitudes are sorted.
+
+    ValueError raised on the first inconsistency.
+    """
+    for key, value in ditTable.items():
+        where = "%s: %s" % (filename, "/".join(path + (key,)))
+        if isinstance(value, dict):
+            if "DIT" in value or "MAG" in value:
+                mags = value.get("MAG", [])
+                dits = value.get("DIT", [])
+                if len(mags) != len(dits) + 1:
+                    raise ValueError(
+                        "%s must have one more MAG than DIT values" % where)
+                if sorted(mags) != mags:
+                    raise ValueError("%s has unsorted MAG values" % where)
+            else:
+                validateDitTable(value, filename, path + (key,))
+        elif not isinstance(value, (int, float)):
+            raise ValueError("%s must be a number" % where)
+
+
+def compileTable(kind, content, filename):
+    """
+    Parse and validate the given json content and return its compiled form.
+    """
+    table = json.loads(content, object_pairs_hook=collections.OrderedDict)
+    compiled = {"table": table}
+    if kind == "rangeTable":
+        validateRangeTable(table, filename)
+        # index every template alias of the 'tpl1, tpl2' keys
+        aliases = {}
+        for k in table.keys():
+            for tpl in k.split(','):
+                aliases[tpl.strip()] = k
+        compiled["aliases"] = aliases
+    else:
+        validateDitTable(table, filename)
+    return compiled
+
+
+class ConfRegistry(object):
+
+    """
+    Load instrument configuration tables once and keep them up to date.
+
+    Tables are searched first in the period subdirectory (e.g. conf/P104/) then
+    in the main conf directory. Their compiled form is stored in a single
+    pickle file of the a2p2 cache and reused while the json file keeps the same
+    modification time and size (or the same content hash).
+    Modified files are reloaded on access (at most every checkInterval seconds).
+    """
+
+    def __init__(self, confdir, cachefile=None, checkInterval=1.0):
+        self.confdir = confdir
+        self.cachefile = cachefile
+        self.checkInterval = checkInterval
+        self.entries = {}  # path -> {mtime, size, hash, compiled}
+        self.lastCheck = {}
+        self.lock = threading.RLock()
+        self.loadCache()
+
+    def getCacheFile(self):
+        if not self.cachefile:
+            self.cachefile = os.path.join(getCacheDir(), CACHE_FILENAME)
+        return self.cachefile
+
+    def loadCache(self):
+        try:
+            with open(self.getCacheFile(), "rb") as f:
+                cache = pickle.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                self.entries = cache["entries"]
+        except Exception:
+            # missing or unreadable cache: it will be rebuilt
+            self.entries = {}
+
+    def saveCache(self):
+        filename = self.getCacheFile()
+        tmpname = filename + ".tmp"
+        try:
+            with open(tmpname, "wb") as f:
+                pickle.dump({"version": CACHE_VERSION,
+                             "entries": self.entries}, f, 2)
+            if os.name == "nt" and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmpname, filename)
+        except (IOError, OSError):
+            pass  # cache is optional
+
+    def getConfDir(self, period=None):
+        """
+        Returns the period specific directory if present, else the main one.
+        """
+        dirname = getPeriodDirName(period)
+        if dirname:
+            periodDir = os.path.join(self.confdir, dirname)
+            if os.path.isdir(periodDir):
+                return periodDir
+        return self.confdir
+
+    def getPath(self, insname, kind, period=None):
+        filename = insname + "_" + kind + ".json"
+        path = os.path.join(self.getConfDir(period), filename)
+        if os.path.isfile(path):
+            return path
+        return os.path.join(self.confdir, filename)
+
+    def getDitTable(self, insname, period=None):
+        return self.getCompiled(insname, "ditTable", period)["table"]
+
+    def getRangeTable(self, insname, period=None):
+        return self.getCompiled(insname, "rangeTable", period)["table"]
+
+    def getTemplateKey(self, insname, tpl, period=None):
+        """
+        Returns the key of the range table that contains the given template.
+
+        ValueError raised if tpl is not found.
+        """
+        aliases = self.getCompiled(insname, "rangeTable", period)["aliases"]
+        if tpl not in aliases:
+            raise ValueError("unknown template '%s'" % tpl)
+        return aliases[tpl]
+
+    def getCompiled(self, insname, kind, period=None):
+        path = self.getPath(insname, kind, period)
+        with self.lock:
+            compiled, changed = self._refresh(path, kind)
+            if changed:
+                self.saveCache()
+            return compiled
+
+    def preload(self, insnames, period=None):
+        """
+        Load every table of the given instruments and save the cache once.
+        Missing tables are ignored.
+        """
+        changed = False
+        with self.lock:
+            for insname in insnames:
+                for kind in TABLE_KINDS:
+                    path = self.getPath(insname, kind, period)
+                    if os.path.isfile(path):
+                        changed = self._refresh(path, kind)[1] or changed
+            if changed:
+                self.saveCache()
+
+    def _refresh(self, path, kind):
+        """
+        Returns (compiled, changed) for the given file, reloading it if needed.
+        """
+        entry = self.entries.get(path)
+        now = time.time()
+        if entry and now - self.lastCheck.get(path, 0) < self.checkInterval:
+            return entry["compiled"], False
+        self.lastCheck[path] = now
+
+        st = os.stat(path)
+        if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+            return entry["compiled"], False
+
+        with open(path, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        if entry and entry["hash"] == digest:
+            compiled = entry["compiled"]
+        else:
+            compiled = compileTable(
+                kind, content.decode("utf-8"), os.path.basename(path))
+        self.entries[path] = {"mtime": st.st_mtime, "size": st.st_size,
+                              "hash": digest, "compiled": compiled}
+        return compiled, True
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+from a2p2.console import ConsoleFacilityUI
+
+# section of the configuration file with P2 credentials and container
+CONFIG_SECTION = "P2"
+
+
+class VltiConsoleUI(ConsoleFacilityUI):
+
+    """
+    Headless VLTI UI: logs in with the credentials of the configuration file
+    and selects its target container instead of asking the user.
+
+    [P2]
+    username = 52052
+    password = tutorial
+    containerId = 1234567
+    ; required only if containerId is a folder
+    runId = 60925704
+    """
+
+    def __init__(self, facility):
+        ConsoleFacilityUI.__init__(self, facility)
+        self.loggingIn = False
+
+    def getConfig(self, option, default=None):
+        return self.a2p2client.getConfig(CONFIG_SECTION, option, default)
+
+    def showLoginFrame(self, ob):
+        if self.loggingIn:
+            return
+        username = self.getConfig("username")
+        password = self.getConfig("password")
+        if not username or not password:
+            self.ShowErrorMessage(
+                "Missing P2 username or password in the [%s] section of the configuration file" % CONFIG_SECTION)
+            return
+        self.loggingIn = True
+        self.facility.connectAPI(username, password, ob)
+
+    def showTreeFrame(self, ob):
+        pass
+
+    def fillTree(self, runs):
+        """
+        Select the configured container among the given runs.
+        """
+        containerId = self.getConfig("containerId")
+        runId = self.getConfig("runId")
+        if not containerId:
+            self.ShowErrorMessage(
+                "Missing containerId in the [%s] section of the configuration file" % CONFIG_SECTION)
+            return
+        containerId = int(containerId)
+        for run in runs:
+            if run['containerId'] == containerId or (runId and run['runId'] == int(runId)):
+                containerInfo = self.facility.containerInfo
+                if containerInfo.containerId == containerId:
+                    return  # already selected
+                containerInfo.store(
+                    run['runId'], run['instrument'], run['containerId'])
+                if run['containerId'] != containerId:
+                    containerInfo.store_containerId(containerId)
+                return
+        self.ShowErrorMessage(
+            "Container %s is not a run of this account, please set its runId in the configuration file" % containerId)
+
+    def showContainer(self, containerId):
+        pass
+
+    def refreshFolders(self, containerId):
+        pass
+
+    def loginDone(self):
+        self.loggingIn = False
+
+    def loginFailed(self):
+        self.loggingIn = False
+
+    def updatePendingOBs(self):
+        pass
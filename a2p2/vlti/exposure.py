@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import numpy as np
+
+# exposure time goals used to compute NDIT and NEXP
+NDIT_TIME = 300      # aimed integration time per exposure (s)
+NDIT_MIN = 10
+NDIT_MAX = 300
+EXP_OVERHEAD = 40    # overhead per exposure (s)
+OB_DURATION = 1800   # aimed duration of one OB (s)
+OB_OVERHEAD = 900    # acquisition overhead of one OB (s)
+NEXP_MIN = 3         # min is O S O
+NEXP_MAX = 40
+
+SEQUENCE = 'O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O'
+
+
+class ExposurePlan(object):
+
+    """
+    Columnar exposure parameters of one or many K magnitudes:
+    dit, ndit, nexp, sequence, duration (estimated OB duration in s)
+    and nditAtMin (True when NDIT has been forced to its min value so the OB
+    takes longer than the aimed duration).
+    """
+
+    def __init__(self, dit, ndit, nexp, sequence, duration, nditAtMin):
+        self.dit = dit
+        self.ndit = ndit
+        self.nexp = nexp
+        self.sequence = sequence
+        self.duration = duration
+        self.nditAtMin = nditAtMin
+
+    def __len__(self):
+        return len(self.dit)
+
+    def __getitem__(self, idx):
+        return ExposurePlan(self.dit[idx], self.ndit[idx], self.nexp[idx],
+                            self.sequence[idx], self.duration[idx], self.nditAtMin[idx])
+
+
+class GravityExposurePlanner(object):
+
+    """
+    Precompute for every (tel, spec, pol, dualField) mode the DIT, NDIT, NEXP,
+    SEQ.OBSSEQ and estimated OB duration of each K magnitude bin of the DIT
+    table. Planning is then a lookup of the K magnitudes in the bin edges.
+    """
+
+    def __init__(self, ditTable):
+        self.ditTable = ditTable
+        self.modes = {}
+
+    def getMode(self, tel, spec, pol, dualField=False):
+        """
+        Returns (kEdges, plan) where plan has one entry per K bin.
+        """
+        key = (tel, spec, pol, bool(dualField))
+        if key not in self.modes:
+            self.modes[key] = self._computeMode(*key)
+        return self.modes[key]
+
+    def _computeMode(self, tel, spec, pol, dualField):
+        ditTable = self.ditTable
+        mags = np.array(ditTable["AT"][spec][pol]['MAG'], dtype=float)
+        dits = np.array(ditTable["AT"][spec][pol]['DIT'], dtype=float)
+        dK = 0.0
+        if dualField:
+            dK += ditTable["AT"]['Kdf']
+        if tel == "UT":
+            dK += ditTable["AT"]['Kut']
+
+        ndit = np.floor(np.clip(NDIT_TIME / dits, NDIT_MIN, NDIT_MAX))
+        exptime = np.floor(ndit * dits + EXP_OVERHEAD)
+        nexp = np.floor((OB_DURATION - OB_OVERHEAD) / exptime)
+
+        # too long exposures: keep min number of exposures and recompute ndit
+        short = nexp < NEXP_MIN
+        nexp[short] = NEXP_MIN
+        exptime = (OB_DURATION - OB_OVERHEAD) / NEXP_MIN
+        shortNdit = np.floor((exptime - EXP_OVERHEAD) / dits)
+        nditAtMin = short & (shortNdit < NDIT_MIN)
+        ndit = np.where(short, np.maximum(shortNdit, NDIT_MIN), ndit)
+        nexp = nexp.astype(int) % NEXP_MAX
+        ndit = ndit.astype(int)
+
+        sequence = np.array([SEQUENCE[0:2 * n] for n in nexp], dtype=np.str_)
+        duration = OB_OVERHEAD + nexp * (ndit * dits + EXP_OVERHEAD)
+
+        return mags + dK, ExposurePlan(dits, ndit, nexp, sequence, duration, nditAtMin)
+
+    def plan(self, tel, spec, pol, dualField, kmags):
+        """
+        Returns the ExposurePlan of the given K magnitude(s).
+
+        * a ValueError is thrown for out of range values *
+        """
+        kEdges, modePlan = self.getMode(tel, spec, pol, dualField)
+        kmags = np.atleast_1d(np.asarray(kmags, dtype=float))
+        # bins are defined as kEdges[i] < K <= kEdges[i+1], lowest edge included
+        idx = np.searchsorted(kEdges, kmags, side='left') - 1
+        idx[kmags == kEdges[0]] = 0
+        outOfRange = (idx < 0) | (idx >= len(modePlan))
+        if outOfRange.any():
+            K = kmags[outOfRange][0]
+            raise ValueError("K mag (%f) is out of ranges [%f,%f]\n for this mode (tel=%s, spec=%s, pol=%s, dualFeed=%s)" % (
+                K, kEdges[0], kEdges[-1], tel, spec, pol, dualField))
+        return modePlan[idx]
+
+    def estimateExecutionTime(self, exposures):
+        """
+        Returns the total estimated duration (s) of the given list of
+        (tel, spec, pol, dualField, K) exposures.
+        Exposures of the same mode are planned in one batch.
+        """
+        byMode = {}
+        for tel, spec, pol, dualField, K in exposures:
+            byMode.setdefault((tel, spec, pol, bool(dualField)), []).append(K)
+        total = 0.0
+        for mode, kmags in byMode.items():
+            total += float(np.sum(self.plan(*(mode + (kmags,))).duration))
+        return total
@@ -2,16 +2,21 @@
 
 __all__ = []
 
+import copy
 import os
 from a2p2.facility import Facility
 from a2p2.instrument import Instrument
 
-from a2p2.vlti.gui import VltiUI
+from a2p2.vlti.confregistry import ConfRegistry
+from a2p2.vlti.p2cache import P2Cache
+from a2p2 import metrics
+from a2p2 import tracing
 
+import threading
 import traceback
 
 
-# TODO handle a period subdirectory
+# period specific files may be stored in a subdirectory (e.g. conf/P104/)
 CONFDIR = "conf"
 
 # Look for configuration files in the same level directory as this module/conf/
@@ -46,23 +51,23 @@ class VltiFacility(Facility):
 
     def __init__(self, a2p2client):
         Facility.__init__(self, a2p2client, "VLTI", HELPTEXT)
-        self.ui = VltiUI(self)
+        if a2p2client.isHeadless():
+            from a2p2.vlti.console import VltiConsoleUI
+            self.ui = VltiConsoleUI(self)
+        else:
+            from a2p2.vlti.gui import VltiUI
+            self.ui = VltiUI(self)
 
-        # Instanciate instruments
-        # TODO complete list and make it more object oriented
-        from a2p2.vlti.gravity import Gravity
-        gravity = Gravity(self)
-        from a2p2.vlti.pionier import Pionier
-        pionier = Pionier(self)
-        # from a2p2.vlti.matisse import Matisse
-        # matisse= Matisse(self)
+        # instrument tables are shared by every instrument through this
+        # registry. The period is updated for each received OB
+        self.confRegistry = ConfRegistry(CONFDIR)
+        self.period = None
 
-        # self.supportedInstrumentsByAspro = ['GRAVITY', 'MATISSE', 'AMBER',
-        # 'PIONIER']
+        # instruments are declared by the a2p2.instruments entry points
+        # (see a2p2.plugins) and imported on their first OB
 
-        # complete help
-        for i in self.getSupportedInstruments():
-            self.facilityHelp += "\n" + i.getHelp()
+        # load every table at once (read from the cache if up to date)
+        self.confRegistry.preload(self.getSupportedInsnames())
 
         self.connected = False
         self.containerInfo = P2Container(self)
@@ -70,6 +75,18 @@ class VltiFacility(Facility):
         # will store later : name for status info, api
         self.username = None
         self.api = None
+        # P2 calls are made from the Tk, login and tree pool threads
+        self.apiLock = threading.Lock()
+        # runs and folders are read from this local cache when possible
+        # account identifies the P2 server and user of cached entries
+        self.p2cache = None
+        self.account = None
+
+        # validated OBs waiting for login and container selection
+        self.pendingOBs = []
+        # pending OBs are submitted out of the Tk thread by this worker
+        self.submitPool = None
+        self.submitting = 0
 
     def processOB(self, ob):
         # give focus on last updated UI
@@ -77,46 +94,130 @@ class VltiFacility(Facility):
         # show ob dict for debug
         self.ui.addToLog(str(ob), False)
 
+        # select period specific configuration files if any
+        self.setPeriod(
+            ob.get(ob.interferometerConfiguration, "version"))
+
         # OB is checked and submitted by instrument
         instrument = self.getInstrument(ob.instrumentConfiguration.name)
         try:
             # run checkOB which may raise some error before connection request
-            instrument.checkOB(ob, self.containerInfo)
+            with tracing.span("check"):
+                instrument.checkOB(ob, self.containerInfo)
 
             # performs operation
+            if self.isReadyToSubmit():
+                self.ui.addToLog(
+                    "everything ready! process OB for selected container")
+                with tracing.span("submit"):
+                    instrument.submitOB(ob, self.containerInfo)
+                metrics.obsSubmitted.inc(facility=self.facilityName)
+                return "submitted"
+
+            # keep the validated OB until login and container selection
+            self.queueOB(ob)
             if not self.isConnected():
                 self.ui.showLoginFrame(ob)
-            elif not self.isReadyToSubmit():
-                 # self.a2p2client.ui.addToLog("Receive OB for
-                 # '"+ob.instrumentConfiguration.name+"'")
-                self.ui.addToLog(
-                    "Please select a Project Id or Folder in the above list. OBs are not shown")
             else:
                 self.ui.addToLog(
-                    "everything ready! process OB for selected container")
-                instrument.submitOB(ob, self.containerInfo)
+                    "Please select a Project Id or Folder in the above list. Pending OBs will then be submitted")
+            return "queued"
+        except Exception as e:
+            self.showOBError(e)
+            return "error"
 
+    def showOBError(self, e):
         # TODO add P2Error handling P2Error(r.status_code, method, url,
         # r.json()['error'])
-        except ValueError as e:
+        if isinstance(e, ValueError):
             traceback.print_exc()
             trace = traceback.format_exc(limit=1)
 # ui.ShowErrorMessage("Value error :\n %s \n%s\n\n%s" % (e, trace,
 # "Aborting submission to P2. Look at the whole traceback in the log."))
             self.ui.ShowErrorMessage("Value error :\n %s \n\n%s" %
                                      (e, "Aborting submission to P2. Please check LOG and fix before new submission."))
-            trace = traceback.format_exc()
-            self.ui.addToLog(trace, False)
-            self.ui.setProgress(0)
-        except Exception as e:
+        else:
             traceback.print_exc()
             trace = traceback.format_exc(
                 limit=1)  # limit = 2 should raise errors in our codes
             self.ui.ShowErrorMessage(
                 "General error or Absent Parameter in template!\n Missing magnitude or OB not set ?\n\nError :\n %s \n Please check LOG and fix before new submission." % (trace))
-            trace = traceback.format_exc()
-            self.ui.addToLog(trace, False)
-            self.ui.setProgress(0)
+        trace = traceback.format_exc()
+        self.ui.addToLog(trace, False)
+        self.ui.setProgress(0)
+
+    def queueOB(self, ob):
+        # its submission will be recorded in the same trace
+        ob.trace = tracing.getCurrentTrace()
+        self.pendingOBs.append(ob)
+        self.ui.updatePendingOBs()
+        self.ui.addToLog("%s OB added to the pending OBs (%d)" %
+                         (ob.getLabel(), len(self.pendingOBs)))
+
+    def removePendingOB(self, idx):
+        del self.pendingOBs[idx]
+        self.ui.updatePendingOBs()
+
+    def clearPendingOBs(self):
+        self.pendingOBs = []
+        self.ui.updatePendingOBs()
+
+    def flushPendingOBs(self):
+        """
+        Submit every pending OB once logged in with a selected container,
+        in the submit worker. OBs that fail are reported and dropped as
+        they would have been without the queue.
+        """
+        if not self.pendingOBs or not self.isReadyToSubmit():
+            return
+        obs = self.pendingOBs
+        self.clearPendingOBs()
+        self.ui.addToLog("Submitting %d pending OB(s) to %s" %
+                         (len(obs), self.containerInfo))
+        self.submitting += len(obs)
+        # the selected container may change meanwhile
+        self.getSubmitPool().apply_async(
+            self.submitPendingOBs, (obs, copy.copy(self.containerInfo)))
+
+    def getSubmitPool(self):
+        if not self.submitPool:
+            from multiprocessing.pool import ThreadPool
+            # one thread: OBs are submitted in order
+            self.submitPool = ThreadPool(1)
+        return self.submitPool
+
+    def submitPendingOBs(self, obs, containerInfo):
+        """ Run by the submit worker. """
+        try:
+            for ob in obs:
+                self.setPeriod(ob.get(ob.interferometerConfiguration, "version"))
+                instrument = self.getInstrument(ob.instrumentConfiguration.name)
+                trace = getattr(ob, "trace", None) or tracing.Trace(label=ob.getLabel())
+                with tracing.trace(trace, self.logTrace):
+                    try:
+                        with tracing.span("submit"):
+                            instrument.submitOB(ob, containerInfo)
+                        trace.status = "submitted"
+                        metrics.obsSubmitted.inc(facility=self.facilityName)
+                    except Exception as e:
+                        self.showOBError(e)
+                        trace.status = "error"
+                        metrics.obsRejected.inc(reason="error")
+        finally:
+            self.a2p2client.ui.runInTkThread(self.submitDone, len(obs))
+
+    def submitDone(self, count):
+        self.submitting -= count
+
+    def isIdle(self):
+        return not self.pendingOBs and not self.submitting
+
+    def close(self):
+        """ Wait for the OBs being submitted. """
+        if self.submitPool:
+            self.submitPool.close()
+            self.submitPool.join()
+            self.submitPool = None
 
     def isReadyToSubmit(self):
         return self.api and self.containerInfo.isOk()
@@ -132,34 +233,160 @@ class VltiFacility(Facility):
             return " P2API connected with " + self.username
 
     def connectAPI(self, username, password, ob):
-        import p2api
+        """
+        Show cached runs at once and log in to P2 in a background thread.
+        The tree can be browsed once logged in: pending OBs are then
+        submitted.
+        """
         if username == '52052':
             type = 'demo'
         else:
             type = 'production'
-        try:
-            self.api = p2api.ApiConnection(type, username, password)
-            # TODO test that api is ok and handle error if any...
+        # self.account is only set once logged in
+        account = type + ":" + username
+        self.ui.addToLog("Logging in to P2 as %s..." % username)
 
-            runs, _ = self.api.getRuns()
+        runs, _ = self.getP2Cache().getRuns(account)
+        if runs:
             self.ui.fillTree(runs)
-
-            self.setConnected(True)
-            self.username = username
             self.ui.showTreeFrame(ob)
+
+        t = threading.Thread(target=self.login,
+                             args=(type, username, password, ob, account))
+        t.daemon = True
+        t.start()
+
+    def login(self, type, username, password, ob, account):
+        """
+        Run in a background thread: authenticate, refresh runs, then load
+        what the first submission needs.
+        """
+        if self.a2p2client.apiName == "fakeAPI":
+            from a2p2.vlti.fakeapi import FakeApiConnection as ApiConnection
+        else:
+            from p2api import ApiConnection
+        try:
+            # every P2 call is recorded in the trace of its OB
+            api = tracing.TracedAPI(
+                ApiConnection(type, username, password), self.apiLock)
+            # TODO test that api is ok and handle error if any...
+            # always done, even with fresh cached runs: this first
+            # authenticated request also opens the connection pool of the
+            # session used by the first submission
+            runs, _ = api.getRuns()
+            if not self.p2cache.storeRuns(account, runs):
+                runs = None  # already shown
         except:
             self.ui.addToLog("Can't connect to P2 (see LOG).")
             trace = traceback.format_exc()
             self.ui.addToLog(trace, False)
+            self.a2p2client.ui.runInTkThread(self.ui.loginFailed)
+            return
+        self.a2p2client.ui.runInTkThread(
+            self.loginDone, api, username, runs, ob, account)
+        self.prefetch(api, account)
+
+    def loginDone(self, api, username, runs, ob, account):
+        self.account = account
+        self.api = api
+        self.setConnected(True)
+        self.username = username
+        self.ui.addToLog("Connected to P2 as %s" % username)
+        self.ui.loginDone()
+        if runs:
+            self.ui.fillTree(runs)
+        self.ui.showTreeFrame(ob)
+        containerId, _ = self.p2cache.getRecentContainer(self.account)
+        if containerId:
+            self.ui.showContainer(containerId)
+        # a container may have been selected in a previous session
+        self.flushPendingOBs()
+
+    def prefetch(self, api, account):
+        """
+        Run in the login thread: fetch the folders of the most recently used
+        container and load the tables of its instrument and of pending OBs.
+        """
+        containerId, instrument = self.p2cache.getRecentContainer(account)
+        try:
+            if containerId and not self.p2cache.getFolders(account, containerId)[1]:
+                self.p2cache.storeFolders(
+                    account, containerId, getFolders(api, containerId))
+        except:
+            self.ui.addToLog(traceback.format_exc(), False)
+
+        insnames = set(ob.instrumentConfiguration.name for ob in list(self.pendingOBs))
+        if instrument:
+            insnames.add(instrument)
+        for insname in insnames:
+            if self.hasSupportedInsname(insname):
+                self.getInstrument(insname).loadTables()
+
+    def getHelp(self):
+        # instrument tables are formatted on demand
+        txt = self.facilityHelp
+        for i in self.getSupportedInstruments():
+            txt += "\n" + i.getHelp()
+        return txt
+
+    def logTrace(self, summary):
+        self.ui.addToLog(summary, False)
 
     def getAPI(self):
         return self.api
 
+    def getP2Cache(self):
+        if not self.p2cache:
+            self.p2cache = P2Cache()
+        return self.p2cache
+
+    def setRecentContainer(self, containerId, instrument):
+        if self.p2cache:
+            self.p2cache.setRecentContainer(
+                self.account, containerId, instrument)
+
+    def fetchFolders(self, containerId):
+        """
+        Returns (folders, changed) read from P2. The cache is updated.
+        """
+        folders = getFolders(self.api, containerId)
+        return folders, self.getP2Cache().storeFolders(self.account, containerId, folders)
+
+    def getRun(self, runId):
+        """
+        Returns the given run, read from the cache if present.
+        """
+        run = self.getP2Cache().getRun(self.account, runId)
+        if run is None:
+            run, _ = self.api.getRun(runId)
+        return run
+
+    def invalidateFolders(self, containerId):
+        """
+        Call me after any folder creation in the given container: the tree
+        is also refreshed if it shows the container.
+        """
+        if self.p2cache:
+            self.p2cache.invalidate(self.account, containerId)
+        self.a2p2client.ui.runInTkThread(self.ui.refreshFolders, containerId)
+
     def getConfDir(self):
         """
         returns the configuration directory with instrument's json files
         """
-        return CONFDIR
+        return self.confRegistry.getConfDir(self.period)
+
+    def getConfRegistry(self):
+        return self.confRegistry
+
+    def getPeriod(self):
+        return self.period
+
+    def setPeriod(self, period):
+        confDir = self.confRegistry.getConfDir(period)
+        if confDir != self.confRegistry.getConfDir(self.period):
+            self.ui.addToLog("Config files loaded from " + confDir)
+        self.period = period
 
 # TODO Move code out of this class
 
@@ -180,10 +407,14 @@ class P2Container:
         self.instrument = instrument
         self.containerId = containerId
         self.log()
+        self.facility.setRecentContainer(containerId, instrument)
+        self.facility.flushPendingOBs()
 
     def store_containerId(self, containerId):
         self.containerId = containerId
         self.log()
+        self.facility.setRecentContainer(containerId, self.instrument)
+        self.facility.flushPendingOBs()
 
     def log(self):
         self.facility.ui.addToLog("*** Working with %s ***" % self)
@@ -195,3 +426,13 @@ class P2Container:
 # return """projectId:'%s', instrument:'%s', containerId:'%s'""" %
 # (self.projectId, self.instrument, self.containerId)
         return """instrument:'%s', containerId:'%s'""" % (self.instrument, self.containerId)
+
+
+# TODO move into a common part
+def getFolders(p2api, containerId):
+    folders = []
+    itemList, _ = p2api.getItems(containerId)
+    for i in range(len(itemList)):
+        if itemList[i]['itemType'] == 'Folder':
+            folders.append(itemList[i])
+    return folders
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import copy
+import itertools
+import threading
+import time
+
+# runs of every fake account
+RUNS = [
+    {"runId": 60925704, "progId": "60.A-9252(M)", "instrument": "GRAVITY",
+     "containerId": 1234567, "period": 60, "mode": "SM", "itemCount": 0},
+    {"runId": 60925705, "progId": "60.A-9252(N)", "instrument": "PIONIER",
+     "containerId": 1234568, "period": 60, "mode": "SM", "itemCount": 0},
+]
+
+
+class FakeP2Error(Exception):
+    pass
+
+
+class FakeApiConnection(object):
+
+    """
+    In memory stand-in of p2api.ApiConnection with the calls used by a2p2
+    (selected with a2p2 -f). Every call waits for latency seconds and is
+    recorded in calls as (method name, duration).
+    """
+
+    def __init__(self, type="demo", username="52052", password="tutorial", latency=0.0):
+        self.type = type
+        self.username = username
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.ids = itertools.count(200000000)
+        self.calls = []
+        self.runs = dict((r["runId"], copy.deepcopy(r)) for r in RUNS)
+        # containerId -> list of items, obId -> ob, templates and constraints
+        self.items = dict((r["containerId"], []) for r in RUNS)
+        self.obs = {}
+        self.templates = {}
+        self.constraints = {}
+        self.versions = {}
+
+    def call(self, name):
+        time.sleep(self.latency)
+        self.calls.append((name, self.latency))
+
+    def newVersion(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return '"%d"' % self.versions[key]
+
+    def checkVersion(self, key, version):
+        if version != '"%d"' % self.versions.get(key, 0):
+            raise FakeP2Error("412 Precondition Failed: %s has been modified" % (key,))
+
+    def getContainer(self, containerId):
+        if containerId not in self.items:
+            raise FakeP2Error("404 Not Found: container %s" % containerId)
+        return self.items[containerId]
+
+    def getRuns(self):
+        self.call("getRuns")
+        return [copy.deepcopy(r) for r in self.runs.values()], None
+
+    def getRun(self, runId):
+        self.call("getRun")
+        return copy.deepcopy(self.runs[runId]), self.newVersion(("run", runId))
+
+    def getItems(self, containerId):
+        self.call("getItems")
+        with self.lock:
+            return copy.deepcopy(self.getContainer(containerId)), None
+
+    def createFolder(self, containerId, name):
+        self.call("createFolder")
+        with self.lock:
+            folder = {"containerId": next(self.ids), "parentContainerId": containerId,
+                      "itemType": "Folder", "name": name}
+            self.getContainer(containerId).append(folder)
+            self.items[folder["containerId"]] = []
+            return copy.deepcopy(folder), self.newVersion(("container", folder["containerId"]))
+
+    def createOB(self, containerId, name):
+        self.call("createOB")
+        with self.lock:
+            ob = {"obId": next(self.ids), "itemType": "OB", "name": name,
+                  "obStatus": "P", "parentContainerId": containerId,
+                  "obsDescription": {"name": name, "userComments": ""},
+                  "target": {}, "constraints": {}}
+            self.getContainer(containerId).append(
+                {"obId": ob["obId"], "itemType": "OB", "name": name})
+            self.obs[ob["obId"]] = ob
+            self.templates[ob["obId"]] = []
+            return copy.deepcopy(ob), self.newVersion(("ob", ob["obId"]))
+
+    def getOB(self, obId):
+        self.call("getOB")
+        with self.lock:
+            return copy.deepcopy(self.obs[obId]), '"%d"' % self.versions[("ob", obId)]
+
+    def saveOB(self, ob, version):
+        self.call("saveOB")
+        with self.lock:
+            key = ("ob", ob["obId"])
+            self.checkVersion(key, version)
+            self.obs[ob["obId"]] = copy.deepcopy(ob)
+            return copy.deepcopy(ob), self.newVersion(key)
+
+    def getSiderealTimeConstraints(self, obId):
+        self.call("getSiderealTimeConstraints")
+        with self.lock:
+            key = ("stc", obId)
+            if key not in self.versions:
+                self.newVersion(key)
+            return list(self.constraints.get(obId, [])), '"%d"' % self.versions[key]
+
+    def saveSiderealTimeConstraints(self, obId, intervals, version):
+        self.call("saveSiderealTimeConstraints")
+        with self.lock:
+            key = ("stc", obId)
+            self.checkVersion(key, version)
+            self.constraints[obId] = copy.deepcopy(intervals)
+            return list(intervals), self.newVersion(key)
+
+    def createTemplate(self, obId, name):
+        self.call("createTemplate")
+        with self.lock:
+            tpl = {"templateId": next(self.ids), "templateName": name,
+                   "parameters": []}
+            self.templates[obId].append(tpl)
+            return copy.deepcopy(tpl), self.newVersion(("tpl", tpl["templateId"]))
+
+    def setTemplateParams(self, obId, tpl, params, version):
+        self.call("setTemplateParams")
+        with self.lock:
+            key = ("tpl", tpl["templateId"])
+            self.checkVersion(key, version)
+            for t in self.templates[obId]:
+                if t["templateId"] == tpl["templateId"]:
+                    t["parameters"] = [{"name": k, "value": v}
+                                       for k, v in params.items()]
+                    return copy.deepcopy(t), self.newVersion(key)
+        raise FakeP2Error("404 Not Found: template %s" % tpl["templateId"])
+
+    def verifyOB(self, obId, submit=False):
+        self.call("verifyOB")
+        with self.lock:
+            ob = self.obs[obId]
+            if submit:
+                ob["obStatus"] = "C"
+            return {"observable": True, "messages": ["OB %d verified by the fake P2 API" % obId]}, None
@@ -3,14 +3,15 @@
 __all__ = []
 
 from a2p2.instrument import Instrument
-from a2p2.vlti.gui import VltiUI
 from a2p2.vlti.instrument import VltiInstrument
 from a2p2.vlti.instrument import TSF
 from a2p2.vlti.instrument import OBConstraints
 from a2p2.vlti.instrument import OBTarget
+from a2p2.vlti.targets import TargetTable
+from a2p2.vlti.exposure import GravityExposurePlanner
+from a2p2.vlti.visibility import VisibilityEngine
+from a2p2.vlti.visibility import getHourAngles
 
-from astropy.coordinates import SkyCoord
-import cgi
 import numpy as np
 import re
 import datetime
@@ -19,19 +20,21 @@ HELPTEXT = """
 Please define Gravity instrument help in a2p2/vlti/gravity.py
 """
 
+# band used to compute SEQ.INS.SOBJ.VIS and SEQ.FT.ROBJ.VIS
+VIS_BAND = "K"
+
 
 class Gravity(VltiInstrument):
 
     def __init__(self, facility):
         VltiInstrument.__init__(self, facility, "GRAVITY")
+        self.exposurePlanner = None
+        self.visibilityEngine = VisibilityEngine()
 
-    # mainly corresponds to a refactoring of old utils.processXmlMessage
-    def checkOB(self, ob, p2container, dryMode=True):
-        api = self.facility.getAPI()
-        ui = self.ui
-        containerId = p2container.containerId
-
-        instrumentConfiguration = ob.instrumentConfiguration
+    def getObservingMode(self, ob):
+        """
+        Returns (tel, ins_spec_res, ins_pol) of the given OB.
+        """
         BASELINE = ob.interferometerConfiguration.stations
         # Compute tel = UT or AT
         # TODO move code into common part
@@ -40,7 +43,7 @@ class Gravity(VltiInstrument):
         else:
             tel = "AT"
 
-        instrumentMode = instrumentConfiguration.instrumentMode
+        instrumentMode = ob.instrumentConfiguration.instrumentMode
 
         # Retrieve SPEC and POL info from instrumentMode
         for res in self.getRange("GRAVITY_gen_acq.tsf", "INS.SPEC.RES"):
@@ -50,6 +53,72 @@ class Gravity(VltiInstrument):
             ins_pol = "OUT"
         else:
             ins_pol = 'IN'
+        return tel, ins_spec_res, ins_pol
+
+    def getExposurePlanner(self):
+        """
+        Returns the exposure planner of the current DIT table (a new one is
+        built if the table has been reloaded).
+        """
+        ditTable = self.getDitTable()
+        if not self.exposurePlanner or self.exposurePlanner.ditTable is not ditTable:
+            self.exposurePlanner = GravityExposurePlanner(ditTable)
+        return self.exposurePlanner
+
+    def loadTables(self):
+        VltiInstrument.loadTables(self)
+        # precompute the exposures of every mode of the DIT table
+        planner = self.getExposurePlanner()
+        for spec, pols in planner.ditTable["AT"].items():
+            if isinstance(pols, dict):
+                for pol in pols.keys():
+                    for tel in ("AT", "UT"):
+                        for dualField in (False, True):
+                            planner.getMode(tel, spec, pol, dualField)
+
+    def getVisibilities(self, ob, targets):
+        """
+        Returns the lowest visibility over the OB baselines of every row of
+        the given TargetTable, observed at the middle of its HA interval.
+        1.0 is returned for every target if the stations are unknown.
+        """
+        try:
+            vis = self.visibilityEngine.getMinVisibilities(
+                ob.interferometerConfiguration.stations, targets.diameter,
+                targets.decDeg, getHourAngles(ob)[targets.obsIndex], VIS_BAND)
+        except ValueError as e:
+            self.ui.addToLog("Can't compute visibilities (%s), using 1.0" % e)
+            vis = [1.0] * len(targets)
+        return [round(float(v), 3) for v in vis]
+
+    def estimateExecutionTime(self, obs):
+        """
+        Returns the estimated execution time (s) of the given list of OBs.
+        """
+        exposures = []
+        for ob in obs:
+            tel, spec, pol = self.getObservingMode(ob)
+            targets = TargetTable(ob, ("SCTarget", "FTTarget"))
+            for i, observationConfiguration in enumerate(ob.observationConfiguration):
+                dualField = targets.getRow(i, "FTTarget") is not None
+                exposures.append(
+                    (tel, spec, pol, dualField, targets.getFlux(i, "K")))
+        return self.getExposurePlanner().estimateExecutionTime(exposures)
+
+    # mainly corresponds to a refactoring of old utils.processXmlMessage
+    def checkOB(self, ob, p2container, dryMode=True):
+        api = self.facility.getAPI()
+        ui = self.ui
+        containerId = p2container.containerId
+
+        BASELINE = ob.interferometerConfiguration.stations
+        instrumentMode = ob.instrumentConfiguration.instrumentMode
+        tel, ins_spec_res, ins_pol = self.getObservingMode(ob)
+
+        # normalize coordinates, proper motions and fluxes of every target at
+        # once and report all precision issues before any P2 call (e.g. folder creation)
+        targets = TargetTable(ob)
+        targets.checkPrecision()
 
         # if we have more than 1 obs, then better put it in a subfolder waiting
         # for the existence of a block sequence not yet implemented in P2
@@ -60,9 +129,15 @@ class Gravity(VltiInstrument):
             folderName = obsconflist[0].SCTarget.name
             folderName = re.sub('[^A-Za-z0-9]+', '_', folderName.strip())
             folder, _ = api.createFolder(containerId, folderName)
+            self.facility.invalidateFolders(containerId)
             containerId = folder['containerId']
 
-        for observationConfiguration in ob.observationConfiguration:
+        planner = self.getExposurePlanner()
+        obDuration = 0.0
+        visibilities = self.getVisibilities(ob, targets)
+        lstIntervals, airmasses = self.getObservability(ob, targets)
+
+        for i, observationConfiguration in enumerate(ob.observationConfiguration):
 
             # create keywords storage objects
             acqTSF = TSF(self, "GRAVITY_gen_acq.tsf")
@@ -88,18 +163,18 @@ class Gravity(VltiInstrument):
             acqTSF.SEQ_INS_SOBJ_NAME = scienceTarget.name.strip()
             obTarget.name = acqTSF.SEQ_INS_SOBJ_NAME.replace(
                 ' ', '_')  # allowed characters: letters, digits, + - _ . and no spaces
-            obTarget.ra, obTarget.dec = self.getCoords(scienceTarget)
-            obTarget.properMotionRa, obTarget.properMotionDec = self.getPMCoords(
-                scienceTarget)
+            obTarget.ra, obTarget.dec = targets.getCoords(i)
+            obTarget.properMotionRa, obTarget.properMotionDec = targets.getPMCoords(
+                i)
 
             # define some default values
-            DIAMETER = float(self.get(scienceTarget, "DIAMETER", 0.0))
-            VIS = 1.0  # FIXME
+            DIAMETER = targets.getDiameter(i)
+            VIS = visibilities[targets.getRow(i)]
 
             # Retrieve Fluxes
-            COU_GS_MAG = self.getFlux(scienceTarget, "V")
-            acqTSF.SEQ_INS_SOBJ_MAG = self.getFlux(scienceTarget, "K")
-            acqTSF.SEQ_FI_HMAG = self.getFlux(scienceTarget, "H")
+            COU_GS_MAG = targets.getFlux(i, "V")
+            acqTSF.SEQ_INS_SOBJ_MAG = targets.getFlux(i, "K")
+            acqTSF.SEQ_FI_HMAG = targets.getFlux(i, "H")
 
             # setup some default values, to be changed below
             COU_AG_GSSOURCE = 'SCIENCE'  # by default
@@ -120,14 +195,14 @@ class Gravity(VltiInstrument):
             ftTarget = ob.get(observationConfiguration, "FTTarget")
             if ftTarget != None:
                 SEQ_FT_ROBJ_NAME = ftTarget.name
-                FTRA, FTDEC = self.getCoords(ftTarget)
+                FTRA, FTDEC = targets.getCoords(i, "FTTarget")
                 # no PMRA, PMDE for FT !!
-                SEQ_FI_HMAG = float(ftTarget.FLUX_H)
+                SEQ_FI_HMAG = targets.getFlux(i, "H", "FTTarget")
                                     # just to say we must treat the case there
                                     # is no FT Target
-                SEQ_FT_ROBJ_MAG = self.getFlux(ftTarget, "K")
-                SEQ_FT_ROBJ_DIAMETER = 0.0  # FIXME
-                SEQ_FT_ROBJ_VIS = 1.0  # FIXME
+                SEQ_FT_ROBJ_MAG = targets.getFlux(i, "K", "FTTarget")
+                SEQ_FT_ROBJ_DIAMETER = targets.getDiameter(i, "FTTarget")
+                SEQ_FT_ROBJ_VIS = visibilities[targets.getRow(i, "FTTarget")]
                 dualField = True
 
                 # test distance in dual field mode
@@ -151,27 +226,23 @@ class Gravity(VltiInstrument):
             if aoTarget != None:
                 AONAME = aoTarget.name
                 COU_AG_GSSOURCE = 'SETUPFILE'  # since we have an AO
-                GSRA, GSDEC = self.getCoords(aoTarget, requirePrecision=False)
-                acqTSF.COU_AG_PMA, acqTSF.COU_AG_PMD = self.getPMCoords(
-                    aoTarget)
+                GSRA, GSDEC = targets.getCoords(i, "AOTarget")
+                acqTSF.COU_AG_PMA, acqTSF.COU_AG_PMD = targets.getPMCoords(
+                    i, "AOTarget")
                 # Case of CIAO to be implemented...based on v and k magnitudes?
-                COU_GS_MAG = float(aoTarget.FLUX_V)
+                COU_GS_MAG = targets.getFlux(i, "V", "AOTarget")
 
             # Guide Star
             gsTarget = ob.get(observationConfiguration, 'GSTarget')
             if gsTarget != None and aoTarget == None:
                 COU_AG_SOURCE = 'SETUPFILE'  # since we have an GS
-                GSRA, GSDEC = self.getCoords(gsTarget, requirePrecision=False)
-                acqTSF.COU_AG_PMA, acqTSF.COU_AG_PMD = self.getPMCoords(
-                    gsTarget)
-                COU_GS_MAG = float(gsTarget.FLUX_V)
+                GSRA, GSDEC = targets.getCoords(i, "GSTarget")
+                acqTSF.COU_AG_PMA, acqTSF.COU_AG_PMD = targets.getPMCoords(
+                    i, "GSTarget")
+                COU_GS_MAG = targets.getFlux(i, "V", "GSTarget")
 
             # LST interval
-            try:
-                obsConstraint = observationConfiguration.observationConstraints
-                LSTINTERVAL = obsConstraint.LSTinterval
-            except:
-                LSTINTERVAL = None
+            LSTINTERVAL = lstIntervals[i]
 
             # Constraints
             obConstraints.name = 'Aspro-created constraints'
@@ -184,42 +255,23 @@ class Gravity(VltiInstrument):
             # The seeing value allowed for this OB is >= java0x0 arcsec."
             obConstraints.seeing = 1.0
             obConstraints.baseline = BASELINE.replace(' ', '-')
+            if airmasses[i]:
+                obConstraints.airmass = airmasses[i]
             # FIXME: default values NOT IN ASPRO!
-            # constaints.airmass = 5.0
             # constaints.fli = 1
 
-            # compute dit, ndit, nexp
-            dit = self.getDit(tel, acqTSF.INS_SPEC_RES, acqTSF.INS_SPEC_POL,
-                              acqTSF.SEQ_INS_SOBJ_MAG, dualField, showWarning=dryMode)
-            ndit = 300 / dit
-            if ndit < 10:
-                ndit = 10
-            if ndit > 300:
-                ndit = 300
-            ndit = int(ndit)  # must be integer
-            exptime = int(ndit * dit + 40)  # 40 sec overhead by exp
-            nexp = (1800 - 900) / exptime
-            nexp = int(nexp)
-            ui.addToLog(
-                'number of exposures to reach 1800 s per OB is ' + str(nexp))
-            if nexp < 3:
-                nexp = 3  # min is O S O
-                # recompute ndit
-                exptime = (1800 - 900) / nexp
-                ndit = (exptime - 40) / dit
-                ndit = int(ndit)
-                if ndit < 10:
-                    ndit = 10
-                    ui.addToLog(
-                        "**Warning**, OB NDIT has been set to min value=%d, but OB will take longer than 1800 s" % (ndit))
-            nexp %= 40
-            sequence = 'O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O S O O'
-            my_sequence = sequence[0:2 * nexp]
+            # compute dit, ndit, nexp from the precomputed exposure tables
+            exposure = planner.plan(tel, acqTSF.INS_SPEC_RES, acqTSF.INS_SPEC_POL,
+                                    dualField, acqTSF.SEQ_INS_SOBJ_MAG)[0]
+            if exposure.nditAtMin:
+                ui.addToLog(
+                    "**Warning**, OB NDIT has been set to min value=%d, but OB will take longer than 1800 s" % (exposure.ndit))
+            obDuration += exposure.duration
             # and store computed values in obsTSF
-            obsTSF.DET2_DIT = dit
-            obsTSF.DET2_NDIT_OBJECT = ndit
-            obsTSF.DET2_NDIT_SKY = ndit
-            obsTSF.SEQ_OBSSEQ = my_sequence
+            obsTSF.DET2_DIT = float(exposure.dit)
+            obsTSF.DET2_NDIT_OBJECT = int(exposure.ndit)
+            obsTSF.DET2_NDIT_SKY = int(exposure.ndit)
+            obsTSF.SEQ_OBSSEQ = str(exposure.sequence)
             obsTSF.SEQ_SKY_X = 2000
             obsTSF.SEQ_SKY_Y = 2000
 
@@ -229,6 +281,7 @@ class Gravity(VltiInstrument):
                     obTarget.name + " ready for p2 upload (details logged)")
                 ui.addToLog(obTarget, False)
                 ui.addToLog(obConstraints, False)
+                ui.addToLog("SEQ.INS.SOBJ.VIS : %.3f" % VIS, False)
                 ui.addToLog(acqTSF, False)
                 ui.addToLog(obsTSF, False)
 
@@ -236,9 +289,12 @@ class Gravity(VltiInstrument):
                 self.createGravityOB(
                     ui, self.facility.a2p2client.getUsername(
                     ), api, containerId, obTarget, obConstraints, acqTSF, obsTSF, OBJTYPE, instrumentMode,
-                                     DIAMETER, COU_AG_GSSOURCE, GSRA, GSDEC, COU_GS_MAG, dualField, dualFieldDistance, SEQ_FT_ROBJ_NAME, SEQ_FT_ROBJ_MAG, SEQ_FT_ROBJ_DIAMETER, SEQ_FT_ROBJ_VIS, LSTINTERVAL)
+                                     DIAMETER, VIS, COU_AG_GSSOURCE, GSRA, GSDEC, COU_GS_MAG, dualField, dualFieldDistance, SEQ_FT_ROBJ_NAME, SEQ_FT_ROBJ_MAG, SEQ_FT_ROBJ_DIAMETER, SEQ_FT_ROBJ_VIS, LSTINTERVAL)
                 ui.addToLog(obTarget.name + " submitted on p2")
         # endfor
+        if dryMode:
+            ui.addToLog("Estimated execution time: %d min" %
+                        round(obDuration / 60.0))
         if doFolder:
             containerId = parentContainerId
             doFolder = False
@@ -315,13 +371,10 @@ class Gravity(VltiInstrument):
 
     def createGravityOB(
         self, ui, username, api, containerId, obTarget, obConstraints, acqTSF, obsTSF, OBJTYPE, instrumentMode,
-                        DIAMETER, COU_AG_GSSOURCE, GSRA, GSDEC, COU_GS_MAG, dualField, dualFieldDistance, SEQ_FT_ROBJ_NAME, SEQ_FT_ROBJ_MAG,
+                        DIAMETER, VIS, COU_AG_GSSOURCE, GSRA, GSDEC, COU_GS_MAG, dualField, dualFieldDistance, SEQ_FT_ROBJ_NAME, SEQ_FT_ROBJ_MAG,
                         SEQ_FT_ROBJ_DIAMETER, SEQ_FT_ROBJ_VIS, LSTINTERVAL):
         ui.setProgress(0.1)
 
-        # TODO compute value
-        VISIBILITY = 1.0
-
         # everything seems OK
         # create new OB in container:
         goodName = re.sub('[^A-Za-z0-9]+', '_', acqTSF.SEQ_INS_SOBJ_NAME)
@@ -375,7 +428,7 @@ class Gravity(VltiInstrument):
         values = acqTSF.getDict()
         values.update({
             'SEQ.INS.SOBJ.DIAMETER':   DIAMETER,
-                    'SEQ.INS.SOBJ.VIS':   VISIBILITY,
+                    'SEQ.INS.SOBJ.VIS':   VIS,
                     'COU.AG.GSSOURCE':   COU_AG_GSSOURCE,
                     'COU.AG.ALPHA':   GSRA,
                     'COU.AG.DELTA':   GSDEC,
@@ -4,6 +4,7 @@ __all__ = []
 
 import sys
 import traceback
+from multiprocessing.pool import ThreadPool
 
 from a2p2.gui import FacilityUI
 
@@ -16,6 +17,12 @@ else:
     from tkinter.messagebox import *
     import tkinter.ttk as ttk
 
+# number of threads used to fetch the folders of the P2 tree out of the Tk
+# thread (their P2 calls are serialized, see VltiFacility.apiLock)
+TREE_FETCH_THREADS = 2
+# iid suffix of the child shown under containers not explored yet
+PLACEHOLDER = "_placeholder"
+
 
 class VltiUI(FacilityUI):
 
@@ -32,15 +39,46 @@ class VltiUI(FacilityUI):
         self.treeFrame = TreeFrame(self)
         self.treeFrame.grid(row=0, column=0, sticky="nsew")
         self.tree = self.treeFrame.tree
+        # containers whose folders are loaded or being loaded
+        self.exploredContainers = set()
+        self.treePool = None
 
         self.container.pack(fill=BOTH, expand=True)
 
+        self.pendingFrame = PendingFrame(self)
+        self.pendingFrame.pack(side=BOTTOM, fill=X)
+
+    def destroy(self):
+        # called by Tk when the main window is destroyed
+        if self.treePool:
+            self.treePool.terminate()
+            self.treePool.join()
+            self.treePool = None
+        self.facility.close()
+        FacilityUI.destroy(self)
+
     def showLoginFrame(self, ob):
         self.ob = ob
-        self.addToLog("Sorry, your %s OB can't be submitted, please log in first, select container and send OB again from Aspro2." %
+        self.addToLog("Your %s OB is pending, please log in and select a container: it will then be submitted." %
                       (ob.instrumentConfiguration.name))
         self.loginFrame.tkraise()
 
+    def loginDone(self):
+        self.loginFrame.loginbutton.configure(state=NORMAL)
+
+    def loginFailed(self):
+        self.loginFrame.loginbutton.configure(state=NORMAL)
+        self.loginFrame.tkraise()
+
+    def showContainer(self, containerId):
+        """ Highlight the given container if present in the tree. """
+        if self.tree.exists(containerId):
+            self.tree.see(containerId)
+            self.tree.selection_set(containerId)
+
+    def updatePendingOBs(self):
+        self.pendingFrame.showOBs(self.facility.pendingOBs)
+
     def showTreeFrame(self, ob):
         self.addToLog("Please select a runId in ESO P2 database to process %s OB" %
                       (ob.instrumentConfiguration.name))
@@ -52,46 +90,108 @@ class VltiUI(FacilityUI):
                 "No Runs defined, impossible to program ESO's P2 interface.")
             return
 
+        # only runs are loaded here, folders are fetched on first expansion.
+        # The tree may already show cached runs: it is updated in place
+        items = []
         for i in range(len(runs)):
             if self.facility.hasSupportedInsname(runs[i]['instrument']):
                 runName = runs[i]['progId']
                 instrument = runs[i]['instrument']
                 rid = runs[i]['runId']
                 cid = runs[i]['containerId']
-                self.tree.insert(
-                    '', 'end', cid, text=runName, values=(instrument, cid), tags=('run', rid))
-                # if folders, add them recursively
-                folders = getFolders(self.facility.api, cid)
-                if len(folders) > 0:
-                    try:
-                        self.folder_explore(folders, cid, instrument, rid)
-                    except:
-                        pass
-
-    def folder_added(self, name, pid, cid):
-        ret = self.tree.item(pid)
+                items.append((cid, runName, (instrument, cid), ('run', rid)))
+        self.syncChildren('', items)
+
+    def syncChildren(self, parent, items):
+        """
+        Update the children of parent to the given (iid, text, values, tags)
+        list: removed entries are deleted, new ones added with a placeholder
+        and other ones moved to their new position keeping their subtree.
+        """
+        iids = set(str(item[0]) for item in items)
+        for child in self.tree.get_children(parent):
+            if child not in iids:
+                self.tree.delete(child)
+        for idx, (iid, text, values, tags) in enumerate(items):
+            if self.tree.exists(iid):
+                self.tree.move(iid, parent, idx)
+                self.tree.item(iid, text=text)
+            else:
+                self.tree.insert(parent, idx, iid, text=text,
+                                 values=values, tags=tags)
+                self.exploredContainers.discard(str(iid))
+                self.addPlaceholder(iid)
+
+    def addPlaceholder(self, cid):
+        # gives an expandable item until its folders are known
+        self.tree.insert(cid, 'end', str(cid) + PLACEHOLDER, text="...")
+
+    def getTreePool(self):
+        if not self.treePool:
+            self.treePool = ThreadPool(TREE_FETCH_THREADS)
+        return self.treePool
+
+    def on_tree_open(self, event):
+        cid = self.tree.focus()
+        if not cid or cid in self.exploredContainers:
+            return
+        if not self.facility.getAPI():
+            # cached runs shown while logging in: expanded once logged in
+            self.addToLog("Please wait for the P2 login to complete")
+            return
+        self.exploredContainers.add(cid)
+        # show cached folders at once then revalidate if too old
+        folders, fresh = self.facility.getP2Cache().getFolders(
+            self.facility.account, int(cid))
+        if folders is not None:
+            self.folders_loaded(cid, folders)
+        if not fresh:
+            self.getTreePool().apply_async(self.fetchFolders, (cid,))
+
+    def refreshFolders(self, containerId):
+        """ Read again the folders of an explored container (e.g. new folder). """
+        cid = str(containerId)
+        if cid not in self.exploredContainers:
+            return  # read on next expansion
+        self.exploredContainers.discard(cid)
+        self.getTreePool().apply_async(self.fetchFolders, (cid,))
+
+    def fetchFolders(self, cid):
+        """ Run by the tree pool, the tree is then updated in the Tk thread. """
+        try:
+            folders, changed = self.facility.fetchFolders(int(cid))
+            if not changed:
+                # explored again after refreshFolders()
+                self.a2p2client.ui.runInTkThread(self.exploredContainers.add, cid)
+                return
+        except:
+            self.addToLog("Can't get folders of container %s (see LOG)." % cid)
+            self.addToLog(traceback.format_exc(), False)
+            folders = None
+        self.a2p2client.ui.runInTkThread(self.folders_loaded, cid, folders)
+
+    def folders_loaded(self, cid, folders):
+        if not self.tree.exists(cid):
+            return  # tree has been reloaded meanwhile
+        if folders is None:
+            # next expansion tries again
+            self.exploredContainers.discard(cid)
+            return
+        self.exploredContainers.add(cid)
+        if self.tree.exists(cid + PLACEHOLDER):
+            self.tree.delete(cid + PLACEHOLDER)
+        ret = self.tree.item(cid)
         curinst = ret['values'][0]
-        tag = ret['tags']
-        rid = tag[1]
-        self.tree.insert(pid, 'end', cid, text=name,
-                         values=(curinst, cid), tags=('folder', rid))
-
-    def folder_explore(self, folders, contid, instrument, rid):
-        for j in range(len(folders)):
-            name = folders[j]['name']
-            contid2 = folders[j]['containerId']
-            self.tree.insert(contid, 'end', contid2, text=name,
-                             values=(instrument, contid2), tags=('folder', rid))
-            folders2 = getFolders(self.facility.api, contid2)
-            if len(folders2) > 0:
-                try:
-                    self.folder_explore(folders2, contid2, instrument, rid)
-                except:
-                    pass
+        rid = ret['tags'][1]
+        self.syncChildren(cid, [(f['containerId'], f['name'], (curinst, f['containerId']), ('folder', rid))
+                                for f in folders])
 
     def on_tree_selection_changed(self, selection):
         curItem = self.tree.focus()
         ret = self.tree.item(curItem)
+        if not self.facility.getAPI():
+            self.addToLog("Please wait for the P2 login to complete")
+            return
         if len(ret['values']) > 0:
             curinst = ret['values'][0]
             cid = ret['values'][1]
@@ -108,7 +208,7 @@ class VltiUI(FacilityUI):
                     new_containerId_same_run)
             else:
                 instru = curinst
-                run, _ = self.facility.api.getRun(rid)
+                run = self.facility.getRun(rid)
                 containerId = run["containerId"]
                 self.facility.containerInfo.store(rid, instru, containerId)
 
@@ -140,6 +240,7 @@ class TreeFrame(Frame):
         self.tree.heading('#2', text='folder Id', anchor='w')
         self.tree.bind(
             '<ButtonRelease-1>', self.vltiUI.on_tree_selection_changed)
+        self.tree.bind('<<TreeviewOpen>>', self.vltiUI.on_tree_open)
 
         # grid layout does not expand and fill all area then move to pack
 #       self.tree.grid(row=0, column=0, sticky='nsew')
@@ -153,6 +254,38 @@ class TreeFrame(Frame):
         subframe.pack(side=TOP, fill=BOTH, expand=True)
 
 
+class PendingFrame(LabelFrame):
+
+    """
+    List of the OBs waiting for login and container selection.
+    """
+
+    def __init__(self, vltiUI):
+        LabelFrame.__init__(self, vltiUI, text="Pending OBs")
+        self.vltiUI = vltiUI
+
+        self.listbox = Listbox(self, height=4, selectmode=EXTENDED)
+        self.listbox.pack(side=LEFT, fill=BOTH, expand=True)
+
+        buttons = Frame(self)
+        Button(buttons, text="Remove", command=self.on_remove_clicked).pack(fill=X)
+        Button(buttons, text="Clear", command=self.on_clear_clicked).pack(fill=X)
+        buttons.pack(side=RIGHT)
+
+    def showOBs(self, obs):
+        self.listbox.delete(0, END)
+        for ob in obs:
+            self.listbox.insert(END, ob.getLabel())
+        self.configure(text="Pending OBs (%d)" % len(obs))
+
+    def on_remove_clicked(self):
+        for idx in sorted(self.listbox.curselection(), reverse=True):
+            self.vltiUI.facility.removePendingOB(int(idx))
+
+    def on_clear_clicked(self):
+        self.vltiUI.facility.clearPendingOBs()
+
+
 class LoginFrame(Frame):
 
     def __init__(self, vltiUI):
@@ -191,15 +324,7 @@ class LoginFrame(Frame):
         self.pack(side=TOP, fill=BOTH, expand=True)
 
     def on_loginbutton_clicked(self):
+        # enabled again once the background login is done
+        self.loginbutton.configure(state=DISABLED)
         self.vltiUI.facility.connectAPI(
             self.username.get(),  self.password.get(), self.vltiUI.ob)
-
-
-# TODO move into a common part
-def getFolders(p2api, containerId):
-    folders = []
-    itemList, _ = p2api.getItems(containerId)
-    for i in range(len(itemList)):
-        if itemList[i]['itemType'] == 'Folder':
-            folders.append(itemList[i])
-    return folders
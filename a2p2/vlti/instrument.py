@@ -2,13 +2,11 @@
 
 __all__ = []
 
-import os
-import json
-import collections
-from astropy.coordinates import SkyCoord
 import numpy as np
 from a2p2.instrument import Instrument
-from a2p2.vlti.gui import VltiUI
+from a2p2.observability import formatLSTInterval
+from a2p2.observability import getObservabilityEngine
+from a2p2.observability import parseLSTInterval
 
 
 class VltiInstrument(Instrument):
@@ -18,10 +16,6 @@ class VltiInstrument(Instrument):
         self.facility = facility
         self.ui = facility.ui
 
-        # use in latter lazy initialisation
-        self.rangeTable = None
-        self.ditTable = None
-
     def get(self, obj, fieldname, defaultvalue):
         if fieldname in obj._fields:
             return getattr(obj, fieldname)
@@ -76,6 +70,7 @@ class VltiInstrument(Instrument):
 # ditTable and rangeTable are extracted from online doc:
 # -- https://www.eso.org/sci/facilities/paranal/instruments/gravity/doc/Gravity_TemplateManual.pdf
 # they are saved in json and displayed in the Help on application startup
+# they are loaded and cached by the facility's ConfRegistry (see confregistry.py)
 
 # k = 'GRAVITY_gen_acq.tsf'
 # using collections.OrderedDict to keep the order of keys:
@@ -84,12 +79,8 @@ class VltiInstrument(Instrument):
 #...
 
     def getDitTable(self):
-        if self.ditTable:
-            return self.ditTable
-        f = os.path.join(
-            self.facility.getConfDir(), self.getName() + "_ditTable.json")
-        self.ditTable = json.load(open(f))
-        return self.ditTable
+        return self.facility.getConfRegistry().getDitTable(
+            self.getName(), self.facility.getPeriod())
 
     def getDit(self, tel, spec, pol, K, dualFeed=False, showWarning=False):
         """
@@ -131,15 +122,18 @@ class VltiInstrument(Instrument):
             K, kmin, kmax, tel, spec, pol, dualFeed))
 
     def getRangeTable(self):
-        if self.rangeTable:
-            return self.rangeTable
-        f = os.path.join(
-            self.facility.getConfDir(), self.getName() + "_rangeTable.json")
         # TODO use .tmp.json keys
-        # using collections.OrderedDict to keep the order of keys:
-        self.rangeTable = json.load(
-            open(f), object_pairs_hook=collections.OrderedDict)
-        return self.rangeTable
+        return self.facility.getConfRegistry().getRangeTable(
+            self.getName(), self.facility.getPeriod())
+
+    def getTemplateKey(self, tpl):
+        """
+        returns the key of the rangeTable that handles template "tpl"
+
+        ValueError raised if tpl is not found.
+        """
+        return self.facility.getConfRegistry().getTemplateKey(
+            self.getName(), tpl, self.facility.getPeriod())
 
     def isInRange(self, tpl, key, value):
         """
@@ -148,13 +142,8 @@ class VltiInstrument(Instrument):
         ValueError raised if key or tpl is not found.
         """
         rangeTable = self.getRangeTable()
-        _tpl = ''
         # -- find relevant range dictionnary
-        for k in rangeTable.keys():
-            if tpl in [l.strip() for l in k.split(',')]:
-                _tpl = k
-        if _tpl == '':
-            raise ValueError("unknown template '%s'" % tpl)
+        _tpl = self.getTemplateKey(tpl)
         if not key in rangeTable[_tpl].keys():
             raise ValueError(
                 "unknown keyword '%s' in template '%s'" % (key, tpl))
@@ -180,13 +169,8 @@ class VltiInstrument(Instrument):
         ValueError raised if key or tpl is not found.
         """
         rangeTable = self.getRangeTable()
-        _tpl = ''
         # -- find relevant range dictionnary
-        for k in rangeTable.keys():
-            if tpl in [l.strip() for l in k.split(',')]:
-                _tpl = k
-        if _tpl == '':
-            raise ValueError("unknown template '%s'" % tpl)
+        _tpl = self.getTemplateKey(tpl)
         if not key in rangeTable[_tpl].keys():
             raise ValueError(
                 "unknown keyword '%s' in template '%s'" % (key, tpl))
@@ -206,26 +190,76 @@ class VltiInstrument(Instrument):
         ValueError raised if tpl is not found.
         """
         rangeTable = self.getRangeTable()
-        _tpl = ''
         # -- find relevant range dictionnary
-        for k in rangeTable.keys():
-            if tpl in [l.strip() for l in k.split(',')]:
-                _tpl = k
-        if _tpl == '':
-            raise ValueError("unknown template '%s'" % tpl)
+        _tpl = self.getTemplateKey(tpl)
         res = {}
         for key in rangeTable[_tpl].keys():
             if 'default' in rangeTable[_tpl][key].keys():
                 res[key] = rangeTable[_tpl][key]["default"]
         return res
 
+    def loadTables(self):
+        """
+        Load the tables used to check and submit OBs so that the first
+        submission does not wait for them. Called after login in background.
+        """
+        self.getDitTable()
+        self.getRangeTable()
+
     def getSkyDiff(self, ra, dec, ftra, ftdec):
+        # astropy is only loaded for dual field OBs
+        from astropy.coordinates import SkyCoord
         science = SkyCoord(ra, dec, frame='icrs', unit='deg')
         ft = SkyCoord(ftra, ftdec, frame='icrs', unit='deg')
         ra_offset = (science.ra - ft.ra) * np.cos(ft.dec.to('radian'))
         dec_offset = (science.dec - ft.dec)
         return [ra_offset.deg * 3600 * 1000, dec_offset.deg * 3600 * 1000]  # in mas
 
+    def getObservability(self, ob, targets):
+        """
+        Returns the LST intervals ('HH:MM/HH:MM' or None) and the airmass
+        constraints (or None) of every observationConfiguration.
+
+        LST intervals given by Aspro2 are checked against the time the science
+        targets stay above the VLTI elevation limit, missing ones are derived
+        from it.
+        """
+        engine = getObservabilityEngine("VLTI")
+        rows = [targets.getRow(i)
+                for i in range(len(ob.observationConfiguration))]
+        ra, dec = targets.raDeg[rows], targets.decDeg[rows]
+        windows = engine.getLSTWindows(ra, dec)
+
+        lstIntervals = []
+        intervals = []
+        for i, observationConfiguration in enumerate(ob.observationConfiguration):
+            name = targets.name[rows[i]]
+            constraints = ob.get(
+                observationConfiguration, "observationConstraints")
+            LSTINTERVAL = ob.get(
+                constraints, "LSTinterval") if constraints else None
+            if LSTINTERVAL:
+                interval = parseLSTInterval(LSTINTERVAL)
+            elif windows[i] and windows[i][0] != (0.0, 24.0):
+                # use the longest observable window
+                interval = max(windows[i], key=lambda w: (w[1] - w[0]) % 24)
+                LSTINTERVAL = formatLSTInterval(interval)
+                self.ui.addToLog("No LST interval given for %s, using %s (above %d deg)" % (
+                    name, LSTINTERVAL, engine.site.minElevation))
+            else:
+                interval = None
+            lstIntervals.append(LSTINTERVAL)
+            intervals.append(interval)
+
+        coverage = engine.getCoverage(ra, dec, intervals)
+        for i in np.flatnonzero(coverage < 0.99):
+            self.ui.addToLog("**Warning**, %s is below %d deg during %d%% of its LST interval %s" % (
+                targets.name[rows[i]], engine.site.minElevation, round(100 * (1 - coverage[i])), lstIntervals[i]))
+
+        airmasses = [None if np.isnan(a) else float(a)
+                     for a in engine.getAirmassConstraints(ra, dec, intervals)]
+        return lstIntervals, airmasses
+
     def getHelp(self):
         s = self.getName()
         s_name = s
@@ -253,16 +287,19 @@ class VltiInstrument(Instrument):
         return s
 
     def showP2Response(self, response, ob, obId):
+        messages = '\n'.join(response['messages'])
         if response['observable']:
             msg = 'OB ' + \
                 str(obId) + ' submitted successfully on P2\n' + \
                     ob['name'] + ' is OK.'
+            notify = self.ui.ShowInfoMessage
         else:
             msg = 'OB ' + str(obId) + ' submitted successfully on P2\n' + ob[
-                'name'] + ' has WARNING.\n see LOG for details.'
+                'name'] + ' has WARNING.'
+            notify = self.ui.ShowWarningMessage
         self.ui.addToLog('\n')
-        self.ui.ShowInfoMessage(msg)
-        self.ui.addToLog('\n'.join(response['messages']) + '\n\n')
+        # one non modal notification per OB, reviewed at the end of the batch
+        notify(msg + '\n\n' + messages, ob['name'])
 
 # TemplateSignatureFile
 # use new style class to get __getattr__ advantage
@@ -3,15 +3,11 @@
 __all__ = []
 
 from a2p2.instrument import Instrument
-from a2p2.vlti.gui import VltiUI
 from a2p2.vlti.instrument import VltiInstrument
 from a2p2.vlti.instrument import TSF
 from a2p2.vlti.instrument import OBConstraints
 from a2p2.vlti.instrument import OBTarget
 
-from astropy.coordinates import SkyCoord
-import cgi
-import numpy as np
 import re
 import datetime
 
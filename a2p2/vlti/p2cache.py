@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from a2p2.cache import getCacheDir
+
+CACHE_FILENAME = "p2.sqlite"
+
+# delay (s) after which cached values are revalidated against P2
+P2CACHE_TTL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    account TEXT, runId INTEGER, containerId INTEGER, data TEXT,
+    PRIMARY KEY (account, runId));
+CREATE TABLE IF NOT EXISTS folders (
+    account TEXT, parentId INTEGER, containerId INTEGER, position INTEGER,
+    data TEXT, PRIMARY KEY (account, parentId, containerId));
+CREATE TABLE IF NOT EXISTS listings (
+    account TEXT, parentId INTEGER, updated REAL, hash TEXT,
+    PRIMARY KEY (account, parentId));
+CREATE TABLE IF NOT EXISTS recent (
+    account TEXT PRIMARY KEY, containerId INTEGER, instrument TEXT);
+"""
+
+# parentId of the listing that records the run list
+RUNS_LISTING = -1
+
+
+def getHash(items):
+    return hashlib.sha1(json.dumps(items, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class P2Cache(object):
+
+    """
+    Local SQLite copy of the P2 runs and of the folder hierarchy of every
+    account.
+
+    Each listing (runs of an account or folders of a container) is stored with
+    its update time and content hash: get methods return (items, fresh) with
+    fresh False once ttl is elapsed and store methods tell if the content did
+    change so callers only refresh what is needed.
+    The connection is shared by every thread and protected by a lock.
+    """
+
+    def __init__(self, filename=None, ttl=P2CACHE_TTL):
+        if not filename:
+            filename = os.path.join(getCacheDir(), CACHE_FILENAME)
+        self.filename = filename
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _getListing(self, account, parentId):
+        row = self.db.execute(
+            "SELECT updated, hash FROM listings WHERE account=? AND parentId=?",
+            (account, parentId)).fetchone()
+        if row is None:
+            return None, None
+        return row
+
+    def _storeListing(self, account, parentId, items):
+        """
+        Returns True if the given items differ from the cached ones.
+        """
+        digest = getHash(items)
+        changed = self._getListing(account, parentId)[1] != digest
+        self.db.execute(
+            "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+            (account, parentId, time.time(), digest))
+        return changed
+
+    def isFresh(self, updated):
+        return updated is not None and time.time() - updated < self.ttl
+
+    def getRuns(self, account):
+        """
+        Returns (runs, fresh) or (None, False) if runs were never cached.
+        """
+        with self.lock:
+            updated, _ = self._getListing(account, RUNS_LISTING)
+            if updated is None:
+                return None, False
+            rows = self.db.execute(
+                "SELECT data FROM runs WHERE account=? ORDER BY rowid",
+                (account,)).fetchall()
+            return [json.loads(r[0]) for r in rows], self.isFresh(updated)
+
+    def storeRuns(self, account, runs):
+        """
+        Replace the runs of the given account. Returns True if they changed.
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM runs WHERE account=?", (account,))
+            self.db.executemany("INSERT INTO runs VALUES (?, ?, ?, ?)", [
+                (account, r['runId'], r['containerId'], json.dumps(r)) for r in runs])
+            return self._storeListing(account, RUNS_LISTING, runs)
+
+    def getRun(self, account, runId):
+        """
+        Returns the cached run or None.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data FROM runs WHERE account=? AND runId=?",
+                (account, runId)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def getFolders(self, account, containerId):
+        """
+        Returns (folders, fresh) or (None, False) if the container was never
+        explored.
+        """
+        with self.lock:
+            updated, _ = self._getListing(account, containerId)
+            if updated is None:
+                return None, False
+            rows = self.db.execute(
+                "SELECT data FROM folders WHERE account=? AND parentId=? ORDER BY position",
+                (account, containerId)).fetchall()
+            return [json.loads(r[0]) for r in rows], self.isFresh(updated)
+
+    def storeFolders(self, account, containerId, folders):
+        """
+        Replace the folders of the given container. Returns True if they changed.
+        """
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM folders WHERE account=? AND parentId=?",
+                            (account, containerId))
+            self.db.executemany("INSERT INTO folders VALUES (?, ?, ?, ?, ?)", [
+                (account, containerId, f['containerId'], i, json.dumps(f)) for i, f in enumerate(folders)])
+            return self._storeListing(account, containerId, folders)
+
+    def setRecentContainer(self, account, containerId, instrument):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO recent VALUES (?, ?, ?)",
+                            (account, containerId, instrument))
+
+    def getRecentContainer(self, account):
+        """
+        Returns (containerId, instrument) of the last selected container or
+        (None, None).
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT containerId, instrument FROM recent WHERE account=?",
+                (account,)).fetchone()
+            return tuple(row) if row else (None, None)
+
+    def invalidate(self, account, containerId):
+        """
+        Forces the revalidation of the folders of the given container
+        (e.g. after a folder creation).
+        """
+        with self.lock, self.db:
+            self.db.execute("UPDATE listings SET updated=0 WHERE account=? AND parentId=?",
+                            (account, containerId))
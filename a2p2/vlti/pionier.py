@@ -3,15 +3,12 @@
 __all__ = []
 
 from a2p2.instrument import Instrument
-from a2p2.vlti.gui import VltiUI
 from a2p2.vlti.instrument import VltiInstrument
 from a2p2.vlti.instrument import TSF
 from a2p2.vlti.instrument import OBConstraints
 from a2p2.vlti.instrument import OBTarget
+from a2p2.vlti.targets import TargetTable
 
-from astropy.coordinates import SkyCoord
-import cgi
-import numpy as np
 import re
 import datetime
 
@@ -47,6 +44,11 @@ class Pionier(VltiInstrument):
             if disp in instrumentMode[0:len(disp)]:
                 ins_disp = disp
 
+        # normalize coordinates, proper motions and fluxes of every target at
+        # once and report all precision issues before any P2 call (e.g. folder creation)
+        targets = TargetTable(ob)
+        targets.checkPrecision()
+
         # if we have more than 1 obs, then better put it in a subfolder waiting
         # for the existence of a block sequence not yet implemented in P2
         obsconflist = ob.observationConfiguration
@@ -56,9 +58,12 @@ class Pionier(VltiInstrument):
             folderName = obsconflist[0].Target.name
             folderName = re.sub('[^A-Za-z0-9]+', '_', folderName.strip())
             folder, _ = api.createFolder(containerId, folderName)
+            self.facility.invalidateFolders(containerId)
             containerId = folder['containerId']
 
-        for observationConfiguration in ob.observationConfiguration:
+        lstIntervals, airmasses = self.getObservability(ob, targets)
+
+        for i, observationConfiguration in enumerate(ob.observationConfiguration):
 
             # create keywords storage objects
             acqTSF = TSF(self, "PIONIER_acq.tsf")
@@ -87,17 +92,17 @@ class Pionier(VltiInstrument):
             acqTSF.TARGET_NAME = scienceTarget.name.strip()
             obTarget.name = acqTSF.TARGET_NAME.replace(
                 ' ', '_')  # allowed characters: letters, digits, + - _ . and no spaces
-            obTarget.ra, obTarget.dec = self.getCoords(scienceTarget)
-            obTarget.properMotionRa, obTarget.properMotionDec = self.getPMCoords(
-                scienceTarget)
+            obTarget.ra, obTarget.dec = targets.getCoords(i)
+            obTarget.properMotionRa, obTarget.properMotionDec = targets.getPMCoords(
+                i)
 
             # define some default values
-            DIAMETER = float(self.get(scienceTarget, "DIAMETER", 0.0))
+            DIAMETER = targets.getDiameter(i)
             VIS = 1.0  # FIXME
 
             # Retrieve Fluxes
-            TEL_COU_MAG = self.getFlux(scienceTarget, "V")
-            acqTSF.ISS_IAS_HMAG = self.getFlux(scienceTarget, "H")
+            TEL_COU_MAG = targets.getFlux(i, "V")
+            acqTSF.ISS_IAS_HMAG = targets.getFlux(i, "H")
 
             # setup some default values, to be changed below
             TEL_COU_GSSOURCE = 'SCIENCE'  # by default
@@ -114,23 +119,19 @@ class Pionier(VltiInstrument):
                 # TODO check if AO coords should be required by template
                 # AORA, AODEC  = self.getCoords(aoTarget,
                 # requirePrecision=False)
-                acqTSF.TEL_COU_PMA, acqTSF.TEL_COU_PMD = self.getPMCoords(
-                    aoTarget)
+                acqTSF.TEL_COU_PMA, acqTSF.TEL_COU_PMD = targets.getPMCoords(
+                    i, "AOTarget")
 
             # Guide Star
             gsTarget = ob.get(observationConfiguration, 'GSTarget')
             if gsTarget != None:
                 TEL_COU_GSSOURCE = 'SETUPFILE'  # since we have an GS
-                GSRA, GSDEC = self.getCoords(gsTarget, requirePrecision=False)
+                GSRA, GSDEC = targets.getCoords(i, "GSTarget")
                 # no PMRA, PMDE for GS !!
-                TEL_COU_MAG = float(gsTarget.FLUX_V)
+                TEL_COU_MAG = targets.getFlux(i, "V", "GSTarget")
 
             # LST interval
-            try:
-                obsConstraint = observationConfiguration.observationConstraints
-                LSTINTERVAL = obsConstraint.LSTinterval
-            except:
-                LSTINTERVAL = None
+            LSTINTERVAL = lstIntervals[i]
 
             # Constraints
             obConstraints.name = 'Aspro-created constraints'
@@ -147,8 +148,9 @@ class Pionier(VltiInstrument):
             # The seeing value allowed for this OB is >= java0x0 arcsec."
             obConstraints.seeing = 1.0
             obConstraints.baseline = BASELINE.replace(' ', '-')
+            if airmasses[i]:
+                obConstraints.airmass = airmasses[i]
             # FIXME: default values NOT IN ASPRO!
-            # constaints.airmass = 5.0
             # constaints.fli = 1
 
             # compute dit, ndit, nexp
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import numpy as np
+
+from a2p2.observability import sexagesimalToDegrees
+
+# roles of the targets that may be attached to every observationConfiguration
+TARGET_ROLES = ("SCTarget", "FTTarget", "AOTarget", "GSTarget")
+
+# VLTI requires at least 3 digits on RA and 2 digits on DEC for SC and FT
+# targets; AO and GS coordinates are taken as given
+REQUIRED_PRECISION_ROLES = ("SCTarget", "FTTarget")
+RA_MIN_DIGITS = 3
+DEC_MIN_DIGITS = 2
+MAX_DIGITS = 3
+
+FLUX_BANDS = "BVRIJHKLMN"
+
+
+def truncateDigits(values, maxDigits=MAX_DIGITS):
+    """
+    Return (truncated, digits) for the given array of sexagesimal strings.
+
+    truncated keeps at most maxDigits digits after the decimal point and digits
+    gives the number of digits found in the input (0 if there is no point).
+    """
+    values = np.asarray(values, dtype=np.str_)
+    if values.size == 0:
+        return values, np.zeros(0, dtype=int)
+    lengths = np.char.str_len(values)
+    points = np.char.rfind(values, '.')
+    digits = np.where(points < 0, 0, lengths - points - 1)
+    keep = np.where(digits > maxDigits, points + maxDigits + 1, lengths)
+
+    # work on the character view so every row gets truncated in one pass
+    chars = np.ascontiguousarray(values).view('U1').reshape(len(values), -1).copy()
+    chars[np.arange(chars.shape[1]) >= keep[:, None]] = ''
+    truncated = chars.view(values.dtype).reshape(len(values))
+    return truncated, digits
+
+
+class TargetTable(object):
+
+    """
+    Normalize every target (SC, FT, AO and GS) of an OB in a single pass.
+
+    Each row corresponds to one target of one observationConfiguration and
+    values are stored as columnar arrays:
+    - obsIndex, role, name
+    - ra, dec (VLTI compliant strings), raDeg, decDeg
+    - raDigits, decDigits, raOk, decOk (precision diagnostics)
+    - pmra, pmdec (arcsec/yr rounded to 4 decimal digits)
+    - diameter (mas, 0.0 if not present)
+    - fluxes[band] (rounded to 3 decimal digits, nan if not present)
+    """
+
+    def __init__(self, ob, roles=TARGET_ROLES):
+        rows = []
+        for i, observationConfiguration in enumerate(ob.observationConfiguration):
+            for role in roles:
+                target = ob.get(observationConfiguration, role)
+                if target is not None:
+                    rows.append((i, role, target._asdict()))
+        self.index = dict(((i, role), n) for n, (i, role, _) in enumerate(rows))
+
+        def column(key, default):
+            return [r[2].get(key, default) for r in rows]
+
+        self.obsIndex = np.array([r[0] for r in rows], dtype=int)
+        self.role = np.array([r[1] for r in rows], dtype=np.str_)
+        self.name = np.array(column("name", ""), dtype=np.str_)
+
+        self.ra, self.raDigits = truncateDigits(column("RA", ""))
+        self.dec, self.decDigits = truncateDigits(column("DEC", ""))
+        self.raDeg = sexagesimalToDegrees(self.ra, hours=True)
+        self.decDeg = sexagesimalToDegrees(self.dec)
+
+        required = np.isin(self.role, REQUIRED_PRECISION_ROLES)
+        self.raOk = ~required | (self.raDigits >= RA_MIN_DIGITS)
+        self.decOk = ~required | (self.decDigits >= DEC_MIN_DIGITS)
+
+        self.pmra = np.round(
+            np.array(column("PMRA", 0.0), dtype=float) / 1000.0, 4)
+        self.pmdec = np.round(
+            np.array(column("PMDEC", 0.0), dtype=float) / 1000.0, 4)
+        self.diameter = np.array(column("DIAMETER", 0.0), dtype=float)
+
+        self.fluxes = {}
+        for band in FLUX_BANDS:
+            self.fluxes[band] = np.round(
+                np.array(column("FLUX_" + band, np.nan), dtype=float), 3)
+
+    def __len__(self):
+        return len(self.obsIndex)
+
+    def getRow(self, obsIndex, role="SCTarget"):
+        """
+        Return the row of the given target or None if absent.
+        """
+        return self.index.get((obsIndex, role))
+
+    def getPrecisionErrors(self):
+        """
+        Return the list of error messages for every row with a too low precision.
+        """
+        errors = []
+        for n in np.flatnonzero(~self.raOk):
+            errors.append("Object " + self.name[n] +
+                          " has a too low precision in RA to be useable by VLTI, please correct with %d or more digits." % RA_MIN_DIGITS)
+        for n in np.flatnonzero(~self.decOk):
+            errors.append("Object " + self.name[n] +
+                          " has a too low precision in DEC to be useable by VLTI, please correct with %d or more digits." % DEC_MIN_DIGITS)
+        return errors
+
+    def checkPrecision(self):
+        """
+        Throws a ValueError that reports every target with a too low precision.
+        """
+        errors = self.getPrecisionErrors()
+        if errors:
+            raise ValueError("\n".join(errors))
+
+    def getCoords(self, obsIndex, role="SCTarget"):
+        """
+        Returns RA, DEC strings of the given target.
+        """
+        n = self._getRow(obsIndex, role)
+        return str(self.ra[n]), str(self.dec[n])
+
+    def getPMCoords(self, obsIndex, role="SCTarget"):
+        """
+        Returns PMRA, PMDEC as float values rounded to 4 decimal digits.
+        """
+        n = self._getRow(obsIndex, role)
+        return float(self.pmra[n]), float(self.pmdec[n])
+
+    def getFlux(self, obsIndex, flux, role="SCTarget"):
+        """
+        Returns Flux as float value rounded to 3 decimal digits.
+
+        flux in 'V', 'J', 'H'...
+        """
+        n = self._getRow(obsIndex, role)
+        value = self.fluxes[flux][n]
+        if np.isnan(value):
+            raise ValueError("Object %s has no %s magnitude." %
+                             (self.name[n], flux))
+        return float(value)
+
+    def getDiameter(self, obsIndex, role="SCTarget"):
+        return float(self.diameter[self._getRow(obsIndex, role)])
+
+    def _getRow(self, obsIndex, role):
+        n = self.getRow(obsIndex, role)
+        if n is None:
+            raise ValueError("no %s in observation configuration %d" %
+                             (role, obsIndex))
+        return n
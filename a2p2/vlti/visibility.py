@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+__all__ = []
+
+import numpy as np
+
+# VLTI latitude (deg)
+VLTI_LATITUDE = -24.62743
+
+# VLTI station positions (East, North) in meters relative to the array center
+# (from ESO VLTI station coordinates, height differences are neglected)
+VLTI_STATIONS = {
+    "UT1": (-9.925, -20.335), "UT2": (14.887, 30.502),
+    "UT3": (44.915, 66.183), "UT4": (103.306, 43.999),
+    "A0": (-14.642, -55.812), "A1": (-9.434, -70.949),
+    "B0": (-7.065, -53.212), "B1": (-1.863, -68.334),
+    "B2": (0.739, -75.899), "B3": (3.348, -83.481),
+    "B4": (5.945, -91.030), "B5": (8.547, -98.594),
+    "C0": (0.487, -50.607), "C1": (5.691, -65.735),
+    "C2": (8.296, -73.307), "C3": (10.896, -80.864),
+    "D0": (15.628, -45.397), "D1": (26.039, -75.660),
+    "D2": (31.243, -90.787), "E0": (30.760, -40.196),
+    "G0": (45.896, -34.990), "G1": (66.716, -95.501),
+    "G2": (38.063, -12.289), "H0": (76.150, -24.572),
+    "I1": (96.711, -59.789), "J1": (106.648, -39.444),
+    "J2": (114.460, -62.151), "J3": (80.628, 36.193),
+    "J4": (75.424, 51.320), "J5": (67.618, 74.009),
+    "J6": (59.810, 96.706), "K0": (106.397, -14.165),
+    "L0": (113.977, -11.549), "M0": (121.535, -8.951),
+}
+
+# effective wavelength (m) of photometric bands
+BAND_WAVELENGTHS = {"J": 1.25e-6, "H": 1.65e-6, "K": 2.2e-6,
+                    "L": 3.5e-6, "M": 4.8e-6, "N": 10.5e-6}
+
+MAS_TO_RAD = np.pi / 180.0 / 3600.0 / 1000.0
+
+
+def besselJ1(x):
+    """
+    Bessel function of the first kind of order 1 (Abramowitz & Stegun 9.4.4
+    and 9.4.6 polynomial approximations, |error| < 1e-7).
+    """
+    x = np.abs(np.asarray(x, dtype=float))
+    small = x < 3.0
+    y = np.where(small, x / 3.0, 1.0) ** 2
+    j1small = x * (0.5 + y * (-0.56249985 + y * (0.21093573 + y * (-0.03954289 +
+                   y * (0.00443319 + y * (-0.00031761 + y * 0.00001109))))))
+    z = 3.0 / np.where(small, 3.0, x)
+    f1 = 0.79788456 + z * (0.00000156 + z * (0.01659667 + z * (0.00017105 + z * (
+        -0.00249511 + z * (0.00113653 - z * 0.00020033)))))
+    theta1 = x - 2.35619449 + z * (0.12499612 + z * (0.00005650 + z * (
+        -0.00637879 + z * (0.00074348 + z * (0.00079824 - z * 0.00029166)))))
+    j1large = f1 * np.cos(theta1) / np.sqrt(np.where(small, 1.0, x))
+    return np.where(small, j1small, j1large)
+
+
+def uniformDiskVisibility(diameter, baseline, wavelength):
+    """
+    Returns the visibility amplitude of uniform disks.
+
+    diameter in mas, baseline and wavelength in meters (arrays are broadcast).
+    """
+    x = np.pi * np.asarray(baseline) * \
+        np.asarray(diameter) * MAS_TO_RAD / wavelength
+    safe = np.where(x == 0, 1.0, x)
+    return np.where(x == 0, 1.0, np.abs(2.0 * besselJ1(safe) / safe))
+
+
+class VisibilityEngine(object):
+
+    """
+    Compute uniform disk visibilities of many targets over the projected
+    baselines of a VLTI station set. Baseline vectors are cached per station set.
+    """
+
+    def __init__(self, stations=VLTI_STATIONS, latitude=VLTI_LATITUDE):
+        self.stations = stations
+        self.latitude = np.radians(latitude)
+        self.baselines = {}
+
+    def getBaselines(self, stations):
+        """
+        Returns the (nbaselines, 3) equatorial (X, Y, Z) baseline vectors of
+        the given station list (or space separated string).
+
+        ValueError raised for unknown stations.
+        """
+        if not isinstance(stations, (list, tuple)):
+            stations = stations.split()
+        key = tuple(stations)
+        if key not in self.baselines:
+            unknown = [s for s in stations if s not in self.stations]
+            if unknown:
+                raise ValueError("unknown VLTI station(s) %s" %
+                                 ", ".join(unknown))
+            en = np.array([self.stations[s] for s in stations], dtype=float)
+            i, j = np.triu_indices(len(stations), 1)
+            dE = en[j, 0] - en[i, 0]
+            dN = en[j, 1] - en[i, 1]
+            sinLat, cosLat = np.sin(self.latitude), np.cos(self.latitude)
+            self.baselines[key] = np.column_stack(
+                (-sinLat * dN, dE, cosLat * dN))
+        return self.baselines[key]
+
+    def getProjectedBaselines(self, stations, dec, ha):
+        """
+        Returns the (ntargets, nbaselines) projected baseline lengths (m)
+        for targets of given declinations (deg) observed at given hour
+        angles (h).
+        """
+        xyz = self.getBaselines(stations)
+        h = np.radians(np.asarray(ha, dtype=float) * 15.0)[:, None]
+        d = np.radians(np.asarray(dec, dtype=float))[:, None]
+        X, Y, Z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+        u = np.sin(h) * X + np.cos(h) * Y
+        v = -np.sin(d) * np.cos(h) * X + np.sin(d) * np.sin(h) * Y + np.cos(d) * Z
+        return np.hypot(u, v)
+
+    def getVisibilities(self, stations, diameters, dec, ha, band="K"):
+        """
+        Returns the (ntargets, nbaselines) uniform disk visibilities.
+        """
+        baselines = self.getProjectedBaselines(stations, dec, ha)
+        return uniformDiskVisibility(np.asarray(diameters, dtype=float)[:, None],
+                                     baselines, BAND_WAVELENGTHS[band])
+
+    def getMinVisibilities(self, stations, diameters, dec, ha, band="K"):
+        """
+        Returns for every target its lowest visibility over all baselines.
+        """
+        return self.getVisibilities(stations, diameters, dec, ha, band).min(axis=1)
+
+
+def getHourAngles(ob):
+    """
+    Returns the middle of the HA interval given by Aspro2 for every
+    observationConfiguration (0.0 if missing).
+    """
+    has = []
+    for observationConfiguration in ob.observationConfiguration:
+        ha = 0.0
+        constraints = ob.get(observationConfiguration, "observationConstraints")
+        interval = ob.get(constraints, "HAinterval") if constraints else None
+        if interval:
+            start, end = interval.split('/')
+            ha = (float(start) + float(end)) / 2.0
+        has.append(ha)
+    return np.array(has)
@@ -41,5 +41,17 @@ setup(
       packages=find_packages(),
       include_package_data=True,
       scripts=['scripts/a2p2'],
+      # facilities and instruments, third party packages may add their own
+      # (see a2p2/plugins.py)
+      entry_points={
+          'a2p2.facilities': [
+              'CHARA = a2p2.chara.facility:CharaFacility',
+              'VLTI = a2p2.vlti.facility:VltiFacility',
+          ],
+          'a2p2.instruments': [
+              'VLTI.GRAVITY = a2p2.vlti.gravity:Gravity',
+              'VLTI.PIONIER = a2p2.vlti.pionier:Pionier',
+          ],
+      },
       keywords='observation preparation tool optical-interferometry p2 samp'
 )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+from a2p2 import A2p2Client
+from a2p2.batch import BATCH_MTYPE, Batch, iterBatch
+from a2p2.loadgen import OB_TEMPLATE
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample(name):
+    return os.path.join(TESTDIR, name)
+
+
+def test_iter_batch(tmpdir):
+    zpath = str(tmpdir.join("obs.zip"))
+    with zipfile.ZipFile(zpath, "w") as z:
+        z.write(sample("aspro-sample.obxml"), "b.obxml")
+        z.write(sample("aspro-sample-bad-k.obxml"), "a.obxml")
+        z.writestr("readme.txt", "not an OB")
+    tpath = str(tmpdir.join("obs.tar.gz"))
+    with tarfile.open(tpath, "w:gz") as t:
+        t.add(sample("aspro-sample.obxml"), "c.obxml")
+
+    names = [n for n, source in iterBatch({"url": "file://" + zpath})]
+    assert names == ["obs.zip:a.obxml", "obs.zip:b.obxml"]
+    names = [n for n, source in iterBatch(
+        {"urls": ["file://" + tpath, sample("aspro-sample.obxml")]})]
+    assert names == ["obs.tar.gz:c.obxml", sample("aspro-sample.obxml")]
+
+
+def test_batch_status(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    client = A2p2Client(headless=True)
+    statuses = {"a": "queued", "b": "submitted"}
+    batch = Batch("7", {"urls": ["a", "b", "missing"]})
+    while batch.step(lambda source: statuses[source]):
+        pass
+    assert [(i.name, i.status) for i in batch.items] == [
+        ("a", "queued"), ("b", "submitted"), ("missing", "error")]
+    assert batch.getStatus()["count"] == "3"
+    assert batch.getSummary() == "Batch 7: 3 OB(s) processed (1 error, 1 queued, 1 submitted)"
+
+    # at least one OB per step, sent on the VLTI facility
+    batch = client.queueBatch({"batchId": "8", "urls": [
+        sample("aspro-sample-bad-k.obxml"), str(tmpdir.join("missing.obxml"))]})
+    client.processBatchStep(budget=0)
+    assert len(batch.items) == 1 and client.batches
+    client.processBatchStep(budget=0)
+    client.processBatchStep(budget=0)
+    assert not client.batches
+    assert [i.status for i in batch.items] == ["error", "error"]
+
+
+def test_batch_run(tmpdir, monkeypatch):
+    # OBs of a batch are not delayed by the wait of the main loop
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    monkeypatch.setenv("SAMP_HUB", "std-lockurl:file://" + str(tmpdir.join("nohub.lock")))
+    urls = []
+    for i in range(50):
+        path = tmpdir.join("ob%d.obxml" % i)
+        path.write(OB_TEMPLATE % {"facility": "CHARA", "index": i,
+                                  "ra": "%02d:00:00.000" % (i % 24)})
+        urls.append(str(path))
+    client = A2p2Client(headless=True)
+    batch = client.queueBatch({"batchId": "9", "urls": urls})
+
+    def stop():
+        while client.batches:
+            time.sleep(0.01)
+        client.ui.requestAbort = True
+    stopper = threading.Thread(target=stop)
+    stopper.daemon = True
+    start = time.time()
+    stopper.start()
+    client.run()
+    assert time.time() - start < 2.5
+    assert [i.status for i in batch.items] == ["added"] * 50
+
+
+def test_receiver():
+    from a2p2.samp import Receiver
+
+    class Client(object):
+        def reply(self, msg_id, response):
+            self.response = response
+
+    client = Client()
+    receiver = Receiver(client)
+    receiver.receive_call(None, "aspro2", "m1", BATCH_MTYPE, {"urls": ["a"]}, None)
+    receiver.receive_call(None, "aspro2", "m2", BATCH_MTYPE,
+                          {"urls": ["b"], "batchId": "x"}, None)
+    assert client.response["samp.result"] == {"batchId": "x"}
+    message = receiver.get_last_message()
+    assert (message.sender, message.params["batchId"]) == ("aspro2", "1")
+    assert receiver.get_last_message().params["batchId"] == "x"
+    assert receiver.get_last_message() is None
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from a2p2.chara.export import exportDirectory, getFormat, iterJSON, loadDirectory
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def getOBDir(tmpdir):
+    obdir = tmpdir.mkdir("obs")
+    for name in ("aspro-sample.obxml", "aspro-sample-bad-k.obxml", "aspro-sample-bad-coords.obxml"):
+        shutil.copy(os.path.join(TESTDIR, name), str(obdir))
+    return str(obdir)
+
+
+def test_formats(tmpdir):
+    obdir = getOBDir(tmpdir)
+    assert getFormat("plan.CSV") == "csv" and getFormat("plan") == "text"
+
+    out = str(tmpdir.join("plan.json"))
+    session = exportDirectory(obdir, out)
+    doc = json.load(open(out))
+    assert doc["obCount"] == session.obCount
+    assert [e["name"] for e in doc["entries"]] == [e.name for e in session.getPlan()]
+    # one chunk per entry plus header and footer
+    assert len(list(iterJSON(session))) == len(session) + 2
+
+    out = str(tmpdir.join("plan.csv"))
+    exportDirectory(obdir, out)
+    rows = list(csv.DictReader(open(out)))
+    assert [r["name"] for r in rows] == [e.name for e in session.getPlan()]
+    assert float(rows[0]["lstStart"]) == session.getPlan()[0].key[0]
+
+    out = str(tmpdir.join("plan.txt"))
+    exportDirectory(obdir, out)
+    text = open(out).read()
+    assert text.startswith(session.getSummary())
+    assert session.getPlan()[0].text in text
+
+
+def test_script(tmpdir):
+    obdir = getOBDir(tmpdir)
+    root = os.path.dirname(TESTDIR)
+    env = dict(os.environ, PYTHONPATH=root)
+    out = subprocess.check_output(
+        [sys.executable, os.path.join(root, "scripts", "a2p2"),
+         "--chara-export", obdir, "--format", "csv"], env=env)
+    lines = out.decode().splitlines()
+    assert lines[0].startswith("lstStart,name,")
+    assert len(lines) == len(loadDirectory(obdir)) + 1
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import os
+import random
+
+from a2p2.chara.scheduler import IntervalIndex, ScheduleOptimizer, getSeparation
+from a2p2.chara.session import CharaSession, PlanEntry
+from a2p2.ob import OB
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def entry(name, windows, cals=(), ra=0.0, dec=0.0, lstInterval=None):
+    return PlanEntry((windows[0][0], name), name, "S1 S2", lstInterval, windows,
+                     cals, ra, dec, name)
+
+
+def test_interval_index():
+    index = IntervalIndex([(0, 10, "a"), (1, 2, "b"), (3, 5, "c"), (6, 7, "d")])
+    assert index.overlapping(2, 4) == ["a", "c"]
+    assert index.overlapping(5, 6) == ["a"]
+    assert index.overlapping(10, 12) == []
+    assert round(getSeparation(0, 0, 90, 0), 6) == 90.0
+
+
+def test_schedule_deadlines():
+    # b must be observed first as its window closes early
+    entries = [entry("a", [(20.0, 4.0)]), entry("b", [(20.0, 21.0)]),
+               entry("c", [(1.0, 2.0)])]
+    schedule = ScheduleOptimizer(entries, nightStart=20.0).optimize()
+    assert [(s.start, s.entry.name) for s in schedule.slots] == [
+        (0.0, "b"), (1.0, "a"), (5.0, "c")]
+    assert schedule.unscheduled == []
+    assert schedule.getUtilization() == 0.25
+
+
+def test_schedule_calibrators_and_conflicts():
+    entries = [entry("a", [(0.0, 12.0)], ("cal1",), ra=0.0),
+               entry("b", [(0.0, 12.0)], ("cal2",), ra=10.0),
+               entry("c", [(0.0, 12.0)], ("cal1",), ra=90.0),
+               entry("d", [(0.0, 1.0)], ra=80.0),
+               entry("e", [(0.0, 1.5)], ra=80.0),
+               entry("f", [(14.0, 16.0)])]
+    schedule = ScheduleOptimizer(entries, nightStart=0.0).optimize()
+    names = [s.entry.name for s in schedule.slots]
+    assert names[0] == "d"
+    assert names.index("c") + 1 == names.index("a")
+    assert [(u.entry.name, u.conflicts) for u in schedule.unscheduled] == [
+        ("e", ["d", "c"]), ("f", [])]
+    assert "not scheduled: f, not observable" in str(schedule)
+
+
+def test_schedule_window_open_at_night_start():
+    # observable from the night start, both for its window and LST interval
+    entries = [entry("a", [(17.0, 2.0)]),
+               entry("b", [(12.0, 23.0)], lstInterval="17:00/21:00")]
+    schedule = ScheduleOptimizer(entries, nightStart=18.0).optimize()
+    assert [(s.start, s.entry.name) for s in schedule.slots] == [
+        (0.0, "b"), (1.0, "a")]
+    assert schedule.unscheduled == []
+
+
+def test_schedule_many_targets():
+    rnd = random.Random(1)
+    entries = []
+    for i in range(500):
+        start = rnd.uniform(0, 24)
+        entries.append(entry("t%d" % i, [(start, (start + rnd.uniform(1, 8)) % 24)],
+                             ("cal%d" % rnd.randint(0, 20),),
+                             rnd.uniform(0, 360), rnd.uniform(-30, 80)))
+    schedule = ScheduleOptimizer(entries, nightStart=18.0, duration=0.5).optimize()
+    assert len(schedule.slots) + len(schedule.unscheduled) == 500
+    for previous, slot in zip(schedule.slots, schedule.slots[1:]):
+        assert slot.start >= previous.end
+    assert schedule.getUtilization() > 0.9
+
+
+def test_session_schedule():
+    session = CharaSession()
+    session.addOB(OB(os.path.join(TESTDIR, "aspro-sample.obxml")))
+    schedule = session.getSchedule(duration=0.5)
+    assert [s.entry.name for s in schedule.slots] == ["HD 17081"]
+    assert schedule.unscheduled == []
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import os
+
+from a2p2.chara.session import CharaSession, PlanEntry
+from a2p2.ob import OB
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def entry(lst, seq, name, baselines="S1 S2", cals=()):
+    return PlanEntry((lst, seq), name, baselines, None, [], cals, 0.0, 0.0, name)
+
+
+def test_session_order():
+    session = CharaSession()
+    for e in [entry(5.0, 1, "b"), entry(1.0, 2, "a", "E1 W1", ("cal1",)),
+              entry(23.0, 3, "d", cals=("cal1",)), entry(5.0, 4, "c")]:
+        session.insert(e)
+    assert [e.name for e in session.getPlan()] == ["a", "b", "c", "d"]
+    assert [e.name for e in session.getByBaselines("S1 S2")] == ["b", "c", "d"]
+    assert [e.name for e in session.getByLST(4.0, 6.0)] == ["b", "c"]
+    assert session.getCalibratorUsers("cal1") == [("a", "E1 W1"), ("d", "S1 S2")]
+
+    assert session.remove(session.byTarget[("b", "S1 S2")]) == 1
+    assert [e.name for e in session.getByBaselines("S1 S2")] == ["c", "d"]
+    session.remove(session.byTarget[("a", "E1 W1")])
+    assert session.getByBaselines("E1 W1") == []
+    assert session.getCalibratorUsers("cal1") == [("d", "S1 S2")]
+
+
+def test_session_ob():
+    session = CharaSession()
+    ob = OB(os.path.join(TESTDIR, "aspro-sample.obxml"))
+    changes = session.addOB(ob)
+    assert [(c[0], c[1]) for c in changes] == [("insert", 0)]
+    assert changes[0][2].name == "HD 17081"
+    assert changes[0][2].key[0] == 22.0 + 32 / 60.0
+
+    # same target sent again replaces its entry
+    changes = session.addOB(ob)
+    assert [(c[0], c[1]) for c in changes] == [("remove", 0), ("insert", 0)]
+    assert len(session) == 1 and session.obCount == 2
+    assert session.getCalibratorUsers("HD_16825") == [
+        ("HD 17081", ob.interferometerConfiguration.stations)]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import json
+import os
+
+import pytest
+
+from a2p2.vlti.confregistry import ConfRegistry
+
+RANGETABLE = {"TEST_acq.tsf, TEST_acq2.tsf": {
+    "SEQ.MAG": {"min": -10.0, "max": 20.0, "default": 0.0}}}
+DITTABLE = {"AT": {"LOW": {"IN": {"DIT": [1, 3], "MAG": [0, 1, 2]}}, "Kut": 3}}
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        json.dump(content, f)
+
+
+def test_registry(tmpdir):
+    confdir = str(tmpdir.mkdir("conf"))
+    cachefile = str(tmpdir.join("conf.pickle"))
+    write(os.path.join(confdir, "TEST_rangeTable.json"), RANGETABLE)
+    write(os.path.join(confdir, "TEST_ditTable.json"), DITTABLE)
+
+    registry = ConfRegistry(confdir, cachefile, checkInterval=0)
+    registry.preload(["TEST"])
+    assert os.path.isfile(cachefile)
+    assert registry.getTemplateKey("TEST", "TEST_acq2.tsf") == "TEST_acq.tsf, TEST_acq2.tsf"
+    assert registry.getDitTable("TEST")["AT"]["Kut"] == 3
+
+    # compiled form is read back from the cache
+    registry = ConfRegistry(confdir, cachefile, checkInterval=0)
+    assert len(registry.entries) == 2
+
+    # period subdirectory overrides the main files
+    periodDir = os.path.join(confdir, "P104")
+    os.mkdir(periodDir)
+    write(os.path.join(periodDir, "TEST_ditTable.json"), {"AT": {"Kut": 2}})
+    assert registry.getDitTable("TEST", "Period 104")["AT"]["Kut"] == 2
+    assert registry.getDitTable("TEST", "Period 103")["AT"]["Kut"] == 3
+
+    # hot reload of a modified file
+    write(os.path.join(confdir, "TEST_ditTable.json"), {"AT": {"Kut": 4}})
+    os.utime(os.path.join(confdir, "TEST_ditTable.json"), (0, 0))
+    assert registry.getDitTable("TEST")["AT"]["Kut"] == 4
+
+
+def test_invalid_table(tmpdir):
+    confdir = str(tmpdir)
+    write(os.path.join(confdir, "TEST_ditTable.json"),
+          {"AT": {"LOW": {"IN": {"DIT": [1, 3], "MAG": [0, 1]}}}})
+    registry = ConfRegistry(confdir, str(tmpdir.join("conf.pickle")))
+    with pytest.raises(ValueError):
+        registry.getDitTable("TEST")
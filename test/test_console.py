@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import logging
+import os
+import sys
+import time
+
+from a2p2 import A2p2Client
+from a2p2.ob import OB
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_headless(tmpdir, monkeypatch, caplog):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    config = tmpdir.join("a2p2.ini")
+    config.write("[P2]\nusername = 52052\ncontainerId = 1234\n")
+    tkLoaded = "tkinter" in sys.modules or "Tkinter" in sys.modules
+
+    caplog.set_level(logging.INFO, logger="a2p2")
+    client = A2p2Client(headless=True, configFile=str(config))
+    assert client.getConfig("P2", "containerId") == "1234"
+    assert client.getConfig("P2", "password") is None
+
+    # errors are logged instead of shown in dialogs
+    client.facilityManager.processOB(
+        OB(os.path.join(TESTDIR, "aspro-sample-bad-k.obxml")))
+    assert "[VLTI] Value error" in caplog.text
+    assert client.facilityManager.getFacility("VLTI").pendingOBs == []
+    if not tkLoaded:
+        assert "tkinter" not in sys.modules and "Tkinter" not in sys.modules
+
+
+def test_headless_submission(tmpdir, monkeypatch, caplog):
+    # config file -> login -> container selection -> submission without Tk
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    config = tmpdir.join("a2p2.ini")
+    config.write("[P2]\nusername = 52052\npassword = tutorial\ncontainerId = 1234567\n")
+    with open(os.path.join(TESTDIR, "aspro-sample.obxml")) as f:
+        xml = f.read()
+    # K magnitudes in the range of the GRAVITY exposure tables
+    path = tmpdir.join("ob.obxml")
+    path.write(xml.replace("<FLUX_K>4.", "<FLUX_K>7."))
+    tkLoaded = "tkinter" in sys.modules or "Tkinter" in sys.modules
+
+    caplog.set_level(logging.INFO, logger="a2p2")
+    client = A2p2Client(fakeAPI=True, headless=True, configFile=str(config))
+    vlti = client.facilityManager.getFacility("VLTI")
+    assert client.facilityManager.processOB(OB(str(path))) == "queued"
+    limit = time.time() + 10
+    while not (vlti.isConnected() and vlti.isIdle()) and time.time() < limit:
+        client.ui.loop()
+        time.sleep(0.01)
+
+    assert "Connected to P2 as 52052" in caplog.text
+    assert vlti.containerInfo.containerId == 1234567
+    api = vlti.getAPI()
+    # one OB per target in a folder of the container
+    assert len(api.obs) == 2
+    assert all(ob["obStatus"] == "C" for ob in api.obs.values())
+    folders = [i for i in api.getItems(1234567)[0] if i["itemType"] == "Folder"]
+    assert len(folders) == 1
+
+    # once logged in, OBs are submitted at once
+    assert client.facilityManager.processOB(OB(str(path))) == "submitted"
+    assert len(api.obs) == 4
+    if not tkLoaded:
+        assert "tkinter" not in sys.modules and "Tkinter" not in sys.modules
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import pytest
+
+from a2p2.vlti.exposure import GravityExposurePlanner
+
+DITTABLE = {"AT": {"MED": {"IN": {"DIT": [1, 10, 30], "MAG": [0, 2, 4, 9]}},
+                   "Kdf": 0.5, "Kut": 3}}
+
+
+def test_plan():
+    planner = GravityExposurePlanner(DITTABLE)
+    plan = planner.plan("AT", "MED", "IN", False, [0, 1.5, 3, 9])
+    assert list(plan.dit) == [1, 1, 10, 30]
+    assert list(plan.ndit) == [260, 260, 26, 10]
+    assert list(plan.nexp) == [3, 3, 3, 3]
+    assert plan.sequence[0] == "O S O "
+    assert list(plan.nditAtMin) == [False, False, False, True]
+    assert plan.duration[2] == 900 + 3 * (26 * 10 + 40)
+
+    # UT and dual field shift magnitudes
+    assert list(planner.plan("UT", "MED", "IN", True, [5.5]).dit) == [1]
+    with pytest.raises(ValueError):
+        planner.plan("AT", "MED", "IN", False, [10])
+
+
+def test_execution_time():
+    planner = GravityExposurePlanner(DITTABLE)
+    total = planner.estimateExecutionTime(
+        [("AT", "MED", "IN", False, 3), ("AT", "MED", "IN", False, 3)])
+    assert total == 2 * 1800
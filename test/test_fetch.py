@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import gzip
+import io
+import os
+import sys
+import threading
+
+if sys.version_info[0] == 2:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+else:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from a2p2.fetch import URLCache, openURL
+from a2p2.ob import OB
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+with open(os.path.join(TESTDIR, "aspro-sample.obxml"), "rb") as f:
+    SAMPLE = f.read()
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    # path -> (body, etag, gzip encoded), requests received
+    documents = {}
+    requests = []
+
+    def do_GET(self):
+        body, etag, encoded = self.documents[self.path]
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if encoded:
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode="wb") as g:
+                g.write(body)
+            body = buf.getvalue()
+        self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        if encoded:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, "http://127.0.0.1:%d" % server.server_address[1]
+
+
+def test_fetch(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    Handler.documents = {"/ob.obxml": (SAMPLE, '"v1"', True),
+                         "/nocache.obxml": (SAMPLE, None, False)}
+    Handler.requests = []
+    server, root = serve()
+    try:
+        cache = URLCache()
+        f = openURL(root + "/ob.obxml", cache)
+        assert f.read() == SAMPLE
+        f.close()
+        assert cache.getValidators(root + "/ob.obxml") == {"etag": '"v1"'}
+
+        # not modified: read from the cache
+        ob = OB(root + "/ob.obxml")
+        assert ob.instrumentConfiguration.name == "GRAVITY"
+        assert Handler.requests[-1] == ("/ob.obxml", '"v1"')
+
+        # modified: cache replaced
+        Handler.documents["/ob.obxml"] = (SAMPLE.replace(b"GRAVITY", b"PIONIER"), '"v2"', False)
+        assert OB(root + "/ob.obxml").instrumentConfiguration.name == "PIONIER"
+        with cache.open(root + "/ob.obxml") as f:
+            assert b"PIONIER" in f.read()
+
+        # partial read does not update the cache
+        Handler.documents["/ob.obxml"] = (SAMPLE, '"v3"', False)
+        f = openURL(root + "/ob.obxml", cache)
+        f.read(10)
+        f.close()
+        assert cache.getValidators(root + "/ob.obxml") == {"etag": '"v2"'}
+
+        assert OB(root + "/nocache.obxml").instrumentConfiguration.name == "GRAVITY"
+        assert cache.getValidators(root + "/nocache.obxml") == {}
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+from a2p2 import A2p2Client
+from a2p2.loadgen import LoadGenerator, getPercentile
+
+
+def test_percentile():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert getPercentile(values, 50) == 5
+    assert getPercentile(values, 90) == 9
+    assert getPercentile(values, 99) == 10
+
+
+def test_loadgen(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    client = A2p2Client(fakeAPI=True, headless=True)
+    generator = LoadGenerator(count=10, rate=0, notifyRatio=0.5,
+                              facility="CHARA", drainTimeout=20).run(client)
+    assert generator.errors == []
+    assert len(generator.sent) == 10 and generator.getLost() == 0
+    assert set(p[1] for p in generator.processed.values()) == {"added"}
+    # half of the messages are calls
+    assert len(generator.acks) == 5
+    assert "10 processed, 0 lost" in generator.getReport()
+    assert len(client.facilityManager.getFacility("CHARA").session) == 10
+
+
+def test_loadgen_vlti(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    client = A2p2Client(fakeAPI=True, headless=True)
+    generator = LoadGenerator(count=8, rate=0, drainTimeout=20).run(client)
+    assert generator.errors == []
+    assert generator.getLost() == 0
+    # OBs received before the login are processed once submitted
+    counts = generator.getStatusCounts()
+    assert set(counts) <= {"submitted", "queued, submitted"}
+    assert counts["queued, submitted"] >= 1
+    assert "Status: " in generator.getReport()
+    assert len(client.facilityManager.getFacility("VLTI").getAPI().obs) == 8
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import os
+import subprocess
+import sys
+import time
+
+from a2p2 import A2p2Client
+from a2p2 import metrics
+from a2p2.loadgen import OB_TEMPLATE
+from a2p2.replay import useFakeP2
+from a2p2.samp import LOAD_MTYPE, SampMessage
+
+if sys.version_info[0] == 2:
+    from urllib2 import urlopen
+else:
+    from urllib.request import urlopen
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_registry(tmpdir):
+    registry = metrics.Registry()
+    counter = registry.counter("obs_total", "OBs.")
+    assert registry.counter("obs_total", "OBs.") is counter
+    counter.inc()
+    counter.inc(2, reason="error")
+    registry.gauge("depth", "Depth.", lambda: 3)
+    registry.gauge("broken", "Broken.", lambda: 1 / 0)
+    registry.gauge("low", "Low.").set(float("-inf"))
+    histogram = registry.histogram("parse_seconds", "Parse.", (0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert counter.get(reason="error") == 2
+    assert histogram.get() == (3, 5.55)
+
+    text = registry.render()
+    assert "# TYPE obs_total counter\nobs_total 1\nobs_total{reason=\"error\"} 2\n" in text
+    assert "depth 3\n" in text
+    assert "broken NaN\n" in text
+    assert "low -Inf\n" in text
+    assert 'parse_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'parse_seconds_bucket{le="1"} 2\n' in text
+    assert 'parse_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "parse_seconds_count 3\n" in text
+
+    filename = str(tmpdir.join("metrics.txt"))
+    dumper = metrics.FileDumper(filename, 0.01, registry).start()
+    time.sleep(0.05)
+    dumper.stop()
+    assert open(filename).read() == registry.render()
+
+    server = metrics.startServer(0, registry=registry)
+    try:
+        url = "http://127.0.0.1:%d/metrics" % server.server_address[1]
+        assert urlopen(url).read().decode("utf-8") == registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_lazy_server_import():
+    # http.server is only loaded by startServer()
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(TESTDIR))
+    out = subprocess.check_output(
+        [sys.executable, "-c", "import sys, a2p2.client; print('http.server' in sys.modules)"],
+        env=env)
+    assert out.decode().strip() == "False"
+
+
+def test_client_metrics(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    with open(os.path.join(TESTDIR, "aspro-sample.obxml")) as f:
+        xml = f.read()
+    good = tmpdir.join("good.obxml")
+    good.write(xml.replace("<FLUX_K>4.", "<FLUX_K>7."))
+    bad = tmpdir.join("bad.obxml")
+    bad.write("not an OB")
+    chara = tmpdir.join("chara.obxml")
+    chara.write(OB_TEMPLATE % {"facility": "CHARA", "index": 1, "ra": "02:44:07.349"})
+
+    received = metrics.obsReceived.get()
+    parsed = metrics.obsParsed.get()
+    rejected = metrics.obsRejected.get(reason="error")
+    submitted = metrics.obsSubmitted.get(facility="VLTI")
+    added = metrics.obsSubmitted.get(facility="CHARA")
+    parses = metrics.parseTime.get()[0]
+
+    client = A2p2Client(fakeAPI=True, headless=True)
+    useFakeP2(client)
+    for path in (good, bad, chara):
+        client.processMessage(SampMessage("aspro2", LOAD_MTYPE, {"url": str(path)}))
+    # the good OB is pending until the login is done
+    assert "a2p2_pending_obs 1\n" in metrics.REGISTRY.render()
+    assert metrics.obsSubmitted.get(facility="CHARA") == added + 1
+    vlti = client.facilityManager.getFacility("VLTI")
+    limit = time.time() + 10
+    while not vlti.isIdle() and time.time() < limit:
+        client.ui.loop()
+        time.sleep(0.01)
+
+    assert metrics.obsReceived.get() == received + 3
+    assert metrics.obsParsed.get() == parsed + 2
+    assert metrics.obsRejected.get(reason="error") == rejected + 1
+    assert metrics.obsSubmitted.get(facility="VLTI") == submitted + 1
+    # failed parses are timed too
+    assert metrics.parseTime.get()[0] == parses + 3
+    assert metrics.p2CallTime.get(call="createOB")[0] >= 1
+    text = metrics.REGISTRY.render()
+    assert "a2p2_pending_obs 0\n" in text
+    assert "a2p2_samp_queue_depth 0\n" in text
+    assert 'a2p2_ui_flush_seconds_count{what="events"}' in text
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import numpy as np
+
+from a2p2.observability import getObservabilityEngine, parseLSTInterval, formatLSTInterval
+
+
+def test_windows():
+    engine = getObservabilityEngine("VLTI")
+    # transit at LST 0h, window crossing 24h ; never above 30 deg ; circumpolar
+    windows = engine.getLSTWindows([0.0, 0.0, 0.0], [-24.6, 60.0, -89.0], minElevation=20)
+    start, end = windows[0][0]
+    assert len(windows[0]) == 1 and start > 12 and end < 12
+    assert abs((24 - start) - end) < 0.05
+    assert windows[1] == []
+    assert windows[2] == [(0.0, 24.0)]
+
+
+def test_airmass():
+    engine = getObservabilityEngine("VLTI")
+    interval = parseLSTInterval("23:00/01:00")
+    assert formatLSTInterval(interval) == "23:00/01:00"
+    airmass = engine.getAirmassConstraints([0.0, 0.0], [-24.6, -24.6], [interval, None])
+    assert airmass[0] == 1.1 and np.isnan(airmass[1])
+    assert engine.getCoverage([0.0], [-24.6], [interval])[0] == 1.0
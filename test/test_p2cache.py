@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+from a2p2.vlti.p2cache import P2Cache
+
+RUNS = [{"runId": 1, "containerId": 10, "progId": "60.A-9252(A)", "instrument": "GRAVITY"},
+        {"runId": 2, "containerId": 20, "progId": "60.A-9252(B)", "instrument": "PIONIER"}]
+FOLDERS = [{"containerId": 11, "name": "b", "itemType": "Folder"},
+           {"containerId": 12, "name": "a", "itemType": "Folder"}]
+
+
+def test_p2cache(tmpdir):
+    filename = str(tmpdir.join("p2.sqlite"))
+    cache = P2Cache(filename)
+    assert cache.getRuns("demo:52052") == (None, False)
+    assert cache.getFolders("demo:52052", 10) == (None, False)
+
+    assert cache.storeRuns("demo:52052", RUNS)
+    assert not cache.storeRuns("demo:52052", RUNS)
+    assert cache.storeFolders("demo:52052", 10, FOLDERS)
+    assert cache.getRun("demo:52052", 2)["containerId"] == 20
+    assert cache.getRun("production:1", 2) is None
+    cache.close()
+
+    # content and order are read back from the file
+    cache = P2Cache(filename)
+    assert cache.getRuns("demo:52052") == (RUNS, True)
+    assert cache.getFolders("demo:52052", 10) == (FOLDERS, True)
+    assert cache.getFolders("demo:52052", 11) == (None, False)
+
+    # invalidated or too old entries must be revalidated
+    cache.invalidate("demo:52052", 10)
+    assert cache.getFolders("demo:52052", 10) == (FOLDERS, False)
+    assert cache.storeFolders("demo:52052", 10, FOLDERS[:1])
+    assert cache.getFolders("demo:52052", 10) == (FOLDERS[:1], True)
+    cache.ttl = 0
+    assert cache.getRuns("demo:52052") == (RUNS, False)
+
+    cache.setRecentContainer("demo:52052", 12, "GRAVITY")
+    assert cache.getRecentContainer("demo:52052") == (12, "GRAVITY")
+    assert cache.getRecentContainer("production:1") == (None, None)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import logging
+import os
+import sys
+
+from a2p2 import A2p2Client
+from a2p2 import plugins
+from a2p2.ob import OB
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+PLUGIN = """
+from a2p2.facility import Facility
+
+class FakeFacility(Facility):
+    def __init__(self, a2p2client):
+        Facility.__init__(self, a2p2client, "VLTI", "fake help")
+        self.obs = []
+
+    def processOB(self, ob):
+        self.obs.append(ob)
+"""
+
+
+def test_discover():
+    facilities = plugins.discover()
+    assert list(facilities)[:2] == ["CHARA", "VLTI"]
+    assert list(facilities["VLTI"].instruments) == ["GRAVITY", "PIONIER"]
+    assert plugins.Loader("os.path:join").load() is os.path.join
+
+
+def test_lazy_plugin(tmpdir, monkeypatch, caplog):
+    # a third party facility replaces the VLTI one
+    tmpdir.join("a2p2_fake_plugin.py").write(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    monkeypatch.setitem(plugins.BUILTIN_ENTRY_POINTS, plugins.INSTRUMENT_GROUP,
+                        ["VLTI.GRAVITY = a2p2_fake_plugin:Unused"])
+    monkeypatch.setitem(plugins.BUILTIN_ENTRY_POINTS, plugins.FACILITY_GROUP,
+                        ["VLTI = a2p2_fake_plugin:FakeFacility"])
+    monkeypatch.setattr(plugins, "iterEntryPoints", lambda group: iter(()))
+    monkeypatch.setattr(plugins, "_plugins", None)
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+
+    caplog.set_level(logging.INFO, logger="a2p2")
+    client = A2p2Client(headless=True)
+    manager = client.facilityManager
+    assert manager.getSupportedInsnames("VLTI") == ["GRAVITY"]
+    assert "a2p2_fake_plugin" not in sys.modules
+
+    # unsupported instruments are rejected without loading the plugin
+    ob = OB(os.path.join(TESTDIR, "aspro-sample.obxml"))
+    ob.instrumentConfiguration = ob.instrumentConfiguration._replace(
+        name="MATISSE")
+    manager.processOB(ob)
+    assert "unsupported instrument" in caplog.text
+    assert "a2p2_fake_plugin" not in sys.modules
+
+    manager.processOB(OB(os.path.join(TESTDIR, "aspro-sample.obxml")))
+    assert len(manager.getFacility("VLTI").obs) == 1
+    assert manager.getFacility("VLTI").getHelp() == "fake help"
+
+
+def test_lazy_instruments(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    client = A2p2Client(headless=True)
+    vlti = client.facilityManager.getFacility("VLTI")
+    assert vlti.getSupportedInsnames() == ["GRAVITY", "PIONIER"]
+    assert vlti.facilityInstruments == {}
+    assert vlti.getInstrument("PIONIER").getName() == "PIONIER"
+    assert list(vlti.facilityInstruments) == ["PIONIER"]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import os
+
+from a2p2 import A2p2Client
+from a2p2.batch import BATCH_MTYPE
+from a2p2.replay import SessionPlayer, SessionRecorder, loadBundle
+from a2p2.samp import LOAD_MTYPE, Receiver
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class SampClient(object):
+
+    def reply(self, msg_id, response):
+        pass
+
+
+def writeOB(tmpdir, name, kmag):
+    with open(os.path.join(TESTDIR, "aspro-sample.obxml")) as f:
+        xml = f.read()
+    # K magnitudes in the range of the GRAVITY exposure tables
+    xml = xml.replace("<FLUX_K>4.505</FLUX_K>", "<FLUX_K>%s</FLUX_K>" % kmag)
+    xml = xml.replace("<FLUX_K>4.842</FLUX_K>", "<FLUX_K>%s</FLUX_K>" % kmag)
+    path = tmpdir.join(name)
+    path.write(xml)
+    return str(path)
+
+
+def test_record_replay(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir.mkdir("cache")))
+    bundle = str(tmpdir.join("bundle"))
+    good = writeOB(tmpdir, "good.obxml", "7.0")
+    bad = writeOB(tmpdir, "bad.obxml", "4.5")
+
+    receiver = Receiver(SampClient(), SessionRecorder(bundle))
+    receiver.receive_call(None, "aspro2", "m1", LOAD_MTYPE,
+                          {"url": "file://" + good}, None)
+    receiver.receive_notification(None, "aspro2", BATCH_MTYPE,
+                                  {"urls": [good, bad]}, None)
+    # the bundle does not depend on the original files
+    os.remove(good)
+    os.remove(bad)
+
+    messages = loadBundle(bundle)
+    assert [m.mtype for t, m in messages] == [LOAD_MTYPE, BATCH_MTYPE]
+    assert messages[0][0] <= messages[1][0]
+    assert os.path.isfile(messages[0][1].params["url"])
+    assert [os.path.basename(u) for u in messages[1][1].params["urls"]] == [
+        "0002-good.obxml", "0002-bad.obxml"]
+
+    client = A2p2Client(fakeAPI=True, headless=True)
+    player = SessionPlayer(client, bundle, speed=0).run(drainTimeout=10)
+    assert len(player.timings) == 2 and player.isIdle()
+    assert "Replay: 2 message(s)" in player.getReport()
+
+    api = client.facilityManager.getFacility("VLTI").getAPI()
+    # 2 targets per OB: the first OB queued until login, the batch ones
+    # submitted except the bad one
+    assert len(api.obs) == 4
+    assert all(ob["obStatus"] == "C" for ob in api.obs.values())
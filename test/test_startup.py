@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import sys
+import time
+
+from a2p2 import startup
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def test_startup_profile(tmpdir):
+    tmpdir.join("a2p2_slow_module.py").write("import time\ntime.sleep(0.01)\n")
+    sys.path.insert(0, str(tmpdir))
+    startup.enable()
+    try:
+        with startup.timed("Sleeper"):
+            import a2p2_slow_module
+            time.sleep(0.01)
+    finally:
+        startup.disable()
+        sys.path.remove(str(tmpdir))
+
+    out = StringIO()
+    startup.report(out)
+    text = out.getvalue()
+    assert "init   Sleeper" in text
+    assert "a2p2_slow_module" in text.split("Slowest imports")[1]
+
+    # entries are only reported once and nothing is timed once disabled
+    with startup.timed("Ignored"):
+        pass
+    out = StringIO()
+    startup.report(out)
+    assert out.getvalue() == ""
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import os
+
+from a2p2.ob import OB
+from a2p2.vlti.targets import TargetTable, truncateDigits
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_truncate():
+    values, digits = truncateDigits(["02:44:07.34928", "-14:32:57.42", "10:00:00"])
+    assert list(values) == ["02:44:07.349", "-14:32:57.42", "10:00:00"]
+    assert list(digits) == [5, 2, 0]
+
+
+def test_targets():
+    targets = TargetTable(OB(os.path.join(HERE, "aspro-sample.obxml")))
+    assert len(targets) == 2
+    assert targets.getCoords(0) == ("02:44:07.349", "-13:51:31.313")
+    assert targets.getPMCoords(1) == (-0.008, 0.0529)
+    assert targets.getFlux(1, "K") == 4.842
+    assert targets.getDiameter(1) == 0.448
+    assert abs(targets.decDeg[1] + 14.549283) < 1e-6
+    assert targets.getPrecisionErrors() == []
+
+
+def test_bad_coords():
+    targets = TargetTable(OB(os.path.join(HERE, "aspro-sample-bad-coords.obxml")))
+    errors = targets.getPrecisionErrors()
+    assert len(errors) == 2
+    assert "RA" in errors[0] and "DEC" in errors[1]
+
+
+def test_bad_coords_no_folder(tmpdir, monkeypatch):
+    # precision is checked before the folder of the 2 targets is created
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    from a2p2 import A2p2Client
+    from a2p2.vlti.fakeapi import FakeApiConnection
+
+    client = A2p2Client(fakeAPI=True, headless=True)
+    facility = client.facilityManager.getFacility("VLTI")
+    facility.api = FakeApiConnection("demo", "52052", "")
+    facility.containerInfo.containerId = 1234567
+    ob = OB(os.path.join(HERE, "aspro-sample-bad-coords.obxml"))
+    try:
+        facility.getInstrument(ob.instrumentConfiguration.name).checkOB(
+            ob, facility.containerInfo, dryMode=False)
+        assert False, "precision error not raised"
+    except ValueError as e:
+        assert "RA" in str(e)
+    assert facility.api.getItems(1234567)[0] == []
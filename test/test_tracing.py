@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import json
+import os
+import threading
+import time
+
+from a2p2 import A2p2Client
+from a2p2 import tracing
+from a2p2.replay import useFakeP2
+from a2p2.samp import LOAD_MTYPE, SampMessage
+
+TESTDIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_spans(tmpdir, monkeypatch):
+    export = str(tmpdir.join("traces.jsonl"))
+    monkeypatch.setattr(tracing, "_exportFile", export)
+    logs = []
+    with tracing.span("ignored"):
+        pass
+    trace = tracing.Trace("abc", "ob.obxml")
+    with tracing.trace(trace, logs.append):
+        with tracing.span("route"):
+            with tracing.span("p2.createOB"):
+                pass
+            with tracing.span("p2.createOB"):
+                pass
+    assert [(s.name, s.depth) for s in trace.spans] == [
+        ("p2.createOB", 1), ("p2.createOB", 1), ("route", 0)]
+    assert tracing.getCurrentTrace() is None
+    assert logs[0].startswith("Trace abc 'ob.obxml' ")
+    assert "route" in logs[0] and "p2.createOB" in logs[0] and " x2" in logs[0]
+
+    lines = [json.loads(l) for l in open(export)]
+    assert [l["traceId"] for l in lines] == ["abc"]
+    assert len(lines[0]["spans"]) == 3
+
+
+def test_ob_trace(tmpdir, monkeypatch):
+    monkeypatch.setenv("A2P2_CACHE_DIR", str(tmpdir))
+    export = str(tmpdir.join("traces.jsonl"))
+    monkeypatch.setattr(tracing, "_exportFile", export)
+    with open(os.path.join(TESTDIR, "aspro-sample.obxml")) as f:
+        xml = f.read().replace("<FLUX_K>4.", "<FLUX_K>7.")
+    ob = tmpdir.join("ob.obxml")
+    ob.write(xml)
+
+    client = A2p2Client(fakeAPI=True, headless=True)
+    useFakeP2(client)
+    client.processMessage(SampMessage("aspro2", LOAD_MTYPE, {"url": str(ob)},
+                                      "t1", time.time() - 0.01))
+    # pending OB submitted once logged in (same trace)
+    vlti = client.facilityManager.getFacility("VLTI")
+    limit = time.time() + 10
+    while not vlti.isIdle() and time.time() < limit:
+        client.ui.loop()
+        time.sleep(0.01)
+
+    lines = [json.loads(l) for l in open(export)]
+    assert [(l["traceId"], l["status"]) for l in lines] == [
+        ("t1", "queued"), ("t1", "submitted")]
+    names = [s["name"] for s in lines[0]["spans"]]
+    assert names[0] == "wait" and lines[0]["spans"][0]["duration"] >= 0.01
+    assert "parse" in names and "route" in names and "check" in names
+    names = set(s["name"] for s in lines[1]["spans"])
+    assert set(["submit", "p2.createOB", "verify", "notify"]) <= names
+    # pending OBs are submitted out of the main (UI) thread
+    assert set(s["thread"] for s in lines[1]["spans"]) != set(["MainThread"])
+
+
+def test_api_lock():
+    class Api(object):
+        running = 0
+        overlaps = 0
+
+        def getItems(self, containerId):
+            Api.running += 1
+            time.sleep(0.01)
+            Api.overlaps += Api.running > 1
+            Api.running -= 1
+
+    api = tracing.TracedAPI(Api(), threading.Lock())
+    threads = [threading.Thread(target=api.getItems, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert Api.overlaps == 0
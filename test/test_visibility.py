@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# Tested on GITHub/Travis
+# on your machine, just run pytest in this directory
+
+import numpy as np
+
+from a2p2.vlti.visibility import VisibilityEngine, besselJ1, uniformDiskVisibility, MAS_TO_RAD
+
+
+def test_bessel():
+    assert np.allclose(besselJ1([1.0, 3.0, 10.0]),
+                       [0.4400505857, 0.3390589585, 0.0434727462], atol=1e-7)
+
+
+def test_uniform_disk():
+    # first null of the uniform disk
+    baseline = 3.8317 * 2.2e-6 / (np.pi * 1.0 * MAS_TO_RAD)
+    assert uniformDiskVisibility(1.0, baseline, 2.2e-6) < 1e-4
+    assert uniformDiskVisibility(0.0, 100.0, 2.2e-6) == 1.0
+
+
+def test_engine():
+    engine = VisibilityEngine()
+    baselines = engine.getProjectedBaselines("UT1 UT4", [-24.62743], [0.0])
+    assert abs(baselines[0, 0] - 130.23) < 0.01
+    vis = engine.getMinVisibilities("A0 G1 J2 K0", [0.0, 0.448, 5.0], [-14.5] * 3, [0.0] * 3)
+    assert vis[0] == 1.0 and 0.9 < vis[1] < 1.0 and vis[2] < 0.2
+    assert len(engine.baselines) == 2